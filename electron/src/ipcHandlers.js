@@ -81,10 +81,14 @@ function registerIpcHandlers(win) {
         sttPipeClient.send(JSON.stringify({ "command": "start", "language": langCode }));
     });
 
+    // 곧 음성 입력을 시작할 예정일 때 (예: TTS 재생이 끝나갈 때) 워커가 STT 스트림을 미리 열어 두도록 알림
+    ipcMain.on('speech:prepare-stream', (event, lang) => {
+        const langCode = lang === 'en' ? 'en-US' : 'ko-KR';
+        sttPipeClient.send(JSON.stringify({ "command": "prepare", "language": langCode }));
+    });
+
     ipcMain.on('speech:audio-chunk', (event, chunk) => {
-        const buffer = Buffer.from(chunk);
-        const chunkBase64 = buffer.toString('base64');
-        sttPipeClient.send(JSON.stringify({ "chunk": chunkBase64 }));
+        sttPipeClient.sendAudio(Buffer.from(chunk)); // 협상 결과에 따라 이진 프레임 또는 base64 JSON
     });
 
     ipcMain.on('speech:stop-stream', () => {
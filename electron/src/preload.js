@@ -47,6 +47,7 @@ contextBridge.exposeInMainWorld('electronAPI', {
 
 
     // --- STT 관련 (수정 없음) ---
+    prepareSpeechStream: (lang) => ipcRenderer.send('speech:prepare-stream', lang), // 곧 시작할 언어의 STT 스트림 미리 열기
     startSpeechStream: (lang) => ipcRenderer.send('speech:start-stream', lang),
     sendAudioChunk: (chunk) => ipcRenderer.send('speech:audio-chunk', chunk),
     stopSpeechStream: () => ipcRenderer.send('speech:stop-stream'),
@@ -66,10 +67,16 @@ contextBridge.exposeInMainWorld('electronAPI', {
         ipcRenderer.on('speech:error', listener);
         return () => ipcRenderer.removeListener('speech:error', listener);
     },
+    onSpeechEnd: (callback) => { // ◀ 발화 끝 (워커의 로컬 VAD 판단, 최종 결과보다 먼저 옴)
+        const listener = () => callback();
+        ipcRenderer.on('speech:end', listener);
+        return () => ipcRenderer.removeListener('speech:end', listener);
+    },
     // --- STT 끝 ---
 
 
     // --- TTS 관련 (수정 없음) ---
+    // commandObject: { text, speed?, gain?, speaker? } | { command: "stop" } (speed/gain/speaker 생략 시 언어별 기본값)
     sendTtsCommand: (language, commandObject) => {
         ipcRenderer.send('tts:command', { lang: language, command: commandObject });
     },
@@ -78,6 +85,11 @@ contextBridge.exposeInMainWorld('electronAPI', {
         ipcRenderer.on('tts:playback-finished', listener);
         return () => ipcRenderer.removeListener('tts:playback-finished', listener);
     },
+    onTtsReady: (callback) => { // 언어별 합성 준비 완료 ('ko' | 'en')
+        const listener = (_event, language) => callback(language);
+        ipcRenderer.on('tts:ready', listener);
+        return () => ipcRenderer.removeListener('tts:ready', listener);
+    },
     // --- TTS 끝 ---
 
     // 🔽 [신규] '지능형 업데이트'를 위한 유휴 상태 전송 함수 🔽
@@ -3,7 +3,7 @@ const path = require('path');
 const { PythonShell } = require('python-shell');
 const { log } = require('../../logging/logger'); // 경로 확인 필요
 
-let ttsKrShell, ttsEnShell, sttShell;
+let ttsShell, sttShell;
 let ttsPipeClient, ttsPipeClientEN, sttPipeClient;
 let win;
 
@@ -65,8 +65,8 @@ function initializePythonServices(mainWindow, pythonExePath) {
     try {
         // PythonShell 실행 (TTS)
         // scriptPath가 설정되어 있으므로 스크립트 파일명만 전달
-        ttsKrShell = new PythonShell('tts_worker_pipe_kr.py', shellOptions);
-        ttsEnShell = new PythonShell('tts_worker_pipe_en.py', shellOptions);
+        // KR/EN 모델을 한 프로세스에서 로딩하고 두 파이프(melo_tts, melo_tts_en)를 모두 엽니다
+        ttsShell = new PythonShell('tts_host.py', shellOptions);
 
         // STT용 환경변수 설정 (baseEnv를 복사해서 사용해야 함)
         const sttEnv = { ...baseEnv };
@@ -97,10 +97,8 @@ function initializePythonServices(mainWindow, pythonExePath) {
 // ... (나머지 함수들은 동일)
 function setupPythonListeners() {
     // (기존 코드 동일)
-    ttsKrShell.on('message', (message) => log.info(`[TTS_KR_MSG] ${message}`));
-    ttsKrShell.on('stderr', (stderr) => log.warn(`[TTS_KR_ERR] ${stderr}`));
-    ttsEnShell.on('message', (message) => log.info(`[TTS_EN_MSG] ${message}`));
-    ttsEnShell.on('stderr', (stderr) => log.warn(`[TTS_EN_ERR] ${stderr}`));
+    ttsShell.on('message', (message) => log.info(`[TTS_MSG] ${message}`));
+    ttsShell.on('stderr', (stderr) => log.warn(`[TTS_ERR] ${stderr}`));
     sttShell.on('message', (message) => log.info(`[STT_MSG] ${message}`));
     sttShell.on('stderr', (stderr) => log.warn(`[STT_ERR] ${stderr}`));
 }
@@ -141,11 +139,19 @@ function setupPipeListeners() {
     if (ttsPipeClient) {
         ttsPipeClient.on('playback-finished', () => { if (win) win.webContents.send('tts:playback-finished'); });
         ttsPipeClient.on('connected', () => log.info("[Main] TTS (KR) 파이프 연결됨."));
+        ttsPipeClient.on('ready', () => {
+            log.info("[Main] TTS (KR) 합성 준비 완료.");
+            if (win) win.webContents.send('tts:ready', 'ko');
+        });
         ttsPipeClient.on('error', (err) => log.error(`[Main ERROR] TTS (KR) 파이프 오류: ${err.message}`));
     }
     if (ttsPipeClientEN) {
         ttsPipeClientEN.on('playback-finished', () => { if (win) win.webContents.send('tts:playback-finished'); });
         ttsPipeClientEN.on('connected', () => log.info("[Main] TTS (EN) 파이프 연결됨."));
+        ttsPipeClientEN.on('ready', () => {
+            log.info("[Main] TTS (EN) 합성 준비 완료.");
+            if (win) win.webContents.send('tts:ready', 'en');
+        });
         ttsPipeClientEN.on('error', (err) => log.error(`[Main ERROR] TTS (EN) 파이프 오류: ${err.message}`));
     }
     if (sttPipeClient) {
@@ -154,6 +160,7 @@ function setupPipeListeners() {
                 if (jsonData.type === 'result') win.webContents.send('speech:result', jsonData.text);
                 else if (jsonData.type === 'interim') win.webContents.send('speech:interim-result', jsonData.text);
                 else if (jsonData.type === 'error') win.webContents.send('speech:error', jsonData.message);
+                else if (jsonData.type === 'speech_end') win.webContents.send('speech:end'); // 로컬 VAD 발화 끝 (최종 결과 전)
             }
         });
         sttPipeClient.on('connected', () => log.info("[Main] STT 파이프 연결됨."));
@@ -164,8 +171,7 @@ function setupPipeListeners() {
 function cleanupPythonServices() {
     log.info("[Python] PythonShell 프로세스 종료 시도.");
     try {
-        if (ttsKrShell) ttsKrShell.terminate();
-        if (ttsEnShell) ttsEnShell.terminate();
+        if (ttsShell) ttsShell.terminate();
         if (sttShell) sttShell.terminate();
         log.info("[Python] 모든 PythonShell 프로세스가 종료되었습니다.");
     } catch (e) {
@@ -4,6 +4,11 @@ const { EventEmitter } = require('events');
 
 const PIPE_NAME = "\\\\.\\pipe\\stt_whisper"; // STT 파이프 이름 (Whisper가 아닌 GCloud)
 const RETRY_INTERVAL = 3000; // 3초 후 재시도
+// 오디오 전송 방식 협상: 연결 직후 hello를 보내고, 워커가 binary로 답하면 이진 프레임으로 보냄
+// 프레임 = 종류(1바이트) + 길이(4바이트, little-endian) + 페이로드 (pipe_transport.py와 같은 형식)
+const FRAME_AUDIO = 1;   // PCM 원본
+const FRAME_CONTROL = 2; // start/stop 등 JSON 명령
+const HELLO_TIMEOUT = 1000; // 이 시간 안에 답이 없으면 기존 JSON 줄 방식 (hello를 모르는 워커)
 
 class SttPipeClient extends EventEmitter {
     constructor() {
@@ -11,6 +16,10 @@ class SttPipeClient extends EventEmitter {
         this.client = null;
         this.isConnected = false;
         this.shouldReconnect = true; // 재연결 시도 여부
+        this.binary = false;      // 이진 프레임 사용 여부 (협상 결과)
+        this.negotiating = false; // hello 답을 기다리는 중 (그동안 보낼 메시지는 pending에 보관)
+        this.pending = [];
+        this.helloTimer = null;
     }
 
     connect() {
@@ -22,6 +31,7 @@ class SttPipeClient extends EventEmitter {
         this.client.on('connect', () => {
             console.log('[STT Pipe] ✅ 성공적으로 연결됨.');
             this.isConnected = true;
+            this.negotiate();
             this.emit('connected'); // main.js로 이벤트 전파
         });
 
@@ -36,6 +46,7 @@ class SttPipeClient extends EventEmitter {
                 if (jsonStr) {
                     try {
                         const jsonData = JSON.parse(jsonStr);
+                        if (jsonData.type === 'hello') { this.finishNegotiation(jsonData.framing === 'binary'); continue; }
                         // 파싱된 JSON 데이터를 main.js로 전파
                         this.emit('stt:data', jsonData);
                     } catch (e) {
@@ -47,13 +58,13 @@ class SttPipeClient extends EventEmitter {
 
         this.client.on('end', () => {
             console.log('[STT Pipe] ❌ 서버로부터 연결 끊김.');
-            this.isConnected = false; this.client = null;
+            this.isConnected = false; this.client = null; this.resetFraming();
             if (this.shouldReconnect) this.reconnect();
         });
 
         this.client.on('error', (err) => {
             console.error(`[STT Pipe] ❌ 연결 오류: ${err.message}`);
-            this.isConnected = false; if (this.client) this.client.destroy(); this.client = null;
+            this.isConnected = false; if (this.client) this.client.destroy(); this.client = null; this.resetFraming();
             if (this.shouldReconnect) this.reconnect();
         });
     }
@@ -63,24 +74,82 @@ class SttPipeClient extends EventEmitter {
         setTimeout(() => { this.connect(); }, RETRY_INTERVAL);
     }
 
+    negotiate() {
+        this.resetFraming();
+        this.negotiating = true;
+        this.client.write(JSON.stringify({ command: 'hello', framing: 'binary' }) + '\n', 'utf8');
+        this.helloTimer = setTimeout(() => {
+            console.warn('[STT Pipe] 전송 방식 협상 응답 없음. JSON 방식으로 전송합니다.');
+            this.finishNegotiation(false);
+        }, HELLO_TIMEOUT);
+    }
+
+    finishNegotiation(binary) {
+        if (!this.negotiating) return;
+        clearTimeout(this.helloTimer);
+        this.helloTimer = null;
+        this.negotiating = false;
+        this.binary = binary;
+        console.log(`[STT Pipe] 오디오 전송 방식: ${binary ? '이진 프레임' : 'JSON(base64)'}`);
+        const pending = this.pending;
+        this.pending = [];
+        for (const [type, payload] of pending) this.write(type, payload);
+    }
+
+    resetFraming() {
+        clearTimeout(this.helloTimer);
+        this.helloTimer = null;
+        this.binary = false;
+        this.negotiating = false;
+        this.pending = [];
+    }
+
+    // type: FRAME_CONTROL(payload는 JSON 문자열) | FRAME_AUDIO(payload는 Buffer)
+    write(type, payload) {
+        if (this.negotiating) { this.pending.push([type, payload]); return; }
+        if (!this.binary) {
+            const line = type === FRAME_AUDIO ? JSON.stringify({ chunk: payload.toString('base64') }) : payload;
+            this.client.write(line + '\n', 'utf8'); // 파이썬에서 \n 기준으로 읽으므로 추가
+            return;
+        }
+        const body = type === FRAME_AUDIO ? payload : Buffer.from(payload, 'utf8');
+        const header = Buffer.allocUnsafe(5);
+        header.writeUInt8(type, 0);
+        header.writeUInt32LE(body.length, 1);
+        this.client.cork(); // 헤더와 페이로드를 복사 없이 한 번에 전송
+        this.client.write(header);
+        this.client.write(body);
+        this.client.uncork();
+    }
+
     send(commandJson) {
         if (!this.isConnected || !this.client) {
             console.warn('[STT Pipe] 연결되지 않아 명령을 전송할 수 없습니다.');
             return;
         }
         try {
-            // 파이썬에서 \n 기준으로 읽으므로 추가
-            this.client.write(commandJson + '\n', 'utf8');
+            this.write(FRAME_CONTROL, commandJson);
         }
         catch (error) {
             console.error('[STT Pipe] 명령 전송 실패:', error);
         }
     }
 
+    // chunk: 16kHz mono PCM16 (Buffer)
+    sendAudio(chunk) {
+        if (!this.isConnected || !this.client) return;
+        try {
+            this.write(FRAME_AUDIO, chunk);
+        }
+        catch (error) {
+            console.error('[STT Pipe] 오디오 전송 실패:', error);
+        }
+    }
+
     disconnect() {
         this.shouldReconnect = false; // 수동 종료 시 재연결 방지
         if (this.client) { this.client.end(); this.client.destroy(); }
-        this.client = null; this.isConnected = false;
+        this.client = null; this.isConnected = false; this.resetFraming();
         console.log('[STT Pipe] 수동으로 연결 종료됨.');
     }
 }
@@ -10,6 +10,7 @@ class TtsPipeClient extends EventEmitter {
         this.client = null;
         this.reconnectInterval = 5000; // 5초 후 재시도
         this.buffer = ''; // 데이터 수신 버퍼
+        this.ready = false; // 파이썬 쪽 모델 준비 여부 ('READY' 수신 시 true)
     }
 
     connect() {
@@ -36,6 +37,11 @@ class TtsPipeClient extends EventEmitter {
                     // 'DONE'은 파이썬에서 오디오 재생이 끝났음을 의미
                     console.log("[TTS_KR Client] ◀ Python으로부터 'DONE' (재생 끝) 신호 수신");
                     this.emit('playback-finished'); // main.js로 이벤트 전파
+                } else if (trimmedMessage === 'READY') {
+                    // 'READY'는 모델 로딩/워밍업이 끝나 바로 합성할 수 있음을 의미 (그 전 요청은 큐에 쌓였다가 처리됨)
+                    console.log("[TTS_KR Client] ◀ Python으로부터 'READY' (합성 준비 완료) 신호 수신");
+                    this.ready = true;
+                    this.emit('ready');
                 } else if (trimmedMessage === 'START') {
                     // 'START'는 재생 시작을 의미 (현재 사용 안 함)
                 } else if (trimmedMessage) {
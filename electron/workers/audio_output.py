@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+스트리밍 오디오 출력 (tts_pipeline.py 공용)
+- sounddevice OutputStream 하나를 계속 열어두고, 오디오 콜백이 링 버퍼에서 블록 단위로 꺼내 재생합니다.
+- 세그먼트를 끊김 없이 이어 붙이고(짧은 크로스페이드), 중단 시 한 블록 안에 페이드아웃 후 버퍼를 비웁니다.
+- 재생 위치(콜백이 소비한 샘플 수)를 제공하므로 START/DONE 신호를 큐 상태가 아닌 실제 재생 시점에 보낼 수 있습니다.
+- null_speed를 주면 장치 대신 NullStream이 같은 콜백을 실제 시간(x null_speed)으로 불러, 소리 없이 재생 타이밍만 재현합니다.
+"""
+
+import time, threading
+import numpy as np
+try:
+    import sounddevice as sd
+except Exception as e: # PortAudio 없음 (리눅스 빌드 서버 등) -> 널 출력만 가능
+    sd, SOUNDDEVICE_ERROR = None, e
+
+BLOCK_MS = 20       # 콜백 블록 길이 (중단 시 무음까지 걸리는 최대 시간)
+BUFFER_SEC = 8.0    # 링 버퍼 길이. 더 긴 세그먼트는 재생되는 만큼 나눠서 채웁니다
+XFADE_MS = 5.0      # 세그먼트 경계 크로스페이드 길이
+
+
+class RingBuffer:
+    """단일 생산자/단일 소비자 int16 링 버퍼.
+    쓰기 위치는 생산자(재생 스레드)만, 읽기 위치는 소비자(오디오 콜백)만 갱신하므로 락이 필요 없습니다.
+    위치는 누적 샘플 수이며, 데이터 복사가 끝난 뒤에 위치를 갱신해 상대편에 공개합니다."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buf = np.zeros(capacity, dtype=np.int16)
+        self.write_pos = 0
+        self.read_pos = 0
+
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    def free(self):
+        return self.capacity - self.available()
+
+    def write(self, data):
+        n = min(len(data), self.free())
+        if n <= 0: return 0
+        i = self.write_pos % self.capacity
+        first = min(n, self.capacity - i)
+        self._buf[i:i + first] = data[:first]
+        if n > first: self._buf[:n - first] = data[first:n]
+        self.write_pos += n
+        return n
+
+    def read_into(self, out):
+        n = min(len(out), self.available())
+        if n <= 0: return 0
+        i = self.read_pos % self.capacity
+        first = min(n, self.capacity - i)
+        out[:first] = self._buf[i:i + first]
+        if n > first: out[first:n] = self._buf[:n - first]
+        self.read_pos += n
+        return n
+
+
+class NullStream:
+    """소리 없는 출력 스트림 (sounddevice.OutputStream 대역). 스레드 하나가 블록 길이 / speed 간격으로 콜백을 부릅니다."""
+
+    def __init__(self, samplerate, blocksize, callback, speed=1.0):
+        self.samplerate, self.blocksize, self.callback = samplerate, blocksize, callback
+        self.period = blocksize / float(samplerate) / max(speed, 1e-3)
+        self.latency = 0.0
+        self.active = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.active = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        out = np.zeros((self.blocksize, 1), dtype=np.int16)
+        t = time.perf_counter()
+        while not self._stop.is_set():
+            t += self.period
+            self._stop.wait(max(0.0, t - time.perf_counter()))
+            self.callback(out, self.blocksize, None, None)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join(1.0)
+        self.active = False
+
+    def close(self):
+        pass
+
+
+class StreamingOutput:
+    """모노 int16 연속 출력 스트림. null_speed를 주면 장치 없이 NullStream으로 재생 시간만 흘려보냅니다."""
+
+    def __init__(self, samplerate, device=None, block_ms=BLOCK_MS, buffer_sec=BUFFER_SEC, xfade_ms=XFADE_MS, null_speed=None):
+        self.samplerate = int(samplerate)
+        self.null_speed = null_speed
+        self.blocksize = max(64, int(self.samplerate * block_ms / 1000.0))
+        self.ring = RingBuffer(int(self.samplerate * buffer_sec))
+        self.xfade = int(self.samplerate * xfade_ms / 1000.0)
+        self._ramp = np.linspace(0.0, 1.0, self.xfade, dtype=np.float32) if self.xfade > 1 else None
+        self._tail = None            # 다음 세그먼트와 크로스페이드할 이전 세그먼트의 끝부분 (아직 링에 넣지 않음)
+        self._flush_req = 0          # 생산자 -> 콜백 비우기 요청 번호
+        self._flush_ack = 0
+        self._block_evt = threading.Event()
+        self.underflows = 0 # 장치 출력 언더플로 횟수 (PortAudio 보고)
+        if null_speed is not None:
+            self._stream = NullStream(self.samplerate, self.blocksize, self._callback, null_speed)
+        elif sd is None:
+            raise RuntimeError(f"sounddevice unavailable: {SOUNDDEVICE_ERROR}")
+        else:
+            self._stream = sd.OutputStream(samplerate=self.samplerate, channels=1, dtype='int16', blocksize=self.blocksize,
+                                           device=device, callback=self._callback)
+        self._stream.start()
+        self.latency_samples = int(float(self._stream.latency or 0.0) * self.samplerate)
+
+    def close(self):
+        try:
+            self._stream.stop()
+            self._stream.close()
+        except Exception: pass
+
+    # --- 오디오 콜백 (PortAudio 스레드) ---
+    def _callback(self, outdata, frames, time_info, status):
+        out = outdata[:, 0]
+        ring = self.ring
+        if self._flush_req != self._flush_ack:
+            # 남은 한 블록만 페이드아웃으로 내보내고 나머지는 버림
+            end = ring.write_pos
+            n = ring.read_into(out)
+            if n: out[:n] = (out[:n] * np.linspace(1.0, 0.0, n, dtype=np.float32)).astype(np.int16)
+            out[n:] = 0
+            ring.read_pos = max(ring.read_pos, end)
+            self._flush_ack = self._flush_req
+        else:
+            n = ring.read_into(out)
+            if n < frames: out[n:] = 0
+        if status and status.output_underflow: self.underflows += 1
+        self._block_evt.set()
+
+    # --- 생산자 (재생 스레드) ---
+    def played_pos(self):
+        """스피커로 실제 나간 누적 샘플 위치 (장치 출력 지연 반영)"""
+        return max(0, self.ring.read_pos - self.latency_samples)
+
+    def queued_pos(self):
+        """지금까지 링에 넣은 누적 샘플 위치 (크로스페이드용으로 보류한 꼬리는 제외)"""
+        return self.ring.write_pos
+
+    def has_tail(self):
+        return self._tail is not None
+
+    def buffered_sec(self):
+        return self.ring.available() / float(self.samplerate)
+
+    def wait_block(self, timeout=None):
+        """콜백이 다음 블록을 소비할 때까지 대기 (폴링 대신 사용)"""
+        self._block_evt.wait(timeout if timeout is not None else 2.0 * self.blocksize / self.samplerate)
+        self._block_evt.clear()
+
+    def write_segment(self, audio, tick):
+        """세그먼트를 이전 세그먼트 꼬리와 크로스페이드해 이어 붙입니다. 끝부분 xfade 샘플은 다음 세그먼트를 위해 보류합니다.
+        링이 가득 차면 블록 단위로 기다리며, 기다리는 동안 tick()을 호출하고 tick()이 True를 반환하면 중단합니다."""
+        audio = np.asarray(audio, dtype=np.int16)
+        xf = self.xfade
+        if self._ramp is None:
+            return self._write_all(audio, tick)
+        body = audio
+        if self._tail is not None:
+            tail, self._tail = self._tail, None
+            if audio.size > xf:
+                head = tail.astype(np.float32) * self._ramp[::-1]
+                head += audio[:xf].astype(np.float32) * self._ramp
+                if not self._write_all(np.clip(head, -32768, 32767).astype(np.int16), tick): return False
+                body = audio[xf:]
+            elif not self._write_all(tail, tick): return False
+        if body.size > xf:
+            self._tail = body[-xf:].copy()
+            body = body[:-xf]
+        return self._write_all(body, tick)
+
+    def release_tail(self):
+        """다음 세그먼트가 없으면 보류한 꼬리를 그대로 내보냅니다."""
+        if self._tail is not None:
+            tail, self._tail = self._tail, None
+            self.ring.write(tail)
+
+    def _write_all(self, data, tick):
+        pos = 0
+        while pos < len(data):
+            pos += self.ring.write(data[pos:])
+            if pos < len(data):
+                if tick(): return False
+                self.wait_block()
+        return True
+
+    def flush(self):
+        """재생 중인 오디오를 한 블록 안에 멈춥니다."""
+        self._tail = None
+        self._flush_req += 1
+        if not self._stream.active:
+            self.ring.read_pos = self.ring.write_pos
+            self._flush_ack = self._flush_req
+            return
+        for _ in range(5): # 콜백이 요청을 처리할 때까지 (보통 1블록)
+            if self._flush_ack == self._flush_req: break
+            self.wait_block()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+세그먼트 배치 합성 벤치마크 (CLI)
+- 답변 코퍼스(bench/corpus/kiosk_answers_<lang>.txt 또는 --sentences)를 split_chunks로 나눈 세그먼트를 차례대로 배치 크기만큼 묶어
+  합성 엔진의 synthesize_batch로 합성합니다. (배치 크기 1은 파이프라인의 단독 합성과 같은 synthesize)
+- 배치 크기마다 처리량(합성 오디오 초 / 벽시계 초), 배치 하나의 지연(= 그 배치 첫 세그먼트가 나오기까지), 전체 RTF를 잽니다.
+  파이프라인은 재생이 기다리는 세그먼트를 배치하지 않으므로, 배치 지연은 뒤 세그먼트의 준비 시간에만 더해집니다.
+- 기본은 실제 MeloTTS 모델(LocalEngine, 고속 추론 설정은 호스트와 같은 환경 변수)이고,
+  --mock이면 bench/mock_tts.MockEngine으로 (--call-ms / --batch-gain으로 배치 이득을 정해) 측정 코드만 확인합니다.
+- 결과 표와 [BENCH] report JSON 한 줄을 출력합니다.
+
+사용 예:
+    python bench/bench_batch.py --lang KR
+    python bench/bench_batch.py --lang EN --batch-sizes 1,2,4 --repeat 3 --sentences my_sentences.txt
+    python bench/bench_batch.py --mock --call-ms 20 --batch-gain 0.3
+"""
+
+import os, sys, json, time, argparse, tempfile, shutil, statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+from tts_profiles import PROFILES, pick_speaker_id
+from tts_text import split_chunks
+from mock_tts import MockEngine
+
+
+def read_sentences(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def run_size(engine, spk_id, speed, segments, size, repeat):
+    """segments를 size개씩 묶어 합성하고 (처리량, 배치 지연, RTF) 요약을 반환합니다."""
+    sr = engine.sample_rate
+    latency, synth_sec, audio_sec = [], 0.0, 0.0
+    for _ in range(repeat):
+        for k in range(0, len(segments), size):
+            group = segments[k:k + size]
+            t0 = time.perf_counter()
+            if size == 1: audio = [engine.synthesize(group[0], spk_id, speed)]
+            else: audio = engine.synthesize_batch([(seg, spk_id) for seg in group], speed)
+            sec = time.perf_counter() - t0
+            latency.append(sec * 1000)
+            synth_sec += sec
+            audio_sec += sum(a.size for a in audio if a is not None) / sr
+    return {"batches": len(latency), "throughput": round(audio_sec / max(synth_sec, 1e-6), 3),
+            "rtf": round(synth_sec / max(audio_sec, 1e-6), 4), "latency_ms_mean": round(statistics.mean(latency), 1),
+            "latency_ms_max": round(max(latency), 1), "audio_sec": round(audio_sec, 2), "synth_sec": round(synth_sec, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure TTS throughput and latency versus segment batch size.")
+    parser.add_argument('--lang', choices=sorted(PROFILES), default='KR')
+    parser.add_argument('--batch-sizes', default='1,2,4,8', help="측정할 배치 크기 (쉼표 구분)")
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--sentences', help="측정 문장 파일 (한 줄에 한 문장). 기본: 답변 코퍼스")
+    parser.add_argument('--limit', type=int, default=40, help="사용할 세그먼트 수 상한")
+    parser.add_argument('--mock', action='store_true', help="실제 모델 대신 가짜 엔진 사용")
+    MockEngine.add_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception: pass
+
+    profile = PROFILES[args.lang]
+    sentences = read_sentences(args.sentences or os.path.join(BENCH_DIR, 'corpus', f'kiosk_answers_{args.lang.lower()}.txt'))
+    segments = [seg for text in sentences for seg in split_chunks(text, args.lang)][:args.limit]
+    sizes = [int(x) for x in args.batch_sizes.split(',') if x.strip()]
+    tmpdir = tempfile.mkdtemp(prefix="_melo_bench_")
+    results = {}
+    try:
+        if args.mock:
+            engine, spk_id = MockEngine.from_args(args, profile["default_sr"]), 0
+        else:
+            from build_tts_pack import prepare_language # HF 캐시 경로 설정 포함 (워커와 같은 모델 리비전)
+            from tts_synth import load_tts, LocalEngine
+            prepare_language(args.lang)
+            tts = load_tts(profile)
+            spk_id = pick_speaker_id(tts, profile)
+            engine = LocalEngine(tts, tmpdir, int(getattr(tts.hps.data, "sampling_rate", profile["default_sr"])))
+        print(f"[BENCH] {args.lang}: {len(segments)} segments x {args.repeat}, batch sizes {sizes}, {os.cpu_count()} CPUs, "
+              f"engine={getattr(engine, 'variant', '') or 'fp32'}", flush=True)
+        for text in profile["warmup_texts"]: engine.synthesize(text, spk_id, profile["speed"])
+        for size in sizes:
+            results[size] = run_size(engine, spk_id, profile["speed"], segments, size, args.repeat)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    base = results.get(1)
+    print(f"\n[BENCH] {'batch':>5} {'batches':>7} {'audio/s':>8} {'speedup':>7} {'RTF':>7} {'lat avg':>9} {'lat max':>9}")
+    for size, r in results.items():
+        speedup = r["throughput"] / base["throughput"] if base else 1.0
+        print(f"[BENCH] {size:5d} {r['batches']:7d} {r['throughput']:8.2f} {speedup:6.2f}x {r['rtf']:7.3f} "
+              f"{r['latency_ms_mean']:7.0f}ms {r['latency_ms_max']:7.0f}ms")
+    print(f"[BENCH] report {json.dumps({'language': args.lang, 'segments': len(segments), 'mock': args.mock, 'results': results})}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
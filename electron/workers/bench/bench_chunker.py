@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+텍스트 분할 벤치마크 (CLI)
+- 키오스크 답변 코퍼스를 기존 고정 길이 분할(첫 60자 / 이후 구두점 기준 최대 250자)과 적응형 분할(tts_text.split_chunks)로 나눠
+  첫 오디오까지의 시간(TTFA), 재생 언더런(다음 세그먼트가 준비되기 전에 재생이 끝난 횟수와 총 공백 시간),
+  첫 세그먼트가 어절/단어 중간에서 잘린 횟수를 비교합니다.
+- 기본은 모델 없이 합성 시간을 '세그먼트 고정 비용 + RTF x 오디오 길이'로 가정한 시뮬레이션이며, 여러 RTF에서 비교합니다.
+- --real 을 주면 실제 MeloTTS로 세그먼트를 합성 스레드 N개에서 합성해 측정한 시간으로 비교합니다.
+  (적응형 분할은 파이프라인처럼 측정된 RTF 이동 평균을 사용)
+
+사용 예:
+    python bench/bench_chunker.py --lang KR
+    python bench/bench_chunker.py --lang EN --rtf 0.3,0.6,0.9 --workers 2
+    python bench/bench_chunker.py --lang KR --real --corpus bench/corpus/kiosk_answers_kr.txt --from-js ../src/services/kiosk/knowledgeBase.js
+"""
+
+import os, re, sys, json, time, argparse, tempfile, shutil, statistics
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+from build_tts_pack import read_phrase_file, extract_js_phrases, prepare_language
+from tts_profiles import PROFILES, pick_speaker_id
+from tts_text import split_chunks
+
+# 시뮬레이션용 발화 속도 (speed 1.0 기준 초당 글자 수, 공백 포함) 와 세그먼트당 고정 비용 (텍스트 전처리/BERT 등)
+CHARS_PER_SEC = {"KR": 6.5, "EN": 14.0}
+SEGMENT_OVERHEAD_SEC = 0.08
+LEGACY_PUNCT = {"KR": r'.?!。？！,;、，', "EN": r'.?!,;'}
+
+
+def legacy_split(text, language, first_len=60, rest_len=250):
+    """기존 split_chunks (비교 기준)"""
+    punct = LEGACY_PUNCT.get(language, LEGACY_PUNCT["EN"])
+    text = text.strip()
+    if not text: return []
+    if len(text) <= first_len: return [text]
+    chunks = [text[:first_len]]
+    parts = [p for p in re.split(f'([{punct}])', text[first_len:]) if p]
+    buf, out = "", []
+    for p in parts:
+        buf += p
+        if re.search(f'[{punct}]$', p) or len(buf) >= rest_len:
+            out.append(buf.strip())
+            buf = ""
+    if buf.strip(): out.append(buf.strip())
+    return [c for c in chunks + out if c]
+
+
+def cut_mid_word(text, first_seg):
+    """첫 세그먼트 바로 뒤가 공백/끝이 아니면 어절(단어) 중간에서 잘린 것"""
+    n = len(first_seg)
+    return n < len(text) and not text[n].isspace() and not text[n - 1].isspace()
+
+
+def playback(ready, durations):
+    """세그먼트별 준비 시각/오디오 길이로 재생을 따라가며 (TTFA, 언더런 횟수, 총 공백 초)를 계산합니다."""
+    t = ready[0]
+    underruns, gap = 0, 0.0
+    for k in range(len(ready)):
+        if k and ready[k] > t:
+            underruns += 1
+            gap += ready[k] - t
+            t = ready[k]
+        t += durations[k]
+    return ready[0], underruns, gap
+
+
+def simulate(segs, language, rtf, workers, speed):
+    """합성 스레드 workers개가 세그먼트를 순서대로 가져가 합성한다고 가정한 준비 시각/길이"""
+    cps = CHARS_PER_SEC[language] * speed
+    free = [0.0] * workers
+    ready, durations = [], []
+    for seg in segs:
+        dur = len(seg) / cps
+        w = min(range(workers), key=free.__getitem__)
+        free[w] += SEGMENT_OVERHEAD_SEC + rtf * dur
+        ready.append(free[w])
+        durations.append(dur)
+    return ready, durations
+
+
+def summarize(rows):
+    ttfa = sorted(r[0] for r in rows)
+    return {"ttfa_mean": statistics.mean(ttfa), "ttfa_p90": ttfa[min(len(ttfa) - 1, int(0.9 * len(ttfa)))],
+            "underruns": sum(r[1] for r in rows), "gap_sec": sum(r[2] for r in rows),
+            "segments": sum(r[3] for r in rows), "mid_word_cuts": sum(r[4] for r in rows)}
+
+
+def run_simulated(corpus, language, rtfs, workers):
+    speed = PROFILES[language]["speed"]
+    results = {}
+    for rtf in rtfs:
+        for name, split in (("legacy", lambda t: legacy_split(t, language)),
+                            ("adaptive", lambda t: split_chunks(t, language, rtf, workers))):
+            rows = []
+            for text in corpus:
+                segs = split(text)
+                rows.append(playback(*simulate(segs, language, rtf, workers, speed)) + (len(segs), cut_mid_word(text, segs[0])))
+            results[f"{name} @ rtf {rtf:.2f}"] = summarize(rows)
+    return results
+
+
+def run_real(corpus, language, workers):
+    from tts_synth import load_tts, LocalEngine
+    from tts_pipeline import Voice # RTF 이동 평균을 파이프라인과 같은 방식으로 계산
+    profile = PROFILES[language]
+    prepare_language(language)
+    tmpdir = tempfile.mkdtemp(prefix="_melo_bench_")
+    try:
+        tts = load_tts(profile)
+        spk_id = pick_speaker_id(tts, profile)
+        sr = int(getattr(tts.hps.data, "sampling_rate", profile["default_sr"]))
+        engine = LocalEngine(tts, tmpdir, sr)
+        voice = Voice(profile, engine, spk_id, cache=None)
+        for text in profile["warmup_texts"]: engine.synthesize(text, spk_id, profile["speed"])
+
+        def synth(seg):
+            t0 = time.perf_counter()
+            audio = engine.synthesize(seg, spk_id, profile["speed"])
+            n = 0 if audio is None else audio.size
+            voice.observe_rtf(time.perf_counter() - t0, n)
+            return time.perf_counter(), n / sr
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for name, split in (("legacy", lambda t: legacy_split(t, language)),
+                                ("adaptive", lambda t: split_chunks(t, language, voice.rtf, workers))):
+                rows = []
+                for text in corpus:
+                    segs = split(text)
+                    t0 = time.perf_counter()
+                    done = [f.result() for f in [pool.submit(synth, seg) for seg in segs]]
+                    rows.append(playback([t - t0 for t, _ in done], [d for _, d in done]) + (len(segs), cut_mid_word(text, segs[0])))
+                results[name] = summarize(rows)
+        results["measured_rtf"] = voice.rtf
+        return results
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fixed-length and adaptive TTS text chunking on kiosk answers.")
+    parser.add_argument('--lang', choices=sorted(PROFILES), default='KR')
+    parser.add_argument('--corpus', action='append', default=[], help="답변 파일 (한 줄에 한 답변). 기본: bench/corpus/kiosk_answers_<lang>.txt")
+    parser.add_argument('--from-js', action='append', default=[], help="문구를 추가로 뽑을 JS 소스 (build_tts_pack.py와 같은 규칙)")
+    parser.add_argument('--rtf', default='0.2,0.5,0.9', help="시뮬레이션 RTF 목록 (쉼표 구분)")
+    parser.add_argument('--workers', type=int, default=2, help="동시 합성 스레드 수 (호스트의 N_SYNTH_WORKERS와 같게)")
+    parser.add_argument('--real', action='store_true', help="실제 모델로 합성해 측정")
+    args = parser.parse_args()
+
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception: pass
+
+    corpus = []
+    for path in args.corpus or [os.path.join(BENCH_DIR, 'corpus', f"kiosk_answers_{args.lang.lower()}.txt")]:
+        corpus += read_phrase_file(path)
+    for path in args.from_js:
+        corpus += extract_js_phrases(path, args.lang)
+    corpus = [" ".join(t.split()) for t in corpus] # 기존 분할도 같은 조건에서 비교 (적응형은 공백을 합침)
+    print(f"[BENCH] {args.lang}: {len(corpus)} answers, avg {statistics.mean(len(t) for t in corpus):.0f} chars, "
+          f"{args.workers} worker(s), {'real model' if args.real else 'simulated'}", flush=True)
+
+    if args.real:
+        results = run_real(corpus, args.lang, args.workers)
+        print(f"[BENCH] measured RTF (EMA): {results['measured_rtf']:.3f}")
+    else:
+        results = run_simulated(corpus, args.lang, [float(r) for r in args.rtf.split(',')], args.workers)
+
+    print(f"\n[BENCH] {'splitter':<22} {'TTFA avg':>9} {'TTFA p90':>9} {'underruns':>10} {'gap(s)':>8} {'segments':>9} {'mid-word':>9}")
+    for name, r in results.items():
+        if not isinstance(r, dict): continue
+        print(f"[BENCH] {name:<22} {r['ttfa_mean']:8.3f}s {r['ttfa_p90']:8.3f}s {r['underruns']:10d} {r['gap_sec']:8.2f} {r['segments']:9d} {r['mid_word_cuts']:9d}")
+    print(f"[BENCH] report {json.dumps({'language': args.lang, 'workers': args.workers, 'real': args.real, 'results': results})}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+CPU 추론 모드 벤치마크 (CLI)
+- 같은 문장들을 기존 fp32 경로와 고속 추론 모드(동적 INT8 양자화 + 합성 스레드별 torch 스레드 고정)로 합성해 비교합니다.
+- 파이프라인처럼 split_chunks로 나눈 세그먼트를 합성 스레드 N개에 나눠 맡기고,
+  첫 세그먼트가 나오는 시간(TTFA, 재생 시작 가능 시점)과 RTF(합성 시간 / 오디오 길이)를 잽니다.
+- 모드마다 워밍업 후 측정하며, 결과 표와 JSON 한 줄을 출력합니다.
+
+사용 예:
+    python bench/bench_inference.py --lang KR
+    python bench/bench_inference.py --lang EN --workers 2 --repeat 3 --quantize bert,acoustic --sentences my_sentences.txt
+"""
+
+import os, sys, json, time, argparse, tempfile, shutil, statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from build_tts_pack import prepare_language # HF 캐시 경로 설정 포함 (워커와 같은 모델 리비전)
+from tts_profiles import PROFILES, pick_speaker_id
+from tts_text import split_chunks
+
+DEFAULT_SENTENCES = {
+    "KR": ["안녕하세요.",
+           "원하시는 메뉴를 화면에서 선택해 주세요.",
+           "이곳은 조선 시대에 지어진 건축물로, 당시 지방 행정의 중심지 역할을 했으며 지금은 문화재로 지정되어 일반에 공개되고 있습니다. 관람 시간은 오전 아홉 시부터 오후 여섯 시까지입니다."],
+    "EN": ["Hello.",
+           "Please select a menu on the screen.",
+           "This building was constructed during the Joseon dynasty and served as the center of local administration. Today it is designated as a cultural heritage site and is open to the public from nine in the morning until six in the evening."],
+}
+
+
+def run_mode(engine, spk_id, profile, sentences, workers, repeat):
+    """문장마다 (TTFA, 전체 합성 시간, 오디오 길이)를 측정해 요약을 반환합니다."""
+    speed, sr = profile["speed"], engine.sample_rate
+    for text in profile["warmup_texts"]: engine.synthesize(text, spk_id, speed)
+    ttfa, rtf, synth_sec, audio_sec = [], [], 0.0, 0.0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in range(repeat):
+            for text in sentences:
+                segs = split_chunks(text, profile["language"])
+                t0 = time.perf_counter()
+                futures = [pool.submit(engine.synthesize, seg, spk_id, speed) for seg in segs]
+                futures[0].result()
+                t_first = time.perf_counter() - t0
+                n = sum(a.size for a in (f.result() for f in futures) if a is not None)
+                total = time.perf_counter() - t0
+                ttfa.append(t_first)
+                rtf.append(total / max(n / sr, 1e-6))
+                synth_sec += total
+                audio_sec += n / sr
+    return {"ttfa_mean": statistics.mean(ttfa), "ttfa_max": max(ttfa), "rtf_mean": statistics.mean(rtf),
+            "rtf_total": synth_sec / max(audio_sec, 1e-6), "audio_sec": audio_sec, "synth_sec": synth_sec}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fp32 and fast (INT8 + thread-tuned) MeloTTS inference on CPU.")
+    parser.add_argument('--lang', choices=sorted(PROFILES), default='KR')
+    parser.add_argument('--workers', type=int, default=2, help="동시 합성 스레드 수 (호스트의 N_SYNTH_WORKERS와 같게)")
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--quantize', default='bert', help="양자화 대상 (bert, acoustic, 쉼표 구분)")
+    parser.add_argument('--sentences', help="측정 문장 파일 (한 줄에 한 문장). 기본: 내장 짧은/중간/긴 문장")
+    args = parser.parse_args()
+
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception: pass
+
+    import torch
+    from tts_synth import load_tts, LocalEngine, quantize_int8, model_variant, threads_per_worker, configure_interop_threads
+
+    profile = PROFILES[args.lang]
+    if args.sentences:
+        with open(args.sentences, encoding='utf-8') as f:
+            sentences = [line.strip() for line in f if line.strip()]
+    else:
+        sentences = DEFAULT_SENTENCES[args.lang]
+    prepare_language(args.lang)
+    tmpdir = tempfile.mkdtemp(prefix="_melo_bench_")
+    results = {}
+    try:
+        tts = load_tts(profile)
+        spk_id = pick_speaker_id(tts, profile)
+        sr = int(getattr(tts.hps.data, "sampling_rate", profile["default_sr"]))
+        print(f"[BENCH] {args.lang}: {len(sentences)} sentences x {args.repeat}, {args.workers} worker(s), "
+              f"{os.cpu_count()} CPUs, torch default threads={torch.get_num_threads()}", flush=True)
+
+        # 1) 기존 경로: fp32, torch 기본 스레드 설정
+        results["fp32"] = run_mode(LocalEngine(tts, tmpdir, sr), spk_id, profile, sentences, args.workers, args.repeat)
+
+        # 2) 고속 추론 모드: 동적 INT8 + 합성 스레드별 intra-op 스레드 고정
+        configure_interop_threads()
+        quantized = quantize_int8(tts, profile, args.quantize.split(','))
+        n_threads = threads_per_worker(args.workers)
+        label = f"fast ({model_variant(quantized) or 'fp32'}, {n_threads} thr/worker)"
+        results[label] = run_mode(LocalEngine(tts, tmpdir, sr, n_threads), spk_id, profile, sentences, args.workers, args.repeat)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(f"\n[BENCH] {'mode':<36} {'TTFA avg':>9} {'TTFA max':>9} {'RTF avg':>8} {'RTF tot':>8} {'audio(s)':>9}")
+    for name, r in results.items():
+        print(f"[BENCH] {name:<36} {r['ttfa_mean']:8.3f}s {r['ttfa_max']:8.3f}s {r['rtf_mean']:8.3f} {r['rtf_total']:8.3f} {r['audio_sec']:9.1f}")
+    print(f"[BENCH] report {json.dumps({'language': args.lang, 'workers': args.workers, 'results': results})}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+파이프 신호 지연 벤치마크 (CLI, Windows 전용, 모델 불필요)
+- 서버가 신호(START/DONE/STT 결과 역할)를 보낸 시각부터 클라이언트가 받은 시각까지의 지연을 비교합니다.
+  legacy : 기존 run_pipe_loop (블로킹 ReadFile 사이에서만 신호 큐를 비움 -> 클라이언트가 다음 메시지를 보내야 나감)
+  duplex : pipe_transport.PipeServer (오버랩드 I/O, 읽기/쓰기 분리 -> send() 즉시 나감)
+- 클라이언트는 --client-interval 간격으로 메시지를 보냅니다. (STT 오디오 청크 ~0.1초, TTS 요청은 수 초 이상 간격)
+- 서버와 클라이언트를 한 프로세스에서 돌려 같은 perf_counter로 지연을 잽니다.
+
+사용 예:
+    python bench/bench_pipe_signal.py
+    python bench/bench_pipe_signal.py --client-interval 0.1,1,5 --seconds 20
+"""
+
+import os, sys, json, time, queue, random, argparse, threading, statistics
+import pywintypes, win32pipe, win32file, win32con
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipe_transport import PipeServer, connect_pipe
+
+PIPE_NAME = r"\\.\pipe\kiosk_bench_signal"
+
+
+# --- 기존 파이프 루프 (비교 기준) ---
+def legacy_server(stop_evt, signal_q):
+    """기존 run_pipe_loop와 같은 구조(신호 전송 -> 블로킹 ReadFile 반복)로 연결 하나를 처리합니다.
+    (다음 경우의 서버가 같은 파이프 이름을 쓸 수 있도록 재연결 루프는 없음)"""
+    handle = win32pipe.CreateNamedPipe(PIPE_NAME, win32con.PIPE_ACCESS_DUPLEX,
+                                       win32pipe.PIPE_TYPE_MESSAGE | win32pipe.PIPE_READMODE_MESSAGE | win32pipe.PIPE_WAIT,
+                                       1, 65536, 65536, 0, None)
+    try:
+        win32pipe.ConnectNamedPipe(handle, None)
+        while not stop_evt.is_set():
+            try:
+                signal = signal_q.get_nowait()
+                win32file.WriteFile(handle, signal)
+            except queue.Empty: pass
+            win32file.ReadFile(handle, 4096)
+    except pywintypes.error: pass # 클라이언트 연결 끊김
+    finally:
+        win32file.CloseHandle(handle)
+
+
+def run_case(mode, client_interval, seconds, signal_interval):
+    stop_evt = threading.Event()
+    latencies = []
+
+    def on_line(conn, line):
+        if line.startswith(b"SIG "): latencies.append(time.perf_counter() - float(line[4:]))
+
+    if mode == "legacy":
+        signal_q = queue.Queue()
+        emit = lambda data: signal_q.put(data)
+        server = threading.Thread(target=legacy_server, args=(stop_evt, signal_q), daemon=True)
+        server.start()
+    else:
+        server = PipeServer(PIPE_NAME, lambda conn, line: None, name="BENCH", instances=2).start()
+        emit = server.send
+    time.sleep(0.2)
+    client = connect_pipe(PIPE_NAME, on_line)
+    time.sleep(0.2)
+
+    sent, t_end = 0, time.perf_counter() + seconds
+    next_client = next_signal = time.perf_counter()
+    while time.perf_counter() < t_end:
+        now = time.perf_counter()
+        if now >= next_client:
+            client.send(b'{"command":"noop"}\n')
+            next_client += client_interval
+        if now >= next_signal:
+            emit(f"SIG {time.perf_counter()!r}\n".encode())
+            sent += 1
+            next_signal += random.uniform(0.5, 1.5) * signal_interval
+        time.sleep(0.001)
+    client.send(b'{"command":"noop"}\n') # 기존 루프에 남은 신호를 내보내도록 한 번 더
+    time.sleep(0.2)
+
+    stop_evt.set()
+    client.close()
+    client.join(2.0)
+    if mode == "legacy": server.join(2.0)
+    else: server.close()
+    lat = sorted(latencies)
+    pct = lambda p: lat[min(len(lat) - 1, int(p * len(lat)))] * 1000 if lat else float('nan')
+    return {"mode": mode, "client_interval": client_interval, "sent": sent, "received": len(lat),
+            "mean_ms": statistics.mean(lat) * 1000 if lat else float('nan'), "p50_ms": pct(0.5), "p95_ms": pct(0.95),
+            "max_ms": lat[-1] * 1000 if lat else float('nan')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure named-pipe signal latency for the legacy loop and the full-duplex transport.")
+    parser.add_argument('--client-interval', default='0.1,1,5', help="클라이언트 메시지 간격 목록(초, 쉼표 구분)")
+    parser.add_argument('--signal-interval', type=float, default=0.3, help="서버 신호 평균 간격(초)")
+    parser.add_argument('--seconds', type=float, default=10.0, help="경우마다 측정 시간(초)")
+    args = parser.parse_args()
+
+    results = []
+    for interval in [float(v) for v in args.client_interval.split(',')]:
+        for mode in ("legacy", "duplex"):
+            results.append(run_case(mode, interval, args.seconds, args.signal_interval))
+            time.sleep(0.3)
+
+    print(f"[BENCH] {'mode':<7} {'client every':>12} {'sent':>5} {'recv':>5} {'mean(ms)':>9} {'p50(ms)':>8} {'p95(ms)':>8} {'max(ms)':>8}")
+    for r in results:
+        print(f"[BENCH] {r['mode']:<7} {r['client_interval']:11.2f}s {r['sent']:5d} {r['received']:5d} "
+              f"{r['mean_ms']:9.2f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['max_ms']:8.2f}")
+    print(f"[BENCH] report {json.dumps(results)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
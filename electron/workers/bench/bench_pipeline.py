@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 파이프라인 회귀 벤치마크 (CLI, 리눅스/Windows, 모델/오디오 장치 불필요)
+- 실제 TtsPipeline(파이프 수신 -> split_chunks -> 합성 워커 -> 캐시 -> 순서 복원 -> 재생 워커 -> START/DONE)을 그대로 띄우고
+  합성만 bench/mock_tts.MockEngine(결정적, 비용 조절), 재생은 널 출력(audio_output.NullStream)으로 바꿔 측정합니다.
+  전송은 pipe_transport.open_server() 그대로 (Windows: Named Pipe, 리눅스: Unix 도메인 소켓) 클라이언트로 붙어 요청을 보냅니다.
+- 요청: --traffic 으로 키오스크에서 기록한 요청(MELO_TTS_TRAFFIC_LOG 파일)을 재생하거나,
+  없으면 답변 코퍼스(bench/corpus/kiosk_answers_<lang>.txt)를 한 줄씩 보냅니다. --repeat 만큼 반복(두 번째부터 캐시 적중)
+- --pace closed(기본): 발화마다 DONE까지 기다린 뒤 다음 요청 (기록에서 stop이 뒤따르면 기록된 간격만큼만 기다림)
+  --pace recorded: 기록된 수신 시각 간격(/ --time-scale)대로 보냄
+- 보고: 처리량(발화/초, 합성 오디오 초/초), TTFA(요청 전송 -> START 수신) p50/p90/p95/p99, 캐시 적중률,
+  발화당 CPU(프로세스 전체 / 가짜 엔진을 뺀 파이프라인 자체), 발화당 로그 CPU(kiosk_log 호출 + 쓰기 스레드)와 줄 수, stop 지연.
+  --log-level로 로그 레벨을 바꿔 비교합니다. (DEBUG: 개발 모드, INFO: 배포 모드 기본) 마지막 줄은 [BENCH] report JSON
+- --batch-max로 합성 워커의 세그먼트 배치(MELO_TTS_BATCH_MAX)를 켭니다. 가짜 엔진의 배치 이득은 --call-ms / --batch-gain으로 정합니다.
+  배치는 재생이 앞서 있을 만큼만 묶으므로 --playback-speed를 키우면(재생이 빨리 끝나면) 거의 묶이지 않습니다. 배치 크기는 report의 histograms.batch_size
+
+사용 예:
+    python bench/bench_pipeline.py
+    python bench/bench_pipeline.py --lang EN --repeat 3 --rtf 0.5 --playback-speed 20
+    python bench/bench_pipeline.py --log-level INFO --log-format json
+    python bench/bench_pipeline.py --batch-max 4 --call-ms 20 --batch-gain 0.3 --rtf 0.1 --playback-speed 1 --pace recorded --time-scale 10
+    python bench/bench_pipeline.py --traffic D:/kiosk_logs/tts_traffic.jsonl --pace recorded --time-scale 5
+"""
+
+import os, sys, json, time, argparse, threading
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+import tts_pipeline
+import kiosk_log
+from tts_pipeline import TtsPipeline, Voice
+from tts_profiles import PROFILES
+from tts_cache import AudioLRUCache
+from kiosk_metrics import Histogram
+from pipe_transport import connect
+from mock_tts import MockEngine
+
+SIGNAL_TIMEOUT_SEC = 60
+
+
+def read_traffic(path, language):
+    """MELO_TTS_TRAFFIC_LOG 기록 -> [(수신 시각, 요청)]. 다른 언어 파이프로 받은 요청은 lang을 붙여 이 파이프로 보냅니다."""
+    events = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip(): continue
+            rec = json.loads(line)
+            request = dict(rec["request"])
+            if rec.get("pipe", language) != language and request.get("text"): request.setdefault("lang", rec["pipe"])
+            events.append((rec["t"], request))
+    return events
+
+
+def corpus_traffic(language):
+    path = os.path.join(BENCH_DIR, 'corpus', f'kiosk_answers_{language.lower()}.txt')
+    with open(path, encoding='utf-8') as f:
+        return [(float(k), {"text": line.strip()}) for k, line in enumerate(l for l in f if l.strip() and not l.startswith('#'))]
+
+
+class Client:
+    """벤치마크 클라이언트. 소리가 안 나는 동안 보낸 발화는 다음 START까지의 시간을 TTFA(ms)로 ttfa에 모읍니다.
+    (재생 중에 보낸 발화는 이어서 재생되어 START가 따로 오지 않으므로 재지 않음)"""
+
+    def __init__(self, pipe_name):
+        self._lock = threading.Lock()
+        self.playing = False
+        self.pending = None # TTFA를 재는 중인 요청의 전송 시각
+        self.ttfa, self.dropped = [], 0
+        self.ready, self.done = threading.Event(), threading.Event()
+        self.conn = connect(pipe_name, self._on_line, name="BENCH")
+
+    def _on_line(self, conn, line):
+        t, line = time.perf_counter(), line.strip()
+        with self._lock:
+            if line == b"READY": self.ready.set()
+            elif line == b"START":
+                self.playing = True
+                if self.pending is not None: self.ttfa.append((t - self.pending) * 1000)
+                self.pending = None
+            elif line == b"DONE":
+                self.playing = False
+                self.done.set()
+
+    def send(self, request):
+        data = json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            if request.get("command") == "stop" and self.pending is not None: # START 전에 중단된 발화
+                self.pending, self.dropped = None, self.dropped + 1
+            elif (request.get("text") or "").strip() and not self.playing and self.pending is None:
+                self.pending = time.perf_counter()
+            self.done.clear()
+            self.conn.send(data)
+
+    def close(self):
+        self.conn.close()
+        self.conn.join(2.0)
+
+
+def replay(client, events, pace, time_scale):
+    """요청들을 한 번 재생하고 (발화 수, 제한 시간 안에 DONE을 못 받은 수)를 반환합니다."""
+    t_base, first = time.perf_counter(), events[0][0]
+    utterances = timeouts = 0
+    for k, (t_rec, request) in enumerate(events):
+        if pace == "recorded":
+            time.sleep(max(0.0, t_base + (t_rec - first) / time_scale - time.perf_counter()))
+        client.send(request)
+        if not (request.get("text") or "").strip(): continue # stop 등 명령
+        utterances += 1
+        if pace == "closed":
+            nxt = events[k + 1] if k + 1 < len(events) else None
+            if nxt is not None and nxt[1].get("command") == "stop": # 기록대로 말하는 도중에 중단
+                client.done.wait((nxt[0] - t_rec) / time_scale)
+            elif not client.done.wait(SIGNAL_TIMEOUT_SEC):
+                timeouts += 1
+    if pace == "recorded" and client.playing and not client.done.wait(SIGNAL_TIMEOUT_SEC): timeouts += 1
+    return utterances, timeouts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the TTS pipeline end to end with a mock engine and a null audio sink.")
+    parser.add_argument('--lang', choices=sorted(PROFILES), default='KR', help="파이프 기본 언어")
+    parser.add_argument('--traffic', help="MELO_TTS_TRAFFIC_LOG로 기록한 요청 파일 (없으면 답변 코퍼스)")
+    parser.add_argument('--repeat', type=int, default=2, help="요청 전체를 몇 번 재생할지 (두 번째부터 캐시 적중)")
+    parser.add_argument('--pace', choices=['closed', 'recorded'], default='closed')
+    parser.add_argument('--time-scale', type=float, default=1.0, help="--pace recorded 에서 기록 간격을 이 배수만큼 줄임")
+    parser.add_argument('--workers', type=int, default=2, help="합성 워커 수 (호스트의 N_SYNTH_WORKERS와 같게)")
+    parser.add_argument('--playback-speed', type=float, default=10.0, help="널 출력 재생 배속 (1: 실제 시간)")
+    parser.add_argument('--cache-mb', type=int, default=128, help="언어별 메모리 캐시 예산")
+    parser.add_argument('--log-level', choices=sorted(kiosk_log.LEVELS), default='DEBUG', help="파이프라인 로그 레벨 (배포 모드 기본 INFO)")
+    parser.add_argument('--log-format', choices=['text', 'json'], default='text')
+    parser.add_argument('--batch-max', type=int, default=tts_pipeline.BATCH_MAX, help="합성 워커가 묶어 합성할 최대 세그먼트 수 (1: 배치 끔)")
+    MockEngine.add_arguments(parser)
+    args = parser.parse_args()
+
+    tts_pipeline.AUDIO_OUTPUT, tts_pipeline.NULL_OUTPUT_SPEED = 'null', args.playback_speed
+    tts_pipeline.BATCH_MAX = args.batch_max
+    kiosk_log.configure(level=args.log_level, fmt=args.log_format)
+    events = read_traffic(args.traffic, args.lang) if args.traffic else corpus_traffic(args.lang)
+    if not events: print("[BENCH][ERR] No requests to replay.", flush=True); return
+    voices = {lang: Voice(p, MockEngine.from_args(args, p["default_sr"]), 0, AudioLRUCache(args.cache_mb * 1024 * 1024))
+              for lang, p in PROFILES.items()}
+    profile = dict(PROFILES[args.lang], pipe_name=rf"\\.\pipe\melo_tts_bench_{os.getpid()}")
+    pipeline = TtsPipeline(profile, args.workers)
+    pipeline.start_pipe()
+    client = Client(profile["pipe_name"])
+    pipeline.start_workers(voices)
+    if not client.ready.wait(10): print("[BENCH][ERR] Pipeline did not become READY.", flush=True); return
+    print(f"[BENCH] {len(events)} request(s) x {args.repeat}, pace={args.pace}, workers={args.workers}, batch_max={args.batch_max}, engine={voices[args.lang].engine.variant}", flush=True)
+
+    engine_cpu = lambda: sum(v.engine.cpu_sec for v in voices.values())
+    def log_usage():
+        kiosk_log.flush() # 쓰기 스레드가 아직 안 쓴 줄까지 포함
+        s = kiosk_log.stats()
+        return s["caller_ms"] + s["writer_cpu_ms"], s["lines"]
+    audio_sec = lambda: sum(v.engine.audio_sec for v in voices.values())
+    rows = []
+    cpu0, wall0, engine0, (log_ms0, lines0) = time.process_time(), time.perf_counter(), engine_cpu(), log_usage()
+    for n in range(1, args.repeat + 1):
+        counters0, audio0, n_ttfa = dict(pipeline.metrics.counters), audio_sec(), len(client.ttfa)
+        cpu_run, wall_run, engine_run, (log_ms_run, lines_run) = time.process_time(), time.perf_counter(), engine_cpu(), log_usage()
+        utterances, timeouts = replay(client, events, args.pace, args.time_scale)
+        wall, cpu = time.perf_counter() - wall_run, time.process_time() - cpu_run
+        log_ms, lines = log_usage()
+        counters = {k: v - counters0.get(k, 0) for k, v in pipeline.metrics.counters.items()}
+        cache = {s: counters.get(f"cache_{s}", 0) for s in ("hit", "disk", "shared", "miss")}
+        ttfa = Histogram()
+        for ms in client.ttfa[n_ttfa:]: ttfa.add(ms)
+        rows.append(dict(run=n, utterances=utterances, timeouts=timeouts, wall_sec=round(wall, 3),
+                         utt_per_sec=round(utterances / wall, 3), synth_audio_sec_per_sec=round((audio_sec() - audio0) / wall, 3),
+                         ttfa_ms=ttfa.summary(), cache=cache,
+                         cache_hit_rate=round(1 - cache["miss"] / sum(cache.values()), 3) if sum(cache.values()) else 0.0,
+                         cpu_ms_per_utt=round(cpu * 1000 / max(1, utterances), 1),
+                         pipeline_cpu_ms_per_utt=round((cpu - engine_cpu() + engine_run) * 1000 / max(1, utterances), 1),
+                         log_cpu_ms_per_utt=round((log_ms - log_ms_run) / max(1, utterances), 3),
+                         log_lines_per_utt=round((lines - lines_run) / max(1, utterances), 1)))
+
+    wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+    log_ms, lines = log_usage()
+    utterances = sum(r["utterances"] for r in rows)
+    ttfa = Histogram()
+    for ms in client.ttfa: ttfa.add(ms)
+    snapshot = pipeline.metrics_snapshot(0)
+    report = {"lang": args.lang, "pace": args.pace, "workers": args.workers, "batch_max": args.batch_max, "engine": voices[args.lang].engine.variant,
+              "utterances": utterances, "wall_sec": round(wall, 3), "utt_per_sec": round(utterances / wall, 3),
+              "ttfa_ms": ttfa.summary(), "ttfa_dropped": client.dropped, "cpu_ms_per_utt": round(cpu * 1000 / max(1, utterances), 1),
+              "pipeline_cpu_ms_per_utt": round((cpu - engine_cpu() + engine0) * 1000 / max(1, utterances), 1),
+              "log_level": args.log_level, "log_cpu_ms_per_utt": round((log_ms - log_ms0) / max(1, utterances), 3),
+              "log_lines_per_utt": round((lines - lines0) / max(1, utterances), 1), "log": kiosk_log.stats(),
+              "stop": snapshot["stop"], "histograms": snapshot["histograms"], "runs": rows}
+    client.close()
+    pipeline.shutdown()
+
+    print(f"[BENCH] {'run':>3} {'utts':>5} {'t/o':>3} {'utt/s':>6} {'audio/s':>7} {'ttfa p50':>9} {'p90':>7} {'p95':>7} {'p99':>7} "
+          f"{'hit':>5} {'cpu/utt':>8} {'pipe cpu':>8} {'log cpu':>8} {'lines':>5}")
+    for r in rows:
+        t = r["ttfa_ms"]
+        print(f"[BENCH] {r['run']:3d} {r['utterances']:5d} {r['timeouts']:3d} {r['utt_per_sec']:6.2f} {r['synth_audio_sec_per_sec']:7.2f} "
+              f"{t.get('p50', 0):7.0f}ms {t.get('p90', 0):5.0f}ms {t.get('p95', 0):5.0f}ms {t.get('p99', 0):5.0f}ms "
+              f"{r['cache_hit_rate']:5.2f} {r['cpu_ms_per_utt']:6.0f}ms {r['pipeline_cpu_ms_per_utt']:6.1f}ms "
+              f"{r['log_cpu_ms_per_utt']:6.2f}ms {r['log_lines_per_utt']:5.1f}")
+    print(f"[BENCH] report {json.dumps(report, ensure_ascii=False)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+합성 후처리 마이크로 벤치마크 (CLI, 모델 불필요)
+- 기존 단계별 함수(선형 보간 np.interp 리샘플 -> 페이드 -> 게인 -> 클리핑 -> int16)와
+  tts_synth.postprocess_to_int16(제자리 float32 처리 + 캐시된 폴리페이즈 필터 + int16 한 번 변환)을 긴 세그먼트로 비교합니다.
+- 벽시계 시간(반복 중 최솟값)과 큰 배열 할당 횟수/최대 추가 메모리를 출력합니다.
+  할당 횟수는 tracemalloc으로 추적되는 numpy 메모리가 바이트코드 한 단계 사이에 세그먼트 크기의 1/4 이상 늘어난 횟수입니다.
+
+사용 예:
+    python bench/bench_postprocess.py
+    python bench/bench_postprocess.py --seconds 60 --repeat 20
+"""
+
+import os, sys, json, time, argparse, tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tts_synth import postprocess_to_int16, polyphase_ratio
+
+
+# --- 기존 후처리 (비교 기준) ---
+def legacy_resample_if_needed(audio, src_sr, tgt_sr):
+    if src_sr == 0 or audio.size == 0 or src_sr == tgt_sr: return audio
+    new_len = int(round(len(audio) * (tgt_sr / float(src_sr))))
+    return np.interp(np.linspace(0, 1, new_len), np.linspace(0, 1, len(audio)), audio)
+
+def legacy_fade_in_out(audio, sr, ms=3.0):
+    k = int(sr * (ms / 1000.0))
+    if k <= 1 or len(audio) <= 2 * k: return audio
+    w = np.linspace(0.0, 1.0, k, dtype=np.float32)
+    audio[:k] *= w
+    audio[-k:] *= w[::-1]
+    return audio
+
+def legacy_postprocess(audio, src_sr, target_sr, gain=1.0):
+    audio = np.nan_to_num(np.clip(audio, -1.0, 1.0))
+    audio = legacy_resample_if_needed(audio, src_sr, target_sr)
+    audio = legacy_fade_in_out(audio, target_sr)
+    if gain != 1.0: audio = audio * gain
+    return (np.clip(audio, -1.0, 1.0) * 32767.0).astype(np.int16)
+
+
+def count_allocations(fn, audio, threshold):
+    """fn(audio) 실행 중 threshold 바이트 이상 늘어난 할당 횟수와 최대 추가 메모리(바이트)"""
+    tracemalloc.start()
+    base = last = tracemalloc.get_traced_memory()[0]
+    count = 0
+
+    def tracer(frame, event, arg):
+        nonlocal last, count
+        frame.f_trace_opcodes = True
+        cur = tracemalloc.get_traced_memory()[0]
+        if cur - last >= threshold: count += 1
+        last = cur
+        return tracer
+
+    sys.settrace(tracer)
+    try:
+        result = fn(audio)
+    finally:
+        sys.settrace(None)
+    cur, peak = tracemalloc.get_traced_memory()
+    if cur - last >= threshold: count += 1 # 마지막 단계의 반환값
+    tracemalloc.stop()
+    del result
+    return count, peak - base
+
+
+def bench(name, fn, audio, repeat, threshold):
+    times = []
+    for _ in range(repeat):
+        x = audio.copy() # 제자리 처리 함수가 입력을 바꾸므로 매번 새 입력 (측정에서 제외)
+        t0 = time.perf_counter()
+        fn(x)
+        times.append(time.perf_counter() - t0)
+    allocs, peak = count_allocations(fn, audio.copy(), threshold)
+    return {"name": name, "best_ms": min(times) * 1000, "median_ms": sorted(times)[len(times) // 2] * 1000,
+            "allocations": allocs, "peak_extra_mb": peak / 1048576}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy and in-place TTS post-processing on long segments.")
+    parser.add_argument('--seconds', type=float, default=30.0, help="세그먼트 길이 (초)")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--gain', type=float, default=1.0, help="기존 경로의 게인 (새 경로는 재생 시 적용하므로 제외)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    cases = [(44100, 44100), (24000, 24000), (24000, 44100), (44100, 24000)]
+    results = []
+    for src_sr, tgt_sr in cases:
+        n = int(args.seconds * src_sr)
+        audio = (0.3 * np.sin(np.arange(n, dtype=np.float32) * (2 * np.pi * 220 / src_sr)) + 0.05 * rng.standard_normal(n)).astype(np.float32)
+        threshold = audio.nbytes // 4
+        if src_sr != tgt_sr: polyphase_ratio(src_sr, tgt_sr) # 필터 설계는 SR 쌍마다 한 번 (캐시)
+        case = f"{src_sr}->{tgt_sr}"
+        for r in (bench("legacy", lambda x: legacy_postprocess(x, src_sr, tgt_sr, args.gain), audio, args.repeat, threshold),
+                  bench("in-place", lambda x: postprocess_to_int16(x, src_sr, tgt_sr), audio, args.repeat, threshold)):
+            r["case"] = case
+            results.append(r)
+
+    print(f"[BENCH] {args.seconds:.0f}s segments, {args.repeat} repeats")
+    print(f"[BENCH] {'case':<12} {'path':<9} {'best(ms)':>9} {'median(ms)':>11} {'allocs':>7} {'peak extra(MB)':>15}")
+    for r in results:
+        print(f"[BENCH] {r['case']:<12} {r['name']:<9} {r['best_ms']:9.2f} {r['median_ms']:11.2f} {r['allocations']:7d} {r['peak_extra_mb']:15.2f}")
+    print(f"[BENCH] report {json.dumps(results)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+STT 엔진 벤치마크 (CLI) - 인식 지연과 단어 오류율(WER)
+- 녹음한 키오스크 질의(bench/corpus/stt_queries_{kr,en}.txt의 정답 문장 + --audio-dir의 {kr,en}_NNN.wav)를
+  stt_backends의 각 엔진(google, whisper)에 워커처럼 --chunk-ms 단위로 흘려 보내고 다음을 잽니다.
+  first interim : 오디오 시작부터 첫 interim까지 (말하는 중 화면에 글자가 뜨기까지)
+  final         : 오디오 끝(입력 종료)부터 마지막 result까지 (질문을 확정해 AI로 넘기기까지)
+  WER / CER     : 정답 대비 단어/글자 오류율 (소문자화, 구두점 제거 후 편집 거리. 한국어는 어절 단위가 거칠어 CER도 함께)
+- --realtime 을 주면 청크를 실제 시간 간격으로 보냅니다. (interim 지연은 실시간에서만 의미 있음)
+- 녹음 파일이 없는 질의는 건너뜁니다. google은 GOOGLE_APPLICATION_CREDENTIALS 또는 STT_SPEECH_ENDPOINT(가짜 서버)가,
+  whisper는 STT_WHISPER_DIR의 <모델>.pt가 필요합니다. (whisper interim 지연은 STT_WHISPER_INTERIM=1일 때만 나옴)
+
+사용 예:
+    python bench/bench_stt.py --audio-dir D:/kiosk_stt_recordings
+    python bench/bench_stt.py --audio-dir D:/kiosk_stt_recordings --backends whisper --lang KR --realtime
+"""
+
+import os, re, sys, json, time, wave, argparse, statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import stt_backends
+
+LANG_CODES = {"KR": "ko-KR", "EN": "en-US"}
+FINAL_TIMEOUT_SEC = 30
+
+
+def read_queries(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def read_wav(path):
+    """16kHz mono 16-bit PCM bytes. 형식이 다르면 None"""
+    with wave.open(path, 'rb') as w:
+        if (w.getframerate(), w.getnchannels(), w.getsampwidth()) != (stt_backends.SAMPLE_RATE, 1, 2):
+            print(f"[BENCH][WARN] {path}: need {stt_backends.SAMPLE_RATE}Hz mono 16-bit, got "
+                  f"{w.getframerate()}Hz x{w.getnchannels()} {w.getsampwidth() * 8}-bit. Skipped.", flush=True)
+            return None
+        return w.readframes(w.getnframes())
+
+
+def tokens(text, chars=False):
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return list(text.replace(" ", "")) if chars else text.split()
+
+
+def edit_distance(ref, hyp):
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i]
+        for j, h in enumerate(hyp, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h)))
+        prev = cur
+    return prev[-1]
+
+
+def run_query(backend, lang_code, pcm, chunk_ms, realtime):
+    """세션 하나에 오디오를 흘려 보내고 (가설 문장, 첫 interim 지연, 최종 지연, 오류)를 반환합니다."""
+    events = []
+    send = lambda data: events.append((time.perf_counter(), json.loads(data)))
+    session = backend.open(lang_code)
+    session.activate(send)
+    chunk = stt_backends.SAMPLE_RATE * 2 * chunk_ms // 1000
+    t0 = time.perf_counter()
+    for k, off in enumerate(range(0, len(pcm), chunk)):
+        session.put(pcm[off:off + chunk])
+        if realtime: time.sleep(max(0.0, t0 + (k + 1) * chunk_ms / 1000.0 - time.perf_counter()))
+    t_end = time.perf_counter()
+    session.finish()
+    session.thread.join(FINAL_TIMEOUT_SEC)
+    results = [(t, m["text"]) for t, m in events if m["type"] == "result"]
+    interims = [t for t, m in events if m["type"] == "interim"]
+    errors = [m["message"] for t, m in events if m["type"] == "error"]
+    first = min(interims + [t for t, _ in results], default=None)
+    return {"text": " ".join(text for _, text in results),
+            "first_ms": (first - t0) * 1000 if first else None,
+            "final_ms": (results[-1][0] - t_end) * 1000 if results else None,
+            "error": errors[0] if errors else None}
+
+
+def summarize(rows, key):
+    vals = sorted(r[key] for r in rows if r[key] is not None)
+    if not vals: return float('nan'), float('nan')
+    return statistics.median(vals), vals[min(len(vals) - 1, int(0.95 * len(vals)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure STT latency and word error rate on recorded kiosk queries.")
+    parser.add_argument('--audio-dir', required=True, help="녹음 폴더 (kr_001.wav, en_001.wav ...)")
+    parser.add_argument('--backends', default='google,whisper', help="측정할 엔진 (쉼표 구분)")
+    parser.add_argument('--lang', choices=['KR', 'EN', 'all'], default='all')
+    parser.add_argument('--chunk-ms', type=int, default=100, help="청크 길이 (Electron 마이크 청크와 같게)")
+    parser.add_argument('--realtime', action='store_true', help="청크를 실제 시간 간격으로 보냄")
+    parser.add_argument('--limit', type=int, default=0, help="언어별 최대 질의 수 (0: 전부)")
+    parser.add_argument('--verbose', action='store_true', help="질의별 결과 출력")
+    args = parser.parse_args()
+
+    langs = ['KR', 'EN'] if args.lang == 'all' else [args.lang]
+    cases = {}
+    for lang in langs:
+        queries = read_queries(os.path.join(BENCH_DIR, 'corpus', f'stt_queries_{lang.lower()}.txt'))
+        for n, ref in enumerate(queries, 1):
+            path = os.path.join(args.audio_dir, f"{lang.lower()}_{n:03d}.wav")
+            if not os.path.exists(path): continue
+            pcm = read_wav(path)
+            if pcm: cases.setdefault(lang, []).append((path, ref, pcm))
+        cases[lang] = cases.get(lang, [])[:args.limit or None]
+        print(f"[BENCH] {lang}: {len(cases[lang])}/{len(queries)} recordings found", flush=True)
+
+    report = []
+    for name in args.backends.split(','):
+        if name == 'google':
+            if not stt_backends.GOOGLE_AVAILABLE: print("[BENCH] google: unavailable. Skipped.", flush=True); continue
+            backend = stt_backends.GoogleBackend()
+            backend.warm()
+        elif name == 'whisper':
+            backend = stt_backends.WhisperBackend()
+            backend.load()
+            if not backend.healthy(): print("[BENCH] whisper: unavailable. Skipped.", flush=True); continue
+        else:
+            print(f"[BENCH] Unknown backend '{name}'. Skipped.", flush=True); continue
+        for lang in langs:
+            rows = []
+            for path, ref, pcm in cases[lang]:
+                row = run_query(backend, LANG_CODES[lang], pcm, args.chunk_ms, args.realtime)
+                row["word_err"], row["words"] = edit_distance(tokens(ref), tokens(row["text"])), len(tokens(ref))
+                row["char_err"], row["chars"] = edit_distance(tokens(ref, True), tokens(row["text"], True)), len(tokens(ref, True))
+                rows.append(row)
+                if args.verbose:
+                    print(f"[BENCH] {name} {os.path.basename(path)} ref='{ref}' hyp='{row['text']}' "
+                          f"first={row['first_ms']} final={row['final_ms']} err={row['error']}", flush=True)
+            if not rows: continue
+            first_p50, first_p95 = summarize(rows, "first_ms")
+            final_p50, final_p95 = summarize(rows, "final_ms")
+            report.append({"backend": name, "lang": lang, "queries": len(rows), "errors": sum(1 for r in rows if r["error"]),
+                           "wer": sum(r["word_err"] for r in rows) / max(1, sum(r["words"] for r in rows)),
+                           "cer": sum(r["char_err"] for r in rows) / max(1, sum(r["chars"] for r in rows)),
+                           "first_p50_ms": first_p50, "first_p95_ms": first_p95, "final_p50_ms": final_p50, "final_p95_ms": final_p95})
+        backend.close()
+
+    print(f"[BENCH] {'backend':<8} {'lang':<4} {'n':>3} {'err':>3} {'WER':>6} {'CER':>6} {'first p50':>10} {'first p95':>10} "
+          f"{'final p50':>10} {'final p95':>10}")
+    for r in report:
+        print(f"[BENCH] {r['backend']:<8} {r['lang']:<4} {r['queries']:3d} {r['errors']:3d} {r['wer']:6.3f} {r['cer']:6.3f} "
+              f"{r['first_p50_ms']:8.0f}ms {r['first_p95_ms']:8.0f}ms {r['final_p50_ms']:8.0f}ms {r['final_p95_ms']:8.0f}ms")
+    print(f"[BENCH] report {json.dumps(report)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+로컬 가짜 Google Speech-to-Text gRPC 서버 (CLI, 테스트/벤치마크용, 인증/네트워크 불필요)
+- google.cloud.speech.v1.Speech/StreamingRecognize만 구현하며 TLS 없이 평문 gRPC로 엽니다.
+  STT 워커를 STT_SPEECH_ENDPOINT=127.0.0.1:50051 로 실행하면 Google 대신 이 서버에 붙습니다.
+- 받은 오디오 --interim-sec초마다 interim, 입력이 끝나면(half-close) final 결과를 보냅니다.
+  텍스트에는 스트림 번호와 받은 오디오 길이가 들어가 어느 스트림이 어떤 오디오를 받았는지 확인할 수 있습니다.
+- 실제 API처럼 스트림 길이 한도(--max-stream-sec)와 오디오 없음 한도(--audio-timeout-sec)를 넘기면 OUT_OF_RANGE로 끝냅니다.
+- --open-delay-ms: config를 받은 뒤 오디오를 처리하기 전까지의 지연 (서버 측 인식기 준비 시간 흉내)
+- --script: 스트림별 대본 (JSON 줄 하나 = 스트림 하나, [{"audio_sec": 1.2, "text": "...", "final": false}, ...]).
+  오디오를 받은 스트림 순서대로 대본을 돌려 쓰며, 받은 오디오가 audio_sec에 이르면 그 결과를 보내고,
+  audio_sec이 null인 결과와 남은 final은 입력이 끝날 때 보냅니다.
+  (stt_session.session_script로 기록된 실제 세션의 결과를 그대로 대본으로 쓸 수 있음)
+- --response-delay-ms: 결과마다 보내기 전 지연 (네트워크 + 인식 시간 흉내)
+- servicer.trace를 list로 두면 요청 수신/응답 송신 시각(perf_counter)을 기록합니다. (bench/replay_stt.py가 워커 지연과 분리할 때 사용)
+
+사용 예:
+    python bench/fake_speech_server.py
+    python bench/fake_speech_server.py --port 50051 --max-stream-sec 30 --open-delay-ms 300
+"""
+
+import json, time, queue, argparse, itertools, threading
+from concurrent import futures
+
+import grpc
+from google.cloud import speech
+
+SERVICE = "google.cloud.speech.v1.Speech"
+SAMPLE_WIDTH = 2 # LINEAR16
+
+
+class FakeSpeechServicer:
+    def __init__(self, args, scripts=None):
+        self.args = args
+        self._ids = itertools.count(1)
+        self.log = [] # 스트림별 요약 (테스트에서 확인용)
+        self.scripts = list(scripts or [])
+        self._script_ids = itertools.count()
+        self.trace = None # list로 바꾸면 {"event": "recv"|"resp", ...} 기록
+
+    def _response(self, text, is_final):
+        alt = speech.SpeechRecognitionAlternative(transcript=text, confidence=0.9 if is_final else 0.0)
+        return speech.StreamingRecognizeResponse(results=[speech.StreamingRecognitionResult(alternatives=[alt], is_final=is_final)])
+
+    def _emit(self, sid, text, is_final, t_due):
+        """결과 하나. t_due: 결과를 낼 조건(오디오 도착/입력 종료)이 된 시각"""
+        if self.args.response_delay_ms: time.sleep(self.args.response_delay_ms / 1000.0)
+        if self.trace is not None:
+            self.trace.append({"event": "resp", "stream": sid, "t_due": t_due, "t": time.perf_counter(), "text": text, "final": is_final})
+        return self._response(text, is_final)
+
+    def streaming_recognize(self, request_iterator, context):
+        sid, opened, args = next(self._ids), time.monotonic(), self.args
+        requests = queue.Queue()
+
+        def pump(): # 요청 읽기를 따로 돌려 오디오가 없는 동안에도 한도를 검사
+            try:
+                for req in request_iterator: requests.put((time.perf_counter(), req))
+            except Exception: pass
+            requests.put((time.perf_counter(), None))
+        threading.Thread(target=pump, daemon=True).start()
+
+        _, first = requests.get()
+        if first is None: return
+        config = first.streaming_config.config
+        lang, sr = config.language_code, config.sample_rate_hertz or 16000
+        print(f"[FAKE] stream #{sid} opened lang={lang} sr={sr}", flush=True)
+        if args.open_delay_ms: time.sleep(args.open_delay_ms / 1000.0)
+
+        audio_bytes, last_audio, end = 0, time.monotonic(), "half-close"
+        interim_bytes = max(1, int(args.interim_sec * sr * SAMPLE_WIDTH))
+        next_interim = interim_bytes
+        script = None
+        try:
+            while True:
+                try: t_req, req = requests.get(timeout=0.05)
+                except queue.Empty: t_req, req = time.perf_counter(), False
+                now = time.monotonic()
+                if now - opened > args.max_stream_sec:
+                    end = "max-duration"
+                    context.abort(grpc.StatusCode.OUT_OF_RANGE, f"Exceeded maximum allowed stream duration of {args.max_stream_sec:.0f} seconds.")
+                if req is None: break
+                if req is False:
+                    if now - last_audio > args.audio_timeout_sec:
+                        end = "audio-timeout"
+                        context.abort(grpc.StatusCode.OUT_OF_RANGE, "Audio Timeout Error: Long duration elapsed without audio. Audio should be sent close to real time.")
+                    continue
+                audio_bytes += len(req.audio_content)
+                last_audio = now
+                if self.trace is not None: self.trace.append({"event": "recv", "stream": sid, "t": t_req, "bytes": audio_bytes})
+                if script is None and self.scripts: script = list(self.scripts[next(self._script_ids) % len(self.scripts)])
+                if script is not None:
+                    while script and script[0]["audio_sec"] is not None and audio_bytes >= script[0]["audio_sec"] * sr * SAMPLE_WIDTH:
+                        entry = script.pop(0)
+                        yield self._emit(sid, entry["text"], entry.get("final", False), t_req)
+                elif audio_bytes >= next_interim:
+                    yield self._emit(sid, f"stream {sid} {audio_bytes / (sr * SAMPLE_WIDTH):.1f}s", False, t_req)
+                    next_interim += interim_bytes
+            if script is not None: # 입력 종료 -> 아직 안 보낸 final + stop 뒤 결과
+                for entry in script:
+                    if entry.get("final") or entry["audio_sec"] is None: yield self._emit(sid, entry["text"], entry.get("final", False), t_req)
+            elif audio_bytes:
+                yield self._emit(sid, f"stream {sid} {audio_bytes / (sr * SAMPLE_WIDTH):.1f}s", True, t_req)
+        finally:
+            entry = {"stream": sid, "language": lang, "audio_sec": round(audio_bytes / (sr * SAMPLE_WIDTH), 2),
+                     "duration_sec": round(time.monotonic() - opened, 2), "end": end}
+            self.log.append(entry)
+            print(f"[FAKE] stream #{sid} closed {entry}", flush=True)
+
+
+def read_scripts(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def serve(port=50051, args=None, scripts=None):
+    """가짜 서버를 시작해 (server, servicer)를 반환합니다. (테스트 코드에서 직접 띄울 때 사용, port=0이면 빈 포트)"""
+    servicer = FakeSpeechServicer(args, scripts)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=32))
+    handler = grpc.stream_stream_rpc_method_handler(servicer.streaming_recognize,
+                                                    request_deserializer=speech.StreamingRecognizeRequest.deserialize,
+                                                    response_serializer=speech.StreamingRecognizeResponse.serialize)
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(SERVICE, {"StreamingRecognize": handler}),))
+    bound = server.add_insecure_port(f"127.0.0.1:{port}")
+    server.start()
+    servicer.port = bound
+    print(f"[FAKE] Speech server listening on 127.0.0.1:{bound} (set STT_SPEECH_ENDPOINT=127.0.0.1:{bound})", flush=True)
+    return server, servicer
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local fake Google Speech-to-Text streaming server.")
+    parser.add_argument('--port', type=int, default=50051)
+    parser.add_argument('--interim-sec', type=float, default=1.0, help="받은 오디오 몇 초마다 interim 결과를 보낼지")
+    parser.add_argument('--max-stream-sec', type=float, default=305.0, help="스트림 길이 한도 (실제 API 305초)")
+    parser.add_argument('--audio-timeout-sec', type=float, default=10.0, help="오디오 없이 이 시간이 지나면 스트림 종료")
+    parser.add_argument('--open-delay-ms', type=float, default=0.0, help="config 수신 후 처리 시작까지 지연")
+    parser.add_argument('--response-delay-ms', type=float, default=0.0, help="결과마다 보내기 전 지연 (네트워크 + 인식 시간)")
+    parser.add_argument('--script', help="스트림별 대본 파일 (JSON 줄)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    server, _ = serve(args.port, args, read_scripts(args.script) if args.script else None)
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        server.stop(grace=1.0)
+
+
+if __name__ == "__main__":
+    main()
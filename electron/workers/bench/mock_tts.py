@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+결정적 가짜 TTS 엔진 (벤치마크용, 모델/torch 불필요)
+- tts_synth.LocalEngine / tts_procpool.SynthProcessPool과 같은 인터페이스(synthesize, sample_rate, variant, speakers,
+  frontend_stats, close)라 TtsPipeline의 합성 워커/캐시/재생 코드를 모델 없이 그대로 태울 수 있습니다.
+- 오디오: 글자 수 x audio_ms_per_char / speed 길이의 사인파 (음높이는 텍스트 해시) -> 같은 입력이면 항상 같은 출력
+- 비용: 전처리 frontend_ms + 글자당 char_ms -> 음향 모델 (오디오 길이 x rtf) -> 후처리 post_ms.
+  busy=True(기본)면 그 시간 동안 numpy 행렬 곱으로 CPU를 실제로 씁니다. (BLAS 호출 중 GIL을 놓아 torch 추론과 비슷)
+  busy=False면 sleep만 합니다. 단계 사이에 cancel()을 확인해 SynthCancelled를 던지고 timings에 단계별 ms를 채웁니다.
+- synthesize_batch(LocalEngine과 같은 인터페이스): 전처리/후처리는 세그먼트마다, 음향 모델은 배치 한 번
+  (call_ms + 가장 긴 오디오 x 배치 크기 x rtf x (1 - batch_gain x (1 - 1/배치 크기))). 패딩 때문에 가장 긴 세그먼트 기준이고,
+  call_ms(호출당 고정 비용)와 batch_gain(배치로 아끼는 비율)이 배치 이득을 정합니다. 둘 다 0(기본)이면 배치 이득이 없습니다.
+"""
+
+import os, sys, time, hashlib, argparse, threading
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tts_synth import check_cancel
+
+
+class MockEngine:
+    """결정적 가짜 합성 엔진. cpu_sec / audio_sec에 지금까지 쓴 CPU와 만든 오디오 길이를 누적합니다."""
+
+    def __init__(self, sample_rate=44100, frontend_ms=30.0, char_ms=0.5, rtf=0.3, post_ms=3.0,
+                 audio_ms_per_char=90.0, busy=True, speakers=None, call_ms=0.0, batch_gain=0.0):
+        self.sample_rate = sample_rate
+        self.frontend_ms, self.char_ms, self.rtf, self.post_ms = frontend_ms, char_ms, rtf, post_ms
+        self.call_ms, self.batch_gain = call_ms, batch_gain
+        self.audio_ms_per_char, self.busy = audio_ms_per_char, busy
+        self.variant = f"mock-rtf{rtf:g}"
+        self.speakers = speakers or {"MOCK": 0}
+        self.cpu_sec = self.audio_sec = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._mat = np.random.default_rng(0).standard_normal((96, 96)).astype(np.float32)
+
+    @classmethod
+    def add_arguments(cls, parser):
+        group = parser.add_argument_group("mock engine")
+        group.add_argument('--frontend-ms', type=float, default=30.0, help="세그먼트당 전처리 비용 (BERT/G2P 역할)")
+        group.add_argument('--char-ms', type=float, default=0.5, help="전처리 글자당 추가 비용")
+        group.add_argument('--rtf', type=float, default=0.3, help="음향 모델 비용 = 오디오 길이 x RTF")
+        group.add_argument('--post-ms', type=float, default=3.0, help="후처리 비용")
+        group.add_argument('--audio-ms-per-char', type=float, default=90.0, help="speed 1.0 기준 글자당 오디오 길이")
+        group.add_argument('--sleep', action='store_true', help="CPU를 쓰지 않고 sleep으로 비용 흉내")
+        group.add_argument('--call-ms', type=float, default=0.0, help="음향 모델 호출당 고정 비용 (배치로 나눠 냄)")
+        group.add_argument('--batch-gain', type=float, default=0.0, help="배치 추론으로 아끼는 음향 모델 비용 비율 (0~1)")
+
+    @classmethod
+    def from_args(cls, args, sample_rate):
+        return cls(sample_rate, args.frontend_ms, args.char_ms, args.rtf, args.post_ms, args.audio_ms_per_char, not args.sleep,
+                   call_ms=args.call_ms, batch_gain=args.batch_gain)
+
+    def _spend(self, ms):
+        if ms <= 0: return
+        if not self.busy: time.sleep(ms / 1000.0); return
+        end = time.perf_counter() + ms / 1000.0
+        while time.perf_counter() < end: self._mat @ self._mat
+
+    def synthesize(self, text, speaker_id, speed, cancel=None, timings=None):
+        t_cpu = time.thread_time()
+        try:
+            t0 = time.perf_counter()
+            self._spend(self.frontend_ms + self.char_ms * len(text))
+            t1 = time.perf_counter()
+            check_cancel(cancel)
+            n = self._samples(text, speed)
+            self._spend(self.call_ms + n / self.sample_rate * self.rtf * 1000)
+            t2 = time.perf_counter()
+            check_cancel(cancel)
+            audio = self._tone(text, speaker_id, speed, n)
+            self._spend(self.post_ms)
+            if timings is not None:
+                timings.update(frontend_ms=(t1 - t0) * 1000, acoustic_ms=(t2 - t1) * 1000, post_ms=(time.perf_counter() - t2) * 1000)
+            with self._lock: self.audio_sec += n / self.sample_rate
+            return audio
+        finally:
+            with self._lock:
+                self.cpu_sec += time.thread_time() - t_cpu
+                self.calls += 1
+
+    def synthesize_batch(self, items, speed, cancel=None, timings=None):
+        t_cpu = time.thread_time()
+        timings = timings if timings is not None else [{} for _ in items]
+        try:
+            frontend_ms = []
+            for text, _ in items:
+                check_cancel(cancel)
+                t0 = time.perf_counter()
+                self._spend(self.frontend_ms + self.char_ms * len(text))
+                frontend_ms.append((time.perf_counter() - t0) * 1000)
+            check_cancel(cancel)
+            t1 = time.perf_counter()
+            sizes = [self._samples(text, speed) for text, _ in items]
+            b = len(items)
+            self._spend(self.call_ms + max(sizes) * b / self.sample_rate * self.rtf * 1000 * (1 - self.batch_gain * (1 - 1 / b)))
+            acoustic_ms = (time.perf_counter() - t1) * 1000
+            out = []
+            for (text, speaker_id), n, t, ms in zip(items, sizes, timings, frontend_ms):
+                check_cancel(cancel)
+                t2 = time.perf_counter()
+                out.append(self._tone(text, speaker_id, speed, n))
+                self._spend(self.post_ms)
+                t.update(frontend_ms=ms, acoustic_ms=acoustic_ms, post_ms=(time.perf_counter() - t2) * 1000, batch=b)
+            with self._lock: self.audio_sec += sum(sizes) / self.sample_rate
+            return out
+        finally:
+            with self._lock:
+                self.cpu_sec += time.thread_time() - t_cpu
+                self.calls += 1
+
+    def _samples(self, text, speed):
+        return int(self.sample_rate * len(text) * self.audio_ms_per_char / 1000.0 / max(speed, 0.1))
+
+    def _tone(self, text, speaker_id, speed, n):
+        digest = hashlib.md5(f"{text}|{speaker_id}|{speed}".encode("utf-8")).digest()
+        freq = 120.0 + digest[0] * 1.5
+        return (np.sin(np.arange(n, dtype=np.float32) * (2 * np.pi * freq / self.sample_rate)) * 6000).astype(np.int16)
+
+    def frontend_stats(self):
+        return None
+
+    def close(self):
+        pass
+
+
+if __name__ == "__main__": # 단독 실행: 인자대로 한 문장을 합성해 비용/길이 확인
+    parser = argparse.ArgumentParser(description="Synthesize one sentence with the mock engine and print its cost.")
+    parser.add_argument('text', nargs='?', default="안녕하세요, 천안 관광 안내 키오스크입니다.")
+    parser.add_argument('--sr', type=int, default=44100)
+    MockEngine.add_arguments(parser)
+    args = parser.parse_args()
+    engine = MockEngine.from_args(args, args.sr)
+    timings, t0 = {}, time.perf_counter()
+    audio = engine.synthesize(args.text, 0, 1.0, timings=timings)
+    print(f"[MOCK] {len(args.text)} chars -> {audio.size / args.sr:.2f}s audio in {time.perf_counter() - t0:.3f}s "
+          f"(cpu {engine.cpu_sec:.3f}s) {timings}", flush=True)
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+STT 세션 재생 부하 생성기 (CLI, 리눅스/Windows, 인증/마이크/네트워크 불필요)
+- stt_worker_gcloud의 실제 경로(pipe_transport 서버 -> PipeHandler -> transcribe_q -> google_stt_worker -> 세션 스레드 -> send)를
+  이 프로세스에 그대로 띄우고, Google 대신 bench/fake_speech_server.py를 로컬 포트로 띄워 붙입니다.
+  클라이언트는 Electron처럼 파이프(리눅스: Unix 소켓)로 hello 후 이진 프레임(prepare / start / 오디오 / stop)을 보냅니다.
+  prepare는 세션마다 start --prepare-ms 전에 그 세션 언어로 보냅니다. (0이면 보내지 않음, 미리 연 스트림 적중은 counters의 preopen_hits/misses)
+- 세션: STT_RECORD_DIR로 키오스크에서 기록한 *.sttrec 파일(--sessions, 파일 또는 폴더)을 기록된 시각대로 다시 보냅니다.
+  기록된 interim/result는 가짜 서버 대본(stt_session.session_script)이 되어 같은 오디오 위치에서 같은 결과가 나옵니다.
+  기록이 없으면 --synthetic N개의 합성 세션(저음량 잡음, --synthetic-sec초)을 만들고 서버는 기본 동작(--interim-sec마다 interim)
+  --language에 언어 코드를 쉼표로 여러 개 주면 합성 세션마다 돌아가며 씁니다. (언어가 바뀌는 턴에서 prepare 효과 확인)
+- --speed 배속으로 보내고(1: 실제 시간), 세션들을 --gap-sec 간격으로 차례로 --repeat 번 재생합니다.
+- 보고: 가짜 서버의 수신/송신 시각(servicer.trace)과 맞춰 결과 하나의 지연을 나눕니다.
+  ingress      : 청크 전송 -> 가짜 서버 수신 (파이프 + transcribe_q + 워커 + gRPC 요청)
+  server       : 결과 조건 충족 -> 가짜 서버 송신 (--response-delay-ms, 실제로는 네트워크/인식 시간)
+  egress       : 가짜 서버 송신 -> 클라이언트 수신 (gRPC 응답 + 세션 스레드 + 파이프 송신)
+  worker-added : 결과를 낳은 청크(또는 stop) 전송부터 클라이언트 수신까지에서 server를 뺀 시간
+  start->first(start 전송 -> 첫 interim/result 수신), stop->final, 큐 깊이(transcribe_q 표본 + 워커 지표의 transcribe_q_depth / session_q_depth), 버린 메시지
+  (서버가 보냈지만 클라이언트가 못 받은 결과 + 워커의 chunks_dropped / messages_dropped). 마지막 줄은 [BENCH] report JSON
+- VAD는 기본으로 끕니다. (게이트가 무음을 거르면 청크와 서버 수신 위치를 맞출 수 없어 --vad에서는 ingress를 재지 않음)
+
+사용 예:
+    python bench/replay_stt.py --synthetic 5 --synthetic-sec 4 --speed 4
+    python bench/replay_stt.py --sessions D:/kiosk_logs/stt_sessions --repeat 3 --response-delay-ms 150
+    python bench/replay_stt.py --synthetic 6 --language ko-KR,en-US --open-delay-ms 300 --prepare-ms 0
+"""
+
+import os, sys, json, time, queue, argparse, threading
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+import stt_backends
+import stt_worker_gcloud as worker
+from stt_session import read_session, session_script, REC_AUDIO, REC_COMMAND
+from stt_vad import VAD_AVAILABLE
+from kiosk_metrics import MetricsStore, Histogram
+from pipe_transport import open_server, connect, encode_frame, FRAME_AUDIO, FRAME_CONTROL
+import fake_speech_server
+
+SAMPLE_RATE = 16000
+FINAL_TIMEOUT_SEC = 10
+FINAL_GRACE_SEC = 0.3 # 최종 결과 뒤 늦게 오는 메시지를 기다리는 시간
+
+
+def load_sessions(paths):
+    """*.sttrec -> [{"name", "language", "events": [(초, "audio"|"stop", bytes)], "script"}]"""
+    files = []
+    for p in paths:
+        if os.path.isdir(p): files += sorted(os.path.join(p, f) for f in os.listdir(p) if f.endswith(".sttrec"))
+        else: files.append(p)
+    sessions = []
+    for path in files:
+        records = read_session(path)
+        language, events = worker.DEFAULT_LANGUAGE, []
+        for t, kind, payload in records:
+            if kind == REC_AUDIO: events.append((t, "audio", payload))
+            elif kind == REC_COMMAND:
+                obj = json.loads(payload)
+                if obj.get("command") == "start": language = obj.get("language", language)
+                elif obj.get("command") == "stop": events.append((t, "stop", None))
+        if not any(kind == "audio" for _, kind, _ in events):
+            print(f"[BENCH][WARN] {path}: no audio recorded. Skipped.", flush=True)
+            continue
+        if events[-1][1] != "stop": events.append((events[-1][0] + 0.1, "stop", None)) # 기록 도중 끊긴 세션
+        sessions.append({"name": os.path.basename(path), "language": language, "events": events,
+                         "script": session_script(records, SAMPLE_RATE)})
+    return sessions
+
+
+def synthetic_sessions(n, sec, chunk_ms, languages):
+    rng = np.random.default_rng(0)
+    chunk = int(SAMPLE_RATE * chunk_ms / 1000)
+    sessions = []
+    for k in range(n):
+        events = [(i * chunk_ms / 1000.0, "audio", (rng.standard_normal(chunk) * 200).astype(np.int16).tobytes())
+                  for i in range(int(sec * 1000 / chunk_ms))]
+        events.append((sec, "stop", None))
+        sessions.append({"name": f"synthetic_{k + 1:03d}", "language": languages[k % len(languages)], "events": events, "script": None})
+    return sessions
+
+
+class Client:
+    """Electron 역할의 파이프 클라이언트. 받은 메시지는 (수신 시각, dict)로 messages에 쌓습니다."""
+
+    def __init__(self, pipe_name):
+        self.messages = queue.Queue()
+        self._hello = threading.Event()
+        self.conn = connect(pipe_name, self._on_line, name="REPLAY")
+        self.conn.send(b'{"command": "hello", "framing": "binary"}\n')
+        if not self._hello.wait(5): raise RuntimeError("STT worker did not answer hello")
+
+    def _on_line(self, conn, line):
+        t = time.perf_counter()
+        try: msg = json.loads(line)
+        except ValueError: return
+        if msg.get("type") == "hello": self._hello.set()
+        else: self.messages.put((t, msg))
+
+    def control(self, obj):
+        t = time.perf_counter()
+        self.conn.send(encode_frame(FRAME_CONTROL, json.dumps(obj).encode("utf-8")))
+        return t
+
+    def audio(self, chunk):
+        t = time.perf_counter()
+        self.conn.send(encode_frame(FRAME_AUDIO, chunk))
+        return t
+
+    def close(self):
+        self.conn.close()
+        self.conn.join(2.0)
+
+
+def play_session(client, session, speed, prepare_sec=0.0):
+    """세션 하나를 보내고 최종 결과까지 기다립니다. -> (start 시각, 청크 [(전송 시각, 누적 바이트)], stop 시각, 받은 메시지)
+    prepare_sec > 0이면 그만큼 먼저 prepare를 보냅니다. (Electron이 언어를 정한 뒤 마이크를 켜기 전)"""
+    while not client.messages.empty(): client.messages.get_nowait() # 이전 세션의 늦은 메시지
+    if prepare_sec > 0:
+        client.control({"command": "prepare", "language": session["language"]})
+        time.sleep(prepare_sec)
+    t0 = client.control({"command": "start", "language": session["language"]})
+    sent, total, t_stop = [], 0, None
+    for t, kind, data in session["events"]:
+        time.sleep(max(0.0, t0 + t / speed - time.perf_counter()))
+        if kind == "audio":
+            total += len(data)
+            sent.append((client.audio(data), total))
+        else:
+            t_stop = client.control({"command": "stop"})
+    received, deadline = [], t_stop + FINAL_TIMEOUT_SEC
+    while True:
+        final = any(m.get("type") in ("result", "error") and t >= t_stop for t, m in received)
+        try: received.append(client.messages.get(timeout=max(0.0, min(deadline, time.perf_counter() + FINAL_GRACE_SEC) - time.perf_counter())))
+        except queue.Empty:
+            if final or time.perf_counter() >= deadline: break
+    return t0, sent, t_stop, received
+
+
+def analyze(t_start, sent, t_stop, received, trace, vad):
+    """세션 하나의 서버 기록(trace 조각)과 클라이언트 기록을 맞춰 지연(ms)과 누락 수를 구합니다."""
+    recvs = [e for e in trace if e["event"] == "recv"]
+    resps = [e for e in trace if e["event"] == "resp"]
+    results = [(t, m) for t, m in received if m.get("type") in ("interim", "result")]
+    out = {k: [] for k in ("ingress", "server", "egress", "worker_added")}
+    single = len({e["stream"] for e in recvs}) == 1 and not vad # 롤오버/VAD면 바이트 위치가 청크와 안 맞음
+    if single:
+        i = 0
+        for t_send, total in sent:
+            while i < len(recvs) and recvs[i]["bytes"] < total: i += 1
+            if i == len(recvs): break
+            out["ingress"].append((recvs[i]["t"] - t_send) * 1000)
+    by_time = {e["t"]: e["bytes"] for e in recvs}
+    send_at = {total: t for t, total in sent}
+    matched = 0
+    for resp, (t_client, msg) in zip(resps, results): # 같은 세션 안에서 순서대로 도착
+        if resp["text"] != msg.get("text"): break
+        matched += 1
+        out["server"].append((resp["t"] - resp["t_due"]) * 1000)
+        out["egress"].append((t_client - resp["t"]) * 1000)
+        t_trigger = send_at.get(by_time.get(resp["t_due"])) if single else None
+        if t_trigger is None and resp["t_due"] >= t_stop: t_trigger = t_stop # 입력 종료 때 나온 final
+        if t_trigger is not None: out["worker_added"].append((t_client - t_trigger) * 1000 - out["server"][-1])
+    finals = [t for t, m in results if m["type"] == "result" and t >= t_stop]
+    return out, {"responses": len(resps), "received": len(results), "lost": len(resps) - matched,
+                 "start_to_first_ms": (results[0][0] - t_start) * 1000 if results else None,
+                 "stop_to_final_ms": (finals[-1] - t_stop) * 1000 if finals else None,
+                 "errors": sum(1 for _, m in received if m.get("type") == "error")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded STT pipe sessions through the worker against a local fake Speech server.")
+    parser.add_argument('--sessions', nargs='*', default=[], help="STT_RECORD_DIR로 기록한 *.sttrec 파일 또는 폴더")
+    parser.add_argument('--synthetic', type=int, default=3, help="기록이 없을 때 만들 합성 세션 수")
+    parser.add_argument('--synthetic-sec', type=float, default=3.0, help="합성 세션 길이 (초)")
+    parser.add_argument('--chunk-ms', type=int, default=100, help="합성 세션 청크 길이 (Electron 마이크 청크)")
+    parser.add_argument('--language', default=worker.DEFAULT_LANGUAGE, help="합성 세션 언어 코드 (쉼표로 여러 개면 세션마다 돌아가며)")
+    parser.add_argument('--prepare-ms', type=float, default=300.0, help="start보다 이만큼 먼저 prepare 전송 (0: 보내지 않음)")
+    parser.add_argument('--speed', type=float, default=1.0, help="재생 배속 (1: 기록된 실제 시간)")
+    parser.add_argument('--repeat', type=int, default=1, help="세션 전체를 몇 번 재생할지")
+    parser.add_argument('--gap-sec', type=float, default=0.5, help="세션 사이 간격 (미리 연 스트림 사용)")
+    parser.add_argument('--interim-sec', type=float, default=1.0, help="대본 없는 세션에서 가짜 서버 interim 간격")
+    parser.add_argument('--response-delay-ms', type=float, default=0.0, help="가짜 서버 결과 지연 (네트워크 + 인식 시간)")
+    parser.add_argument('--open-delay-ms', type=float, default=0.0, help="가짜 서버 스트림 준비 지연")
+    parser.add_argument('--sample-ms', type=float, default=5.0, help="transcribe_q 깊이 표본 간격")
+    parser.add_argument('--vad', action='store_true', help="워커 VAD 게이트를 켬 (ingress는 재지 않음)")
+    args = parser.parse_args()
+
+    sessions = load_sessions(args.sessions) if args.sessions else synthetic_sessions(args.synthetic, args.synthetic_sec, args.chunk_ms,
+                                                                                               args.language.split(','))
+    if not sessions: print("[BENCH][ERR] No sessions to replay.", flush=True); return
+    scripted = all(s["script"] is not None for s in sessions)
+    fake_args = fake_speech_server.parse_args(["--interim-sec", str(args.interim_sec), "--response-delay-ms", str(args.response_delay_ms),
+                                               "--open-delay-ms", str(args.open_delay_ms)])
+    grpc_server, servicer = fake_speech_server.serve(0, fake_args, [s["script"] for s in sessions] if scripted else None)
+    servicer.trace = []
+
+    stt_backends.SPEECH_ENDPOINT = f"127.0.0.1:{servicer.port}"
+    worker.BACKEND, worker.USE_VAD = "google", args.vad and VAD_AVAILABLE
+    transcribe_q, stop_evt, metrics = queue.Queue(), threading.Event(), MetricsStore()
+    handler = worker.PipeHandler(transcribe_q, stop_evt, metrics)
+    pipe_name = rf"\\.\pipe\stt_replay_{os.getpid()}"
+    server = open_server(pipe_name, handler.handle_line, name="PIPE", instances=2,
+                         on_disconnect=handler.on_disconnect).start()
+    th_stt = threading.Thread(target=worker.google_stt_worker, args=(transcribe_q, worker.pipe_sender(server, metrics), stop_evt, metrics), daemon=True)
+    th_stt.start()
+    client = Client(pipe_name)
+
+    depth = Histogram()
+    def sample_depth():
+        while not stop_evt.wait(args.sample_ms / 1000.0): depth.add(transcribe_q.qsize())
+    threading.Thread(target=sample_depth, daemon=True).start()
+
+    audio_sec = sum(len(d) for s in sessions for _, k, d in s["events"] if k == "audio") / (SAMPLE_RATE * 2)
+    print(f"[BENCH] {len(sessions)} session(s) ({audio_sec:.1f}s audio) x {args.repeat}, speed={args.speed:g}, "
+          f"{'scripted' if scripted else 'default'} fake server, vad={'on' if worker.USE_VAD else 'off'}, prepare={args.prepare_ms:g}ms", flush=True)
+    hist = {k: Histogram() for k in ("ingress", "server", "egress", "worker_added", "start_to_first", "stop_to_final")}
+    rows = []
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for n in range(1, args.repeat + 1):
+        for s in sessions:
+            mark = len(servicer.trace)
+            t_start, sent, t_stop, received = play_session(client, s, args.speed, args.prepare_ms / 1000.0)
+            lat, row = analyze(t_start, sent, t_stop, received, servicer.trace[mark:], worker.USE_VAD)
+            for k, values in lat.items():
+                for ms in values: hist[k].add(ms)
+            for k in ("start_to_first", "stop_to_final"):
+                if row[f"{k}_ms"] is not None: hist[k].add(row[f"{k}_ms"])
+            wa = sorted(lat["worker_added"])
+            rows.append(dict(run=n, session=s["name"], **row, worker_added_p50_ms=round(wa[len(wa) // 2], 2) if wa else None))
+            time.sleep(args.gap_sec)
+    wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+
+    stop_evt.set()
+    transcribe_q.put(None)
+    client.close()
+    server.close()
+    th_stt.join(timeout=2.0)
+    grpc_server.stop(grace=0.5)
+
+    snapshot = metrics.snapshot()
+    counters = metrics.counters
+    report = {"sessions": len(rows), "speed": args.speed, "prepare_ms": args.prepare_ms, "scripted": scripted, "vad": worker.USE_VAD,
+              "wall_sec": round(wall, 3), "cpu_ms_per_session": round(cpu * 1000 / max(1, len(rows)), 1),
+              "latency_ms": {k: h.summary() for k, h in hist.items()},
+              "transcribe_q_depth": depth.summary(), "worker_histograms": {k: v for k, v in snapshot["histograms"].items() if k.endswith("_depth")},
+              "dropped": {"lost_results": sum(r["lost"] for r in rows), "no_final": sum(1 for r in rows if r["stop_to_final_ms"] is None),
+                          "chunks_dropped": counters.get("chunks_dropped", 0), "messages_dropped": counters.get("messages_dropped", 0)},
+              "counters": counters, "pipe": server.stats(), "runs": rows}
+
+    print(f"[BENCH] {'run':>3} {'session':<38} {'resp':>4} {'recv':>4} {'lost':>4} {'start->first':>12} {'stop->final':>11} {'added p50':>9}")
+    for r in rows:
+        first = f"{r['start_to_first_ms']:10.0f}ms" if r["start_to_first_ms"] is not None else f"{'-':>12}"
+        final = f"{r['stop_to_final_ms']:9.0f}ms" if r["stop_to_final_ms"] is not None else f"{'-':>11}"
+        added = f"{r['worker_added_p50_ms']:7.1f}ms" if r["worker_added_p50_ms"] is not None else f"{'-':>9}"
+        print(f"[BENCH] {r['run']:3d} {r['session'][:38]:<38} {r['responses']:4d} {r['received']:4d} {r['lost']:4d} {first} {final} {added}")
+    for k, h in hist.items():
+        s = h.summary()
+        if s.get("count"): print(f"[BENCH] {k:<14} p50 {s['p50']:8.2f}ms  p95 {s['p95']:8.2f}ms  max {s['max']:8.2f}ms  (n={s['count']})")
+    print(f"[BENCH] report {json.dumps(report, ensure_ascii=False)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
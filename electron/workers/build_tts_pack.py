@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 캐시 팩 빌더 (CLI)
+- 키오스크가 반복해서 말하는 문구(UI 안내, 명소 설명, 지식 기반 정보)를 미리 합성해 언어별 팩 파일로 저장합니다.
+- 워커와 같은 split_chunks / 합성 코드 / 캐시 키를 쓰므로, 워커가 시작 시 팩을 매핑하면 해당 문구는 합성 없이 바로 재생됩니다.
+- 빌드 소요 시간과 언어별 팩 크기를 출력합니다.
+
+사용 예:
+    python build_tts_pack.py                       # KR, EN 모두 (기본 문구 파일 + 리액트 콘텐츠 + 지식 기반)
+    python build_tts_pack.py --lang KR --phrases my_phrases.txt --from-js ../src/services/kiosk/knowledgeBase.js
+"""
+
+import os, sys, re, time, argparse, tempfile, shutil
+
+# 임베디드 파이썬(._pth)은 스크립트 폴더를 sys.path에 넣지 않으므로 공용 모듈 경로를 직접 추가
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+from tts_profiles import PROFILES, pick_speaker_id, cache_key
+
+# 워커와 같은 HuggingFace 캐시 폴더를 써야 같은 모델 리비전(캐시 네임스페이스)으로 빌드됩니다
+os.environ['HUGGINGFACE_HUB_DISABLE_SYMLINKS'] = '1'
+HF_CACHE_PATH = os.path.join(os.environ.get('LOCALAPPDATA', '.'), 'MeloTTS_Cache', 'huggingface', 'hub')
+os.makedirs(HF_CACHE_PATH, exist_ok=True)
+os.environ['HF_HOME'] = HF_CACHE_PATH
+os.environ['HUGGINGFACE_HUB_CACHE'] = HF_CACHE_PATH
+
+HANGUL = re.compile(r'[가-힣]')
+# 개발 트리 기준 기본 문구 소스 (패키징 환경에는 없으므로 존재하는 파일만 사용)
+DEFAULT_JS_SOURCES = [
+    os.path.join(SCRIPT_DIR, '..', '..', 'react', 'src', 'data', 'historyContents.js'),
+    os.path.join(SCRIPT_DIR, '..', '..', 'react', 'src', 'data', 'natureContents.js'),
+    os.path.join(SCRIPT_DIR, '..', 'src', 'services', 'kiosk', 'knowledgeBase.js'),
+]
+
+
+def read_phrase_file(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def extract_js_phrases(path, language):
+    """JS 소스에서 문구를 뽑습니다.
+    - 콘텐츠 데이터(desc_ko / desc_en 템플릿 문자열): 화면에서 그대로 읽어주므로 원문 그대로 사용
+    - 지식 기반 마크다운의 '- **항목**: 내용' 줄: 내용 부분을 문장 단위로 사용"""
+    with open(path, encoding='utf-8') as f:
+        src = f.read()
+    field = 'desc_ko' if language == 'KR' else 'desc_en'
+    phrases = re.findall(rf'{field}\s*:\s*`([^`]*)`', src)
+    for m in re.finditer(r'^\s*-\s*\*\*(.+?)\*\*:\s*(.+)$', src, re.M):
+        value = m.group(2).replace('**', '').strip()
+        if not value or bool(HANGUL.search(value)) != (language == 'KR'): continue
+        phrases.extend(s for s in re.split(r'(?<=[.?!])\s+', value) if s.strip())
+    return phrases
+
+
+def prepare_language(language):
+    if language == 'EN': # 개발 모드 워커와 동일하게 NLTK 'punkt' 준비
+        import nltk
+        nltk.download('punkt', quiet=True)
+
+
+def build_pack(language, phrases, out_dir, tmpdir):
+    from tts_synth import load_tts, synth_to_int16, quantize_int8, model_variant
+    from tts_cache import cache_namespace, pack_path, write_pack
+    from tts_text import split_chunks
+
+    profile = PROFILES[language]
+    t0 = time.perf_counter()
+    prepare_language(language)
+    tts = load_tts(profile)
+    variant = model_variant(quantize_int8(tts, profile)) # 워커가 고속 추론 모드면 같은 설정으로 빌드해야 팩이 맞음
+    spk_id = pick_speaker_id(tts, profile)
+    sr = int(getattr(tts.hps.data, "sampling_rate", profile["default_sr"]))
+    t_load = time.perf_counter() - t0
+
+    entries, seen = [], set()
+    for text in phrases:
+        for seg in split_chunks(text, language):
+            key = cache_key(seg, spk_id, profile["speed"])
+            if key in seen: continue
+            seen.add(key)
+            audio = synth_to_int16(tts, seg, spk_id, profile["speed"], tmpdir, sr)
+            if audio is None:
+                print(f"[PACK][{language}][WARN] Empty audio for «{seg}»", flush=True)
+                continue
+            entries.append((key, sr, audio))
+            print(f"[PACK][{language}] {len(entries):4d} «{seg}»", flush=True)
+    t_synth = time.perf_counter() - t0 - t_load
+
+    path = pack_path(language, out_dir)
+    size = write_pack(path, cache_namespace(profile, sr, variant), entries)
+    return {"language": language, "path": path, "segments": len(entries),
+            "audio_sec": sum(a.size for _, _, a in entries) / sr, "load_sec": t_load,
+            "synth_sec": t_synth, "total_sec": time.perf_counter() - t0, "bytes": size}
+
+
+def main():
+    from tts_cache import PACK_DIR
+    parser = argparse.ArgumentParser(description="Pre-synthesize fixed kiosk phrases into TTS cache packs.")
+    parser.add_argument('--lang', choices=sorted(PROFILES), action='append', help="대상 언어 (반복 지정 가능, 기본: 전체)")
+    parser.add_argument('--phrases', action='append', default=[], help="문구 파일 (한 줄에 한 발화). 기본: tts_phrases_<lang>.txt")
+    parser.add_argument('--from-js', action='append', default=[], help="문구를 추출할 JS 소스 (기본: 리액트 콘텐츠 + knowledgeBase.js)")
+    parser.add_argument('--out', default=PACK_DIR, help=f"팩 출력 폴더 (기본: {PACK_DIR})")
+    args = parser.parse_args()
+
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception: pass
+
+    js_sources = args.from_js or [p for p in DEFAULT_JS_SOURCES if os.path.exists(p)]
+    tmpdir = tempfile.mkdtemp(prefix="_melo_pack_")
+    reports = []
+    try:
+        for language in args.lang or sorted(PROFILES):
+            phrase_files = args.phrases or [os.path.join(SCRIPT_DIR, f"tts_phrases_{language.lower()}.txt")]
+            phrases = []
+            for path in phrase_files:
+                if os.path.exists(path): phrases += read_phrase_file(path)
+            for path in js_sources:
+                phrases += extract_js_phrases(path, language)
+            print(f"[PACK][{language}] {len(phrases)} utterances from {len(phrase_files)} phrase file(s), {len(js_sources)} JS source(s)", flush=True)
+            reports.append(build_pack(language, phrases, args.out, tmpdir))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print("\n[PACK] lang  segments  audio(s)  load(s)  synth(s)  total(s)   size(MB)  path")
+    for r in reports:
+        print(f"[PACK] {r['language']:<4}  {r['segments']:8d}  {r['audio_sec']:8.1f}  {r['load_sec']:7.1f}  {r['synth_sec']:8.1f}  "
+              f"{r['total_sec']:8.1f}  {r['bytes'] / 1048576:9.2f}  {r['path']}")
+
+
+if __name__ == "__main__":
+    main()
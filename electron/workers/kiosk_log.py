@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+구조화 로그 공용 모듈 (tts_pipeline.py / pipe_transport.py / tts_host.py 공용)
+- 호출 스레드(합성/재생/파이프 읽기)는 레코드(시각, 레벨, 태그, 형식 문자열, 인자, 필드)를 링 버퍼에 넣기만 하고,
+  문자열 만들기와 stdout 쓰기/flush는 쓰기 스레드가 FLUSH_SEC마다 모아서 한 번에 합니다.
+  (Electron이 PythonShell stdout을 늦게 읽어 파이프가 차도 합성 스레드가 print(flush=True)에서 멈추지 않음)
+- 링 버퍼는 KIOSK_LOG_RING 레코드로 제한합니다. 가득 차면 새 레코드를 버리고 세어 두었다가 "[LOG][WARN] N line(s) dropped"로 알립니다.
+- 레벨: DEBUG < INFO < WARN < ERROR. configure(packaged)로 기본값을 정합니다. (개발: DEBUG, 배포: INFO -> 세그먼트마다 나오는
+  텍스트/캐시 상세 로그는 배포에서 꺼짐) KIOSK_LOG_LEVEL로 덮어씁니다.
+- 형식: text(기본, 기존과 같은 "[TAG] 메시지" / "[TAG][WARN] 메시지") | json(KIOSK_LOG_FORMAT=json, {"t", "level", "tag", "msg", 필드...} 한 줄)
+- 핫 패스: count(tag, event)로 세기만 하면 AGGREGATE_SEC마다 "[TAG] stats event=n ..." 한 줄로 합쳐 내보냅니다.
+  sampled(key, every)는 처음과 every번째마다 True입니다. (반복되는 경고를 줄일 때)
+- stats(): 기록/버린 줄 수, 호출 스레드가 로그 호출에 쓴 시간(caller_ms, 블로킹이 없으므로 CPU와 같음), 쓰기 스레드 CPU(writer_cpu_ms)
+  bench/bench_pipeline.py가 이 값의 차이로 발화당 로그 CPU를 보고합니다.
+- KIOSK_LOG_ASYNC=0 이면 쓰기 스레드 없이 호출한 자리에서 바로 씁니다. (디버깅용, 다른 print와 순서가 섞이지 않음)
+"""
+
+import os, sys, json, time, atexit, threading, collections
+
+DEBUG, INFO, WARN, ERROR = 10, 20, 30, 40
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARN": WARN, "ERROR": ERROR}
+LEVEL_MARKS = {DEBUG: "", INFO: "", WARN: "[WARN]", ERROR: "[ERR]"} # text 형식 태그 뒤 표시 (기존 print 형식)
+RING_SIZE = int(os.environ.get('KIOSK_LOG_RING', '4096'))
+AGGREGATE_SEC = float(os.environ.get('KIOSK_LOG_AGGREGATE_SEC', '30'))
+ASYNC = os.environ.get('KIOSK_LOG_ASYNC', '1') != '0'
+FLUSH_SEC = 0.05 # 쓰기 스레드가 링 버퍼를 비우는 간격 (ERROR는 바로 깨움)
+
+_format = os.environ.get('KIOSK_LOG_FORMAT', 'text')
+_level = LEVELS.get(os.environ.get('KIOSK_LOG_LEVEL', '').upper(), DEBUG)
+
+
+def configure(packaged=False, level=None, fmt=None):
+    """프로세스 시작 때 한 번. 배포 모드면 기본 레벨을 INFO로 (KIOSK_LOG_LEVEL / level 인자가 우선)"""
+    global _level, _format
+    name = (level or os.environ.get('KIOSK_LOG_LEVEL') or ("INFO" if packaged else "DEBUG")).upper()
+    _level = LEVELS.get(name, INFO)
+    if fmt: _format = fmt
+
+
+def enabled(level):
+    """인자를 만드는 데 비용이 드는 로그 앞에서 확인"""
+    return level >= _level
+
+
+class LogWriter:
+    """링 버퍼 + 쓰기 스레드. 모듈 함수(debug/info/...)가 프로세스 하나에 하나만 씁니다."""
+
+    def __init__(self, ring_size=RING_SIZE, async_=ASYNC):
+        self.ring_size, self.async_ = ring_size, async_
+        self._lock = threading.Lock()
+        self._ring = collections.deque()
+        self._wake = threading.Event()
+        self._counts = collections.defaultdict(collections.Counter) # 태그 -> 이벤트 -> 횟수 (AGGREGATE_SEC마다 비움)
+        self._samples = collections.Counter()
+        self._last_aggregate = time.monotonic()
+        self.lines = self.dropped = self._dropped_reported = 0
+        self.caller_sec = self.writer_cpu_sec = 0.0
+        self._thread = None
+        self._closed = False
+
+    # --- 호출 스레드 ---
+    def emit(self, level, tag, msg, args, fields):
+        t0 = time.perf_counter()
+        rec = (time.time(), level, tag, msg, args, fields)
+        if not self.async_ or self._closed:
+            self._write([rec])
+            with self._lock: self.caller_sec += time.perf_counter() - t0
+            return
+        with self._lock:
+            if len(self._ring) < self.ring_size: self._ring.append(rec)
+            else: self.dropped += 1
+            if self._thread is None: self._start_locked()
+            self.caller_sec += time.perf_counter() - t0
+        if level >= ERROR: self._wake.set()
+
+    def count(self, tag, event, n=1):
+        with self._lock: self._counts[tag][event] += n
+
+    def sampled(self, key, every):
+        with self._lock:
+            self._samples[key] += 1
+            return (self._samples[key] - 1) % max(1, every) == 0
+
+    def _start_locked(self):
+        self._thread = threading.Thread(target=self._run, name="kiosk-log", daemon=True)
+        self._thread.start()
+
+    # --- 쓰기 스레드 ---
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(FLUSH_SEC)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """링 버퍼와 (주기가 됐으면) 집계를 stdout에 씁니다."""
+        t_cpu = time.thread_time()
+        with self._lock:
+            batch, self._ring = self._ring, collections.deque()
+            dropped, self._dropped_reported = self.dropped - self._dropped_reported, self.dropped
+            counts = None
+            if self._counts and INFO >= _level and (self._closed or time.monotonic() - self._last_aggregate >= AGGREGATE_SEC):
+                counts, self._counts = self._counts, collections.defaultdict(collections.Counter)
+                self._last_aggregate = time.monotonic()
+        if dropped: batch.append((time.time(), WARN, "LOG", "%d line(s) dropped (ring buffer full)", (dropped,), {}))
+        if counts:
+            for tag, events in counts.items():
+                batch.append((time.time(), INFO, tag, "stats", (), dict(sorted(events.items()))))
+        if batch: self._write(batch)
+        self.writer_cpu_sec += time.thread_time() - t_cpu
+
+    def _write(self, batch):
+        text = "".join(_render(rec) + "\n" for rec in batch)
+        try:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        except (OSError, ValueError): pass # Electron이 stdout을 닫음 (종료 중)
+        self.lines += len(batch)
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None: self._thread.join(1.0)
+        self.flush()
+
+    def stats(self):
+        return {"level": _level_name(_level), "format": _format, "lines": self.lines, "dropped": self.dropped,
+                "queued": len(self._ring), "caller_ms": round(self.caller_sec * 1000, 3), "writer_cpu_ms": round(self.writer_cpu_sec * 1000, 3)}
+
+
+def _level_name(level):
+    return next((k for k, v in LEVELS.items() if v == level), str(level))
+
+
+def _render(rec):
+    t, level, tag, msg, args, fields = rec
+    if args:
+        try: msg = msg % args
+        except (TypeError, ValueError) as e: msg = f"{msg} {args!r} (format error: {e})"
+    if _format == "json":
+        return json.dumps({"t": round(t, 3), "level": _level_name(level), "tag": tag, "msg": msg, **fields}, ensure_ascii=False, default=str)
+    line = f"[{tag}]{LEVEL_MARKS.get(level, '')} {msg}"
+    return line + "".join(f" {k}={json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v}" for k, v in fields.items())
+
+
+_writer = LogWriter()
+atexit.register(_writer.close)
+
+
+def log(level, tag, msg, *args, **fields):
+    """msg % args는 쓰기 스레드에서 만듭니다. 인자는 기록 시점 값이 필요하면 불변 값(문자열/숫자)으로 넘깁니다."""
+    if level >= _level: _writer.emit(level, tag, msg, args, fields)
+
+def debug(tag, msg, *args, **fields):
+    if DEBUG >= _level: _writer.emit(DEBUG, tag, msg, args, fields)
+
+def info(tag, msg, *args, **fields):
+    if INFO >= _level: _writer.emit(INFO, tag, msg, args, fields)
+
+def warn(tag, msg, *args, **fields):
+    if WARN >= _level: _writer.emit(WARN, tag, msg, args, fields)
+
+def error(tag, msg, *args, **fields):
+    if ERROR >= _level: _writer.emit(ERROR, tag, msg, args, fields)
+
+def count(tag, event, n=1):
+    _writer.count(tag, event, n)
+
+def sampled(key, every):
+    return _writer.sampled(key, every)
+
+def flush():
+    _writer.flush()
+
+def close():
+    _writer.close()
+
+def stats():
+    return _writer.stats()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+워커 지표 공용 모듈 (tts_pipeline.py / stt_worker_gcloud.py 공용)
+- MetricsStore: 이름별 히스토그램(지연 ms, RTF 등)과 카운터를 메모리에 고정 크기로 모읍니다.
+  전체 누적 외에 WINDOW_SEC(기본 1시간) 단위 구간을 최근 WINDOWS개까지 따로 보관해 "오후 2시의 첫 오디오 지연" 같은 질문에 답합니다.
+- Histogram: 로그 간격 고정 버킷(약 19% 해상도)이라 표본 수와 상관없이 크기가 일정하고, p50/p90/p95/p99를 버킷에서 계산합니다.
+- UtteranceTrace: 발화 하나가 파이프 수신부터 거친 단계별 시각/소요 시간을 모아 타임라인 한 줄로 출력합니다.
+- 워커는 파이프로 {"command": "metrics"}를 받으면 snapshot()을 JSON 한 줄({"type": "metrics", ...})로 요청한 연결에만 답합니다.
+
+조회 CLI (Windows):
+    python kiosk_metrics.py                       (\\.\pipe\melo_tts)
+    python kiosk_metrics.py \\.\pipe\stt_whisper --windows 3
+"""
+
+import os, sys, json, time, bisect, argparse, itertools, threading
+
+WINDOW_SEC = 3600
+WINDOWS = 24
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+# 버킷 상한: 0.01 ~ 약 1e6 (4단계마다 2배)
+BOUNDS = [0.01 * 2 ** (k / 4) for k in range(108)]
+
+
+class Histogram:
+    """고정 로그 버킷 히스토그램. 백분위 값은 해당 버킷 상한(최댓값 이하로 자름)입니다."""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count, self.total, self.min, self.max = 0, 0.0, float('inf'), 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min: self.min = value
+        if value > self.max: self.max = value
+
+    def percentile(self, p):
+        if not self.count: return 0.0
+        rank, seen = p * self.count, 0
+        for k, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n: return min(BOUNDS[k] if k < len(BOUNDS) else self.max, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count: return {"count": 0}
+        out = {"count": self.count, "mean": round(self.total / self.count, 3), "min": round(self.min, 3)}
+        for p in PERCENTILES: out[f"p{round(p * 100)}"] = round(self.percentile(p), 3)
+        out["max"] = round(self.max, 3)
+        return out
+
+
+class MetricsStore:
+    """카운터 + 히스토그램 묶음 (스레드 안전). 이름은 자유 문자열이며 처음 기록할 때 만들어집니다."""
+
+    def __init__(self, window_sec=WINDOW_SEC, windows=WINDOWS):
+        self._lock = threading.Lock()
+        self.window_sec = window_sec
+        self.started = time.time()
+        self.counters, self.histograms = {}, {}
+        self._windows = [] # [(구간 시작 epoch, counters, histograms)], 최근 windows개
+        self._max_windows = windows
+
+    def _window(self):
+        start = int(time.time() // self.window_sec * self.window_sec)
+        if not self._windows or self._windows[-1][0] != start:
+            self._windows.append((start, {}, {}))
+            del self._windows[:-self._max_windows]
+        return self._windows[-1]
+
+    def observe(self, name, value):
+        with self._lock:
+            _, _, window_hist = self._window()
+            for hist in (self.histograms, window_hist):
+                h = hist.get(name)
+                if h is None: h = hist[name] = Histogram()
+                h.add(value)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            _, window_counters, _ = self._window()
+            for counters in (self.counters, window_counters):
+                counters[name] = counters.get(name, 0) + n
+
+    def snapshot(self, windows=None):
+        """{"uptime_sec", "counters", "histograms": {이름: 요약}, "windows": [최근 구간부터 {"start", ...}]}"""
+        with self._lock:
+            recent = self._windows[::-1][:self._max_windows if windows is None else max(0, int(windows))]
+            return {"uptime_sec": round(time.time() - self.started, 1), "window_sec": self.window_sec,
+                    "counters": dict(self.counters),
+                    "histograms": {k: h.summary() for k, h in sorted(self.histograms.items())},
+                    "windows": [{"start": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(start)), "counters": dict(counters),
+                                 "histograms": {k: h.summary() for k, h in sorted(hist.items())}}
+                                for start, counters, hist in recent]}
+
+
+class UtteranceTrace:
+    """발화 하나의 단계별 시각(mark, 수신 기준 ms)과 세그먼트 단계 소요 시간 합계(add, ms)"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, t_recv=None, chars=0):
+        self.id = next(UtteranceTrace._ids)
+        self.t_recv = t_recv or time.perf_counter()
+        self.chars = chars
+        self.segments = 0
+        self.marks, self.totals = {}, {}
+        self.cache = {}
+        self._lock = threading.Lock()
+
+    def mark(self, stage, t=None):
+        """처음 한 번만 기록 (예: 첫 세그먼트 합성 시작, 첫 재생). 수신부터의 ms를 반환하고, 이미 기록된 단계면 None"""
+        with self._lock:
+            if stage in self.marks: return None
+            ms = self.marks[stage] = ((t or time.perf_counter()) - self.t_recv) * 1000
+            return ms
+
+    def add(self, stage, ms):
+        with self._lock: self.totals[stage] = self.totals.get(stage, 0.0) + ms
+
+    def count_cache(self, source):
+        with self._lock: self.cache[source] = self.cache.get(source, 0) + 1
+
+    def timeline(self):
+        with self._lock:
+            return {"id": self.id, "chars": self.chars, "segments": self.segments,
+                    "marks_ms": {k: round(v, 1) for k, v in sorted(self.marks.items(), key=lambda kv: kv[1])},
+                    "totals_ms": {k: round(v, 1) for k, v in self.totals.items()}, "cache": dict(self.cache)}
+
+
+def metrics_reply(**sections):
+    """파이프 응답 한 줄: {"type": "metrics", ...sections}"""
+    return json.dumps(dict(type="metrics", **sections), ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a kiosk worker pipe for its latency metrics.")
+    parser.add_argument('pipe', nargs='?', default=r"\\.\pipe\melo_tts")
+    parser.add_argument('--windows', type=int, default=None, help="최근 몇 개 구간까지 받을지 (기본 전부)")
+    parser.add_argument('--timeout', type=float, default=3.0)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from pipe_transport import connect
+    got = threading.Event()
+
+    def on_line(conn, line):
+        if line.startswith(b"{") and b'"metrics"' in line:
+            print(json.dumps(json.loads(line), ensure_ascii=False, indent=2), flush=True)
+            got.set()
+    conn = connect(args.pipe, on_line)
+    request = {"command": "metrics"}
+    if args.windows is not None: request["windows"] = args.windows
+    conn.send(json.dumps(request).encode("utf-8") + b"\n")
+    if not got.wait(args.timeout): print(f"[METRICS][ERR] No reply from {args.pipe} in {args.timeout}s", flush=True)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+"""
+Windows Named Pipe 전이중(full-duplex) 전송 공용 모듈 (tts_pipeline.py / stt_worker_gcloud.py 공용)
+- 파이프를 오버랩드(overlapped) I/O로 열고 연결마다 읽기 스레드와 쓰기 스레드를 따로 둡니다.
+  읽기가 클라이언트 입력을 기다리는 동안에도 READY/START/DONE/STT 결과 같은 송신 메시지는 send() 즉시 나갑니다.
+  (기존 루프는 블로킹 ReadFile 사이에서만 신호 큐를 비워, 클라이언트가 다음 메시지를 보낼 때까지 신호가 묶여 있었음)
+- 파이프 인스턴스를 여러 개 열어 두므로 Electron 외의 보조 클라이언트(모니터링/벤치마크 도구)도 동시에 붙을 수 있습니다.
+  PipeServer.send()는 연결된 모든 클라이언트에, Connection.send()는 그 클라이언트에만 보냅니다.
+- 수신 데이터는 개행 단위로 on_line(conn, line)에 넘깁니다. (line은 개행을 뺀 bytes)
+  연결 후 클라이언트와 합의하면 conn.set_binary(on_frame)로 그 연결의 수신을 이진 프레임으로 바꿉니다.
+  프레임 = 헤더(종류 1바이트 + 길이 4바이트, little-endian) + 페이로드. (FRAME_AUDIO: PCM 원본, FRAME_CONTROL: JSON)
+  on_frame(conn, kind, payload)의 payload는 수신 버퍼를 가리키는 memoryview라 호출 중에만 유효합니다. (복사 없음)
+  송신(서버 -> 클라이언트)은 두 방식 모두 JSON 줄 그대로입니다.
+- 송신 지연(send() 호출 -> WriteFile 완료)을 연결마다 기록해 stats()로 볼 수 있습니다.
+- connect_pipe(): 같은 방식(오버랩드, 읽기/쓰기 분리)으로 동작하는 클라이언트 연결 (벤치마크/보조 도구용)
+- Windows 밖(리눅스 빌드/벤치마크 서버)에서는 같은 파이프 이름을 KIOSK_IPC_DIR 아래 Unix 도메인 소켓(melo_tts.sock 등)으로 바꿔
+  SocketServer / SocketConnection이 같은 인터페이스로 동작합니다. 워커는 open_server() / connect()만 쓰면 전송 방식을 몰라도 됩니다.
+  (KIOSK_IPC=socket 이면 pywin32가 있어도 소켓 사용)
+- 연결/해제/오류 로그는 kiosk_log로 남겨 읽기/쓰기 스레드가 stdout flush를 기다리지 않습니다.
+"""
+
+import os, time, queue, socket, struct, tempfile, itertools, threading, collections
+import kiosk_log as log
+try:
+    import pywintypes, win32pipe, win32file, win32event, win32con, winerror
+    WIN32_AVAILABLE = True
+    # 클라이언트가 연결을 끊었을 때 읽기/쓰기에서 나오는 오류 코드
+    DISCONNECTED = (winerror.ERROR_BROKEN_PIPE, winerror.ERROR_NO_DATA, winerror.ERROR_PIPE_NOT_CONNECTED,
+                    winerror.ERROR_OPERATION_ABORTED)
+except ImportError: # pywin32 없음 (리눅스) -> Unix 도메인 소켓 전송만 사용
+    WIN32_AVAILABLE = False
+
+READ_SIZE = 65536
+USE_PIPES = WIN32_AVAILABLE and os.environ.get('KIOSK_IPC', 'pipe') != 'socket'
+SOCKET_DIR = os.environ.get('KIOSK_IPC_DIR') or tempfile.gettempdir()
+ACCEPT_POLL_SEC = 0.2 # 소켓 서버가 종료 요청을 확인하는 간격
+LATENCY_WINDOW = 1000 # 백분위 계산에 쓰는 최근 송신 지연 표본 수
+MAX_MESSAGE = 4 * 1024 * 1024 # 줄/프레임 하나의 최대 크기 (넘으면 잘못된 스트림으로 보고 연결을 끊음)
+# 이진 프레임
+FRAME_HEADER = struct.Struct("<BI")
+FRAME_AUDIO, FRAME_CONTROL = 1, 2
+
+
+def encode_frame(kind, payload):
+    """이진 프레임 헤더 + 페이로드 (클라이언트/벤치마크용)"""
+    return FRAME_HEADER.pack(kind, len(payload)) + bytes(payload)
+
+
+class LatencyStats:
+    """송신 지연(초) 누적 통계: 횟수/평균/최대 + 최근 LATENCY_WINDOW개 표본의 p50/p95"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count, self.total, self.max = 0, 0.0, 0.0
+        self.recent = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, sec):
+        with self._lock:
+            self.count += 1
+            self.total += sec
+            self.max = max(self.max, sec)
+            self.recent.append(sec)
+
+    def merge(self, other):
+        with other._lock:
+            count, total, mx, recent = other.count, other.total, other.max, list(other.recent)
+        with self._lock:
+            self.count += count
+            self.total += total
+            self.max = max(self.max, mx)
+            self.recent.extend(recent)
+
+    def summary(self):
+        with self._lock:
+            recent = sorted(self.recent)
+            pct = lambda p: recent[min(len(recent) - 1, int(p * len(recent)))] * 1000 if recent else 0.0
+            return {"count": self.count, "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+                    "p50_ms": pct(0.5), "p95_ms": pct(0.95), "max_ms": self.max * 1000}
+
+
+class RxBuffer:
+    """수신 버퍼: bytearray 하나에 ReadFile이 이어서 직접 채우고, 처리한 앞부분은 위치(start)만 옮깁니다.
+    빈 공간이 모자라면 아직 처리하지 않은 꼬리(보통 줄/프레임 일부)만 앞으로 당기고, 그래도 모자라면 키웁니다."""
+
+    def __init__(self, size=READ_SIZE * 2):
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.start = self.end = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def writable(self, min_free=READ_SIZE // 4):
+        """다음 ReadFile이 채울 빈 공간 (memoryview)"""
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif len(self.buf) - self.end < min_free:
+            n = self.end - self.start
+            if len(self.buf) - n < min_free: # 꼬리를 당겨도 모자람 -> 두 배로
+                buf = bytearray(len(self.buf) * 2)
+                buf[:n] = self.view[self.start:self.end]
+                self.buf, self.view = buf, memoryview(buf)
+            else:
+                self.buf[:n] = self.buf[self.start:self.end]
+            self.start, self.end = 0, n
+        return self.view[self.end:]
+
+
+def _new_overlapped():
+    ov = pywintypes.OVERLAPPED()
+    ov.hEvent = win32event.CreateEvent(None, True, False, None)
+    return ov
+
+
+def _wait_overlapped(handle, ov, abort_evt):
+    """오버랩드 작업 완료를 기다려 전송 바이트 수를 돌려줍니다. abort_evt가 먼저 켜지면 작업을 취소하고 None.
+    (CancelIo는 호출한 스레드가 건 I/O만 취소하므로 작업을 건 스레드에서 호출해야 합니다)"""
+    rc = win32event.WaitForMultipleObjects([ov.hEvent, abort_evt], False, win32event.INFINITE)
+    if rc == win32event.WAIT_OBJECT_0:
+        return win32file.GetOverlappedResult(handle, ov, False)
+    try: win32file.CancelIo(handle)
+    except pywintypes.error: pass
+    try: win32file.GetOverlappedResult(handle, ov, True) # 커널이 버퍼를 놓을 때까지 대기
+    except pywintypes.error: pass
+    return None
+
+
+class Connection:
+    """연결 하나의 읽기/쓰기 경로. run()이 읽기 루프를 돌고 쓰기는 별도 스레드가 out_q를 비웁니다."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, handle, on_line, name="PIPE"):
+        self.id = next(Connection._ids)
+        self.handle = handle
+        self.name = name
+        self.on_line = on_line
+        self.on_frame = None # set_binary() 이후 수신 처리
+        self.out_q = queue.Queue()
+        self.latency = LatencyStats()
+        self.closed = threading.Event()
+        self._abort = win32event.CreateEvent(None, True, False, None) # 대기 중인 I/O를 깨우는 이벤트
+        self._thread = None
+
+    def send(self, data):
+        """송신 큐에 넣고 바로 돌아옵니다. (쓰기 스레드가 즉시 WriteFile) 이미 닫힌 연결이면 False"""
+        if self.closed.is_set(): return False
+        self.out_q.put((time.perf_counter(), data))
+        return True
+
+    def set_binary(self, on_frame):
+        """이후 수신 바이트를 이진 프레임으로 해석합니다. (on_line 안에서 호출하면 같은 버퍼의 나머지부터 적용)"""
+        self.on_frame = on_frame
+
+    def close(self):
+        """읽기/쓰기 대기를 깨워 연결을 끝냅니다. (핸들은 run()을 돌린 쪽이 정리)"""
+        self.closed.set()
+        win32event.SetEvent(self._abort)
+        self.out_q.put(None)
+
+    def start(self):
+        """run()을 별도 스레드에서 돌리고 끝나면 핸들을 닫습니다. (클라이언트 연결용)"""
+        def _run():
+            try: self.run()
+            finally: win32file.CloseHandle(self.handle)
+        self._thread = threading.Thread(target=_run, daemon=True)
+        self._thread.start()
+        return self
+
+    def join(self, timeout=None):
+        if self._thread: self._thread.join(timeout)
+
+    def run(self):
+        """쓰기 스레드를 띄우고 이 스레드에서 읽기 루프를 돕니다. 연결이 끊기거나 close()되면 반환"""
+        writer = threading.Thread(target=self._write_loop, daemon=True)
+        writer.start()
+        try:
+            self._read_loop()
+        finally:
+            self.close()
+            writer.join()
+
+    def _read_loop(self):
+        ov, rx = _new_overlapped(), RxBuffer()
+        try:
+            while not self.closed.is_set():
+                try:
+                    win32file.ReadFile(self.handle, rx.writable(), ov)
+                    n = _wait_overlapped(self.handle, ov, self._abort)
+                except pywintypes.error as e:
+                    if e.winerror in DISCONNECTED: return
+                    raise
+                if n is None: return
+                rx.end += n
+                if not self._dispatch(rx) or len(rx) > MAX_MESSAGE:
+                    log.error(self.name, "Message larger than %d bytes. Closing connection.", MAX_MESSAGE)
+                    return
+        finally:
+            win32file.CloseHandle(ov.hEvent)
+
+    def _dispatch(self, rx):
+        """버퍼에 완성된 줄/프레임을 모두 처리합니다. (처리 도중 set_binary()로 방식이 바뀔 수 있음)
+        프레임 길이가 MAX_MESSAGE를 넘는 잘못된 스트림이면 False"""
+        while len(rx):
+            if self.on_frame is None:
+                i = rx.buf.find(b"\n", rx.start, rx.end)
+                if i < 0: break
+                line, rx.start = bytes(rx.view[rx.start:i]), i + 1
+                self._deliver(self.on_line, line)
+            else:
+                if len(rx) < FRAME_HEADER.size: break
+                kind, length = FRAME_HEADER.unpack_from(rx.buf, rx.start)
+                if length > MAX_MESSAGE: return False
+                end = rx.start + FRAME_HEADER.size + length
+                if end > rx.end: break
+                payload, rx.start = rx.view[rx.start + FRAME_HEADER.size:end], end
+                self._deliver(self.on_frame, kind, payload)
+        return True
+
+    def _deliver(self, handler, *args):
+        try: handler(self, *args)
+        except Exception as e: log.error(self.name, "Message handler failed: %s", e)
+
+    def _next_batch(self):
+        """송신 큐에서 다음 메시지를 기다려, 그 사이 쌓인 메시지까지 묶어 반환합니다. (한 번의 쓰기로 보냄) 종료 신호면 None"""
+        item = self.out_q.get()
+        if item is None: return None
+        batch = [item]
+        while True:
+            try: nxt = self.out_q.get_nowait()
+            except queue.Empty: break
+            if nxt is None: self.out_q.put(None); break
+            batch.append(nxt)
+        return batch
+
+    def _write_loop(self):
+        ov = _new_overlapped()
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None: return
+                try:
+                    win32file.WriteFile(self.handle, b"".join(data for _, data in batch), ov)
+                    if _wait_overlapped(self.handle, ov, self._abort) is None: return
+                except pywintypes.error as e:
+                    if e.winerror not in DISCONNECTED: log.error(self.name, "Write failed: %s", e)
+                    return
+                done = time.perf_counter()
+                for t0, _ in batch: self.latency.add(done - t0)
+        finally:
+            self.closed.set()
+            win32event.SetEvent(self._abort) # 쓰기 실패 시 읽기 대기도 깨움
+            win32file.CloseHandle(ov.hEvent)
+
+
+class _Server:
+    """PipeServer / SocketServer 공통: 연결 목록, 전체 송신, 송신 지연 통계"""
+
+    def __init__(self, pipe_name, on_line, name, instances, on_connect, on_disconnect):
+        self.pipe_name, self.on_line, self.name = pipe_name, on_line, name
+        self.instances = max(1, instances)
+        self.on_connect, self.on_disconnect = on_connect, on_disconnect
+        self._lock = threading.Lock()
+        self._conns = []
+        self._closed_latency = LatencyStats() # 끊긴 연결의 송신 지연 누적
+        self.threads = []
+
+    @property
+    def clients(self):
+        with self._lock: return list(self._conns)
+
+    def alive(self):
+        return bool(self.threads) and all(t.is_alive() for t in self.threads)
+
+    def send(self, data):
+        """연결된 모든 클라이언트에 보냅니다. 받은 클라이언트 수를 반환합니다. (연결이 없으면 버림)"""
+        return sum(conn.send(data) for conn in self.clients)
+
+    def stats(self):
+        total = LatencyStats()
+        total.merge(self._closed_latency)
+        conns = self.clients
+        for conn in conns: total.merge(conn.latency)
+        return {"clients": len(conns), "send_latency": total.summary()}
+
+    def _run_connection(self, conn):
+        """연결 하나를 끝날 때까지 처리합니다. (on_connect -> 읽기 루프 -> on_disconnect)"""
+        with self._lock: self._conns.append(conn)
+        log.info(self.name, "Client #%d connected (%d client(s))", conn.id, len(self.clients))
+        try:
+            if self.on_connect: self.on_connect(conn)
+            conn.run()
+        finally:
+            with self._lock: self._conns.remove(conn)
+            self._closed_latency.merge(conn.latency)
+            log.info(self.name, "Client #%d disconnected. send latency %s", conn.id, conn.latency.summary())
+            if self.on_disconnect: self.on_disconnect(conn)
+
+
+class PipeServer(_Server):
+    """Named Pipe 서버. 인스턴스마다 스레드 하나가 연결 대기 -> Connection.run() -> 연결 해제를 반복합니다.
+    on_connect(conn) / on_disconnect(conn)는 그 인스턴스 스레드에서 호출됩니다."""
+
+    def __init__(self, pipe_name, on_line, name="PIPE", instances=4, on_connect=None, on_disconnect=None, buffer_size=65536):
+        super().__init__(pipe_name, on_line, name, instances, on_connect, on_disconnect)
+        self.buffer_size = buffer_size
+        self._stop = win32event.CreateEvent(None, True, False, None)
+
+    @property
+    def stopped(self):
+        return win32event.WaitForSingleObject(self._stop, 0) == win32event.WAIT_OBJECT_0
+
+    def start(self):
+        for idx in range(self.instances):
+            th = threading.Thread(target=self._serve, args=(idx,), daemon=True)
+            th.start()
+            self.threads.append(th)
+        log.info(self.name, "Listening on %s (%d instance(s))", self.pipe_name, self.instances)
+        return self
+
+    def close(self, timeout=2.0):
+        win32event.SetEvent(self._stop)
+        for conn in self.clients: conn.close()
+        for th in self.threads: th.join(timeout)
+
+    def _accept(self, handle):
+        """클라이언트 연결까지 대기. 서버가 닫히면 False"""
+        ov = _new_overlapped()
+        try:
+            rc = win32pipe.ConnectNamedPipe(handle, ov)
+            if rc == winerror.ERROR_PIPE_CONNECTED: return True # 대기 전에 이미 연결됨
+            return _wait_overlapped(handle, ov, self._stop) is not None
+        finally:
+            win32file.CloseHandle(ov.hEvent)
+
+    def _serve(self, idx):
+        while not self.stopped:
+            handle = None
+            try:
+                handle = win32pipe.CreateNamedPipe(self.pipe_name, win32con.PIPE_ACCESS_DUPLEX | win32file.FILE_FLAG_OVERLAPPED,
+                                                   win32pipe.PIPE_TYPE_BYTE | win32pipe.PIPE_READMODE_BYTE | win32pipe.PIPE_WAIT,
+                                                   self.instances, self.buffer_size, self.buffer_size, 0, None)
+                while self._accept(handle):
+                    try:
+                        self._run_connection(Connection(handle, self.on_line, self.name))
+                    finally:
+                        try: win32pipe.DisconnectNamedPipe(handle) # 같은 인스턴스로 다음 클라이언트를 받음
+                        except pywintypes.error: pass
+            except Exception as e:
+                log.error(self.name, "Error on instance %d: %s", idx, e)
+                time.sleep(1)
+            finally:
+                if handle: win32file.CloseHandle(handle)
+
+
+def connect_pipe(pipe_name, on_line, name="CLIENT", timeout_ms=5000):
+    """서버에 오버랩드 클라이언트로 연결해 읽기/쓰기 스레드를 시작한 Connection을 반환합니다."""
+    win32pipe.WaitNamedPipe(pipe_name, timeout_ms)
+    handle = win32file.CreateFile(pipe_name, win32con.GENERIC_READ | win32con.GENERIC_WRITE, 0, None,
+                                  win32con.OPEN_EXISTING, win32file.FILE_FLAG_OVERLAPPED, None)
+    return Connection(handle, on_line, name).start()
+
+
+# --- Unix 도메인 소켓 전송 (Windows 밖) ---
+class SocketConnection(Connection):
+    """Unix 도메인 소켓 연결 하나. 줄/프레임 처리, 송신 큐, 지연 통계는 Connection과 같고 읽기/쓰기만 소켓으로 합니다."""
+
+    def __init__(self, sock, on_line, name="SOCK"):
+        self.id = next(Connection._ids)
+        self.sock = sock
+        self.name = name
+        self.on_line = on_line
+        self.on_frame = None
+        self.out_q = queue.Queue()
+        self.latency = LatencyStats()
+        self.closed = threading.Event()
+        self._thread = None
+
+    def close(self):
+        self.closed.set()
+        try: self.sock.shutdown(socket.SHUT_RDWR) # 대기 중인 recv를 깨움
+        except OSError: pass
+        self.out_q.put(None)
+
+    def start(self):
+        def _run():
+            try: self.run()
+            finally: self.sock.close()
+        self._thread = threading.Thread(target=_run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _read_loop(self):
+        rx = RxBuffer()
+        while not self.closed.is_set():
+            try: n = self.sock.recv_into(rx.writable())
+            except OSError: return
+            if not n: return # 상대가 연결을 닫음
+            rx.end += n
+            if not self._dispatch(rx) or len(rx) > MAX_MESSAGE:
+                log.error(self.name, "Message larger than %d bytes. Closing connection.", MAX_MESSAGE)
+                return
+
+    def _write_loop(self):
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None: return
+                try:
+                    self.sock.sendall(b"".join(data for _, data in batch))
+                except OSError as e:
+                    if not self.closed.is_set(): log.error(self.name, "Write failed: %s", e)
+                    return
+                done = time.perf_counter()
+                for t0, _ in batch: self.latency.add(done - t0)
+        finally:
+            self.closed.set()
+            try: self.sock.shutdown(socket.SHUT_RDWR) # 쓰기 실패 시 읽기 대기도 깨움
+            except OSError: pass
+
+
+class SocketServer(_Server):
+    """Unix 도메인 소켓 서버 (PipeServer와 같은 인터페이스). 연결마다 스레드 하나가 SocketConnection.run()을 돌리며,
+    동시 연결은 instances개까지 받습니다."""
+
+    def __init__(self, path, on_line, name="PIPE", instances=4, on_connect=None, on_disconnect=None, buffer_size=65536):
+        super().__init__(path, on_line, name, instances, on_connect, on_disconnect)
+        self._stop = threading.Event()
+        self._sock = None
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def start(self):
+        if os.path.exists(self.pipe_name): os.unlink(self.pipe_name) # 이전 프로세스가 남긴 소켓 파일
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.pipe_name)
+        self._sock.listen(self.instances)
+        self._sock.settimeout(ACCEPT_POLL_SEC)
+        th = threading.Thread(target=self._serve, daemon=True)
+        th.start()
+        self.threads.append(th)
+        log.info(self.name, "Listening on %s (unix socket, %d client(s) max)", self.pipe_name, self.instances)
+        return self
+
+    def alive(self):
+        return bool(self.threads) and self.threads[0].is_alive()
+
+    def close(self, timeout=2.0):
+        self._stop.set()
+        for conn in self.clients: conn.close()
+        for th in self.threads: th.join(timeout)
+        try: os.unlink(self.pipe_name)
+        except OSError: pass
+
+    def _serve(self):
+        try:
+            while not self.stopped:
+                try: sock, _ = self._sock.accept()
+                except socket.timeout: continue
+                if len(self.clients) >= self.instances:
+                    log.warn(self.name, "Too many clients (%d). Connection refused.", self.instances)
+                    sock.close()
+                    continue
+                sock.settimeout(None)
+                conn = SocketConnection(sock, self.on_line, self.name)
+                th = threading.Thread(target=self._handle, args=(conn,), daemon=True)
+                th.start()
+        finally:
+            self._sock.close()
+
+    def _handle(self, conn):
+        try: self._run_connection(conn)
+        except Exception as e: log.error(self.name, "Error on client #%d: %s", conn.id, e)
+        finally: conn.sock.close()
+
+
+def socket_path(pipe_name):
+    r"""파이프 이름(\\.\pipe\melo_tts)에 대응하는 소켓 경로 (KIOSK_IPC_DIR/melo_tts.sock)"""
+    return os.path.join(SOCKET_DIR, pipe_name.rsplit('\\', 1)[-1] + ".sock")
+
+
+def connect_socket(path, on_line, name="CLIENT", timeout_ms=5000):
+    """소켓 서버에 연결해 읽기/쓰기 스레드를 시작한 SocketConnection을 반환합니다. 서버가 아직 없으면 timeout_ms까지 재시도"""
+    deadline = time.perf_counter() + timeout_ms / 1000.0
+    while True:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            return SocketConnection(sock, on_line, name).start()
+        except OSError:
+            sock.close()
+            if time.perf_counter() >= deadline: raise
+            time.sleep(0.05)
+
+
+def open_server(pipe_name, on_line, **kwargs):
+    """플랫폼에 맞는 서버: Windows면 Named Pipe, 아니면 같은 이름의 Unix 도메인 소켓 (start()는 호출하는 쪽에서)"""
+    if USE_PIPES: return PipeServer(pipe_name, on_line, **kwargs)
+    return SocketServer(socket_path(pipe_name), on_line, **kwargs)
+
+
+def connect(pipe_name, on_line, name="CLIENT", timeout_ms=5000):
+    """open_server()로 연 서버에 같은 방식으로 연결합니다."""
+    if USE_PIPES: return connect_pipe(pipe_name, on_line, name, timeout_ms)
+    return connect_socket(socket_path(pipe_name), on_line, name, timeout_ms)
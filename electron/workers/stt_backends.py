@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+STT 엔진(백엔드) 공용 모듈 (stt_worker_gcloud.py / bench/bench_stt.py 공용)
+- 백엔드는 open(lang_code)로 세션(SttSession)을 만들고, 세션은 put(PCM16 bytes) -> finish()로 오디오를 받아
+  activate(send)로 연결된 클라이언트에 {"type": "interim"|"result"|"error", ...} JSON 줄을 보냅니다.
+  (어느 백엔드든 파이프 메시지 형식은 같음)
+- GoogleBackend: Google Cloud Speech-to-Text 스트리밍. 클라이언트/gRPC 채널을 하나로 유지하고, 네트워크 오류가 나면
+  FAILURE_HOLD_SEC 동안 healthy()가 False가 되어 워커가 로컬 엔진으로 넘어갑니다.
+- WhisperBackend: 로컬 openai-whisper (CPU, 오프라인). 모델은 STT_WHISPER_DIR에 함께 배포한 <모델>.pt만 읽고 내려받지 않습니다.
+  발화 끝(endpoint()/finish())이나 창(WINDOW_SEC)이 찰 때 그 구간을 한 번 인식해 확정(result)하고 창을 비웁니다.
+  STT_WHISPER_INTERIM=1이면 STEP_SEC마다 창 전체를 다시 인식해 interim도 보냅니다. (창 길이만큼 CPU를 더 씀)
+- 백엔드 선택(STT_BACKEND)과 자동 전환은 워커가 합니다. 이 모듈은 엔진만 다룹니다.
+"""
+
+import os, time, json, queue, itertools, threading
+import numpy as np
+
+try:
+    import grpc
+    from google.api_core import exceptions as gexc
+    from google.cloud import speech
+    from google.cloud.speech_v1.services.speech.transports import SpeechGrpcTransport
+    GOOGLE_AVAILABLE = True
+except ImportError as e: # google-cloud-speech 미설치 -> 로컬 엔진만 사용
+    print(f"[STT][WARN] google-cloud-speech unavailable: {e}", flush=True)
+    GOOGLE_AVAILABLE = False
+
+SAMPLE_RATE = 16000
+# Speech API 연결. 비우면 Google, "host:port"면 그 주소의 평문 gRPC 서버 (로컬 가짜 서버 테스트용)
+SPEECH_ENDPOINT = os.environ.get('STT_SPEECH_ENDPOINT') or None
+CHANNEL_OPTIONS = [("grpc.keepalive_time_ms", 30000), ("grpc.keepalive_timeout_ms", 10000),
+                   ("grpc.keepalive_permit_without_calls", 1), ("grpc.http2.max_pings_without_data", 0),
+                   ("grpc.max_send_message_length", -1), ("grpc.max_receive_message_length", -1)]
+CHANNEL_READY_TIMEOUT_SEC = 10
+FAILURE_HOLD_SEC = float(os.environ.get('STT_FALLBACK_HOLD_SEC', '60')) # 네트워크 오류 후 Google을 다시 시도하기까지
+# 로컬 Whisper: 모델 이름(tiny/base/small ...), 모델 폴더(<모델>.pt를 함께 배포. 비우면 Whisper 사용 안 함),
+# interim 여부와 다시 인식하는 간격, 최대 창 길이(초, Whisper 입력 한도 30초 미만)
+WHISPER_MODEL = os.environ.get('STT_WHISPER_MODEL', 'base')
+WHISPER_DIR = os.environ.get('STT_WHISPER_DIR') or None
+WHISPER_THREADS = int(os.environ.get('STT_WHISPER_THREADS', '0')) # 0이면 torch 기본값
+INTERIM = os.environ.get('STT_WHISPER_INTERIM', '0') != '0'
+STEP_SEC = float(os.environ.get('STT_WHISPER_STEP_SEC', '1.0'))
+WINDOW_SEC = float(os.environ.get('STT_WHISPER_WINDOW_SEC', '10'))
+
+_ENDPOINT = object() # 세션 큐: 발화 끝 표시
+
+
+class SttSession:
+    """스트리밍 인식 세션 하나. 만들자마자 자기 스레드에서 오디오를 기다립니다.
+    activate() 전(미리 열어 둔 예비 세션)에는 결과/오류를 클라이언트로 보내지 않습니다."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, backend, lang_code, on_failure=None):
+        self.id = next(SttSession._ids)
+        self.backend, self.lang_code = backend, lang_code
+        self.on_failure = on_failure # on_failure(session, exc) -> True면 워커가 처리(전환)하므로 error를 보내지 않음
+        self.opened_at = time.monotonic()
+        self.audio_q = queue.Queue()
+        self.send = None
+        self.on_emit = None # on_emit(session, message) - 보낸 메시지마다 호출 (워커의 지표 기록용)
+        self.marks = {}     # 워커가 남기는 시각 (start, speech_end, stop -> 결과까지의 지연 계산)
+        self.finished = False
+        self.thread = threading.Thread(target=self._main, daemon=True)
+        self.thread.start()
+
+    def age(self):
+        return time.monotonic() - self.opened_at
+
+    def usable(self, lang_code, max_age):
+        return self.lang_code == lang_code and not self.finished and self.thread.is_alive() and self.age() < max_age
+
+    def activate(self, send, on_emit=None):
+        self.send, self.on_emit = send, on_emit
+
+    def put(self, chunk):
+        self.audio_q.put(chunk)
+
+    def endpoint(self):
+        """로컬 VAD가 발화 끝을 판단했을 때 (엔진이 그 자리에서 확정할 수 있으면 확정)"""
+
+    def finish(self):
+        """입력 종료(half-close). 남은 오디오의 최종 결과를 보내면 스레드가 끝납니다."""
+        if self.finished: return
+        self.finished = True
+        self.audio_q.put(None)
+
+    def _emit(self, response_data):
+        if not self.send: return
+        self.send(json.dumps(response_data, ensure_ascii=False).encode("utf-8") + b"\n")
+        if self.on_emit: self.on_emit(self, response_data)
+
+    def _main(self):
+        try:
+            self._run()
+        except Exception as e:
+            if self.send is None: # 쓰이지 않은 예비 세션 (만료/연결 실패)
+                print(f"[STT][WARN] Standby stream #{self.id} failed: {e}", flush=True)
+            elif not (self.on_failure and self.on_failure(self, e)):
+                print(f"[STT ERR] Streaming failed: {e}", flush=True)
+                self._emit({"type": "error", "message": str(e)})
+        print(f"[STT] Stream #{self.id} ({self.backend.name}, {self.lang_code}{'' if self.send else ', unused'}) finished after {self.age():.1f}s.", flush=True)
+
+    def _run(self):
+        raise NotImplementedError
+
+
+# --- Google Cloud Speech-to-Text ---
+def streaming_config(lang_code):
+    config = speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=SAMPLE_RATE,
+        language_code=lang_code,
+        enable_automatic_punctuation=True,
+        model="latest_long"
+    )
+    return speech.StreamingRecognitionConfig(
+        config=config,
+        interim_results=True # 중간 결과 받기
+    )
+
+
+class GoogleSession(SttSession):
+    def _requests(self):
+        """오디오 청크 큐에서 데이터를 뽑아 Google STT API로 yield하는 제너레이터"""
+        while True:
+            chunk = self.audio_q.get()
+            if chunk is None: return # 스트림 종료 신호
+            yield speech.StreamingRecognizeRequest(audio_content=chunk)
+
+    def _run(self):
+        try:
+            for response in self.backend.client.streaming_recognize(streaming_config(self.lang_code), self._requests()):
+                if not response.results or not response.results[0].alternatives:
+                    continue
+                result = response.results[0]
+                transcript = result.alternatives[0].transcript.strip()
+                self._emit({"type": "result" if result.is_final else "interim", "text": transcript})
+        except Exception as e:
+            if is_network_error(e): self.backend.mark_failure(e)
+            raise
+
+
+def is_network_error(e):
+    """연결/응답 지연 계열 오류인지 (인식 오류/잘못된 요청과 구분해 로컬 엔진으로 넘길지 판단)"""
+    if isinstance(e, (gexc.ServiceUnavailable, gexc.DeadlineExceeded, gexc.RetryError)): return True
+    return isinstance(e, grpc.RpcError) and e.code() in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED)
+
+
+class GoogleBackend:
+    """SpeechClient와 gRPC 채널을 한 번 만들어 유지합니다. (keepalive, 채널 상태 구독)
+    STT_SPEECH_ENDPOINT가 있으면 그 주소로 평문 gRPC 연결 (bench/fake_speech_server.py 같은 로컬 가짜 서버용)"""
+
+    name = "google"
+
+    def __init__(self):
+        if SPEECH_ENDPOINT:
+            self.channel = grpc.insecure_channel(SPEECH_ENDPOINT, options=CHANNEL_OPTIONS)
+        else:
+            self.channel = SpeechGrpcTransport.create_channel(options=CHANNEL_OPTIONS)
+        self.client = speech.SpeechClient(transport=SpeechGrpcTransport(channel=self.channel))
+        self.state = None
+        self.failed_at = None
+        self.channel.subscribe(self._on_state)
+
+    def _on_state(self, state):
+        if state != self.state: print(f"[STT] Google channel {state.name}", flush=True)
+        self.state = state
+
+    def warm(self):
+        """TCP/TLS 연결을 미리 맺어 둡니다. (첫 START에서 핸드셰이크 비용을 내지 않도록)"""
+        t0 = time.perf_counter()
+        try:
+            grpc.channel_ready_future(self.channel).result(timeout=CHANNEL_READY_TIMEOUT_SEC)
+            print(f"[STT] Channel to {SPEECH_ENDPOINT or 'speech.googleapis.com'} ready in {(time.perf_counter() - t0) * 1000:.0f}ms", flush=True)
+        except grpc.FutureTimeoutError:
+            print(f"[STT][WARN] Channel not ready after {CHANNEL_READY_TIMEOUT_SEC}s. Connecting on first stream.", flush=True)
+
+    def mark_failure(self, e):
+        print(f"[STT][WARN] Google unreachable ({type(e).__name__}). Holding off for {FAILURE_HOLD_SEC:.0f}s.", flush=True)
+        self.failed_at = time.monotonic()
+
+    def healthy(self):
+        if self.failed_at is not None and time.monotonic() - self.failed_at < FAILURE_HOLD_SEC: return False
+        return self.state != grpc.ChannelConnectivity.TRANSIENT_FAILURE
+
+    def open(self, lang_code, on_failure=None):
+        return GoogleSession(self, lang_code, on_failure)
+
+    def close(self):
+        self.channel.close()
+
+
+# --- 로컬 Whisper (오프라인) ---
+class WhisperSession(SttSession):
+    def endpoint(self):
+        self.audio_q.put(_ENDPOINT)
+
+    def _run(self):
+        backend, lang = self.backend, self.lang_code
+        step, window = int(STEP_SEC * SAMPLE_RATE), int(WINDOW_SEC * SAMPLE_RATE)
+        pcm = bytearray()
+        decoded = 0 # 마지막으로 interim을 낸 시점의 샘플 수
+        last_interim = ""
+        done = False
+        while not done:
+            items = [self.audio_q.get()]
+            while True: # 인식이 밀렸으면 쌓인 오디오를 한 번에 반영
+                try: items.append(self.audio_q.get_nowait())
+                except queue.Empty: break
+            for item in items:
+                if item is None or item is _ENDPOINT: # 발화 끝/입력 종료 -> 창 확정
+                    if len(pcm) // 2 > 0: self._emit({"type": "result", "text": backend.transcribe(pcm, lang)})
+                    pcm.clear()
+                    decoded, last_interim = 0, ""
+                    done = item is None
+                    if done: break
+                else:
+                    pcm += item
+            if done: break
+            samples = len(pcm) // 2
+            if samples >= window: # 창이 참 -> 이 구간 확정 후 새 창
+                self._emit({"type": "result", "text": backend.transcribe(pcm, lang)})
+                pcm.clear()
+                decoded, last_interim = 0, ""
+            elif INTERIM and samples - decoded >= step:
+                text = backend.transcribe(pcm, lang)
+                decoded = samples
+                if text and text != last_interim:
+                    self._emit({"type": "interim", "text": text})
+                    last_interim = text
+
+
+class WhisperBackend:
+    """openai-whisper 모델 하나를 CPU에서 공유합니다. 인식은 한 번에 하나씩 (모델이 스레드 안전하지 않음)
+    모델은 load()/load_async()를 부를 때 처음 한 번만 읽습니다. (auto 모드는 Google 네트워크 오류가 처음 날 때)"""
+
+    name = "whisper"
+
+    def __init__(self, model_name=WHISPER_MODEL):
+        self.model_name = model_name
+        self.model = None
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loading = False # load_async()가 로딩 스레드를 이미 띄웠는지
+
+    def model_path(self):
+        """함께 배포한 모델 파일 경로. 없으면 None (실행 중에 내려받지 않음)"""
+        if not WHISPER_DIR: return None
+        path = os.path.join(WHISPER_DIR, f"{self.model_name}.pt")
+        return path if os.path.isfile(path) else None
+
+    def available(self):
+        return self.model_path() is not None
+
+    def load(self):
+        """모델 로딩. 여러 번 불러도 한 번만 읽습니다. (이미 읽었거나 실패했으면 바로 반환)"""
+        with self._load_lock:
+            if self.ready.is_set(): return
+            t0 = time.perf_counter()
+            try:
+                path = self.model_path()
+                if path is None: raise FileNotFoundError(f"{self.model_name}.pt not found in STT_WHISPER_DIR ({WHISPER_DIR})")
+                import torch, whisper
+                if WHISPER_THREADS > 0: torch.set_num_threads(WHISPER_THREADS)
+                self.model = whisper.load_model(path, device="cpu") # 파일 경로를 주면 다운로드 없이 그 파일만 읽음
+                print(f"[STT] Whisper '{self.model_name}' loaded in {time.perf_counter() - t0:.1f}s", flush=True)
+            except Exception as e:
+                print(f"[STT][WARN] Whisper '{self.model_name}' unavailable: {e}", flush=True)
+            finally:
+                self.ready.set()
+
+    def load_async(self, then=None):
+        """백그라운드 스레드에서 load() 후 then()을 부릅니다. (호출한 스레드는 모델 로딩을 기다리지 않음)"""
+        if then is None and (self._loading or self.ready.is_set()): return
+        self._loading = True
+        def _run():
+            self.load()
+            if then: then()
+        threading.Thread(target=_run, daemon=True).start()
+
+    def healthy(self):
+        return self.model is not None
+
+    def transcribe(self, pcm, lang_code):
+        audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        with self._lock:
+            result = self.model.transcribe(audio, language=lang_code.split('-')[0].lower(), fp16=False, temperature=0.0,
+                                           condition_on_previous_text=False, without_timestamps=True)
+        return result["text"].strip()
+
+    def open(self, lang_code, on_failure=None):
+        self.ready.wait()
+        if self.model is None: raise RuntimeError(f"Whisper model '{self.model_name}' is not loaded")
+        return WhisperSession(self, lang_code, on_failure)
+
+    def close(self):
+        pass
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+STT 파이프 세션 기록 (stt_worker_gcloud.py / bench/replay_stt.py 공용)
+- STT_RECORD_DIR을 주면 워커가 스트림을 시작한 클라이언트의 start부터 다음 start까지를 세션 파일 하나로 남깁니다.
+  (start/stop 명령, 오디오 청크, 워커가 보낸 interim/result/speech_end/error 메시지와 각각의 수신/송신 시각)
+- 파일 = 헤더(MAGIC) + 레코드 반복. 레코드 = (세션 시작부터의 초 float64, 종류 1바이트, 길이 4바이트, little-endian) + 페이로드
+  종류: REC_AUDIO(PCM16 원본), REC_COMMAND(클라이언트 명령 JSON), REC_REPLY(워커 메시지 JSON 줄)
+- bench/replay_stt.py가 이 파일을 원래 속도(또는 배속)로 다시 보내고, 기록된 결과를 가짜 Speech 서버의 대본으로 씁니다.
+"""
+
+import os, json, time, struct, threading
+
+MAGIC = b"STTREC1\n"
+RECORD_HEADER = struct.Struct("<dBI")
+REC_AUDIO, REC_COMMAND, REC_REPLY = 1, 2, 3
+REPLY_LINGER_SEC = 10.0 # stop 뒤 최종 결과를 기다려 기록하는 시간 (다음 start가 오면 바로 닫음)
+
+
+class SessionRecorder:
+    """클라이언트 입력(파이프 읽기 스레드)과 워커 응답(세션 스레드)을 세션 파일에 이어 씁니다. (스레드 안전)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._f = None
+        self._t0 = self._stop_t = None
+        self.sessions = 0
+
+    def _write(self, kind, payload, now):
+        self._f.write(RECORD_HEADER.pack(now - self._t0, kind, len(payload)))
+        self._f.write(payload)
+
+    def command(self, obj):
+        """start면 새 세션 파일을 열고, stop이면 기록 후 REPLY_LINGER_SEC 동안 응답만 더 받습니다."""
+        now = time.perf_counter()
+        with self._lock:
+            if obj.get("command") == "start":
+                self._close_locked()
+                self.sessions += 1
+                path = os.path.join(self.directory, f"stt_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{self.sessions:04d}.sttrec")
+                self._f = open(path, 'wb')
+                self._f.write(MAGIC)
+                self._t0, self._stop_t = now, None
+            if self._f is None: return
+            self._write(REC_COMMAND, json.dumps(obj, ensure_ascii=False).encode("utf-8"), now)
+            if obj.get("command") == "stop": self._stop_t = now
+
+    def audio(self, chunk):
+        with self._lock:
+            if self._f is not None and self._stop_t is None: self._write(REC_AUDIO, chunk, time.perf_counter())
+
+    def reply(self, data):
+        now = time.perf_counter()
+        with self._lock:
+            if self._f is None: return
+            if self._stop_t is not None and now - self._stop_t > REPLY_LINGER_SEC: self._close_locked(); return
+            self._write(REC_REPLY, data.rstrip(b"\n"), now)
+
+    def close(self):
+        with self._lock: self._close_locked()
+
+    def _close_locked(self):
+        if self._f is None: return
+        try: self._f.close()
+        except OSError as e: print(f"[STT][WARN] Failed to close session recording: {e}", flush=True)
+        self._f = None
+
+
+def read_session(path):
+    """세션 파일 -> [(초, 종류, 페이로드 bytes)]. 끝이 잘린 파일(기록 중 종료)은 온전한 레코드까지만 읽습니다."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC): raise ValueError(f"{path}: not an STT session recording")
+    records, pos = [], len(MAGIC)
+    while pos + RECORD_HEADER.size <= len(data):
+        t, kind, length = RECORD_HEADER.unpack_from(data, pos)
+        pos += RECORD_HEADER.size
+        if pos + length > len(data): break
+        records.append((t, kind, data[pos:pos + length]))
+        pos += length
+    return records
+
+
+def session_script(records, sample_rate=16000):
+    """기록된 세션의 워커 응답을 가짜 Speech 서버 대본으로: [{"audio_sec", "text", "final"}]
+    audio_sec은 그 응답을 받기 전까지 보낸 오디오 길이입니다. (같은 오디오 위치에서 같은 결과를 다시 내도록)
+    stop 뒤에 받은 응답은 audio_sec이 None이며 가짜 서버가 입력 종료(half-close) 때 보냅니다."""
+    script, sent, stopped = [], 0, False
+    for t, kind, payload in records:
+        if kind == REC_AUDIO: sent += len(payload)
+        elif kind == REC_COMMAND: stopped = stopped or json.loads(payload).get("command") == "stop"
+        elif kind == REC_REPLY:
+            msg = json.loads(payload)
+            if msg.get("type") in ("interim", "result"):
+                script.append({"audio_sec": None if stopped else round(sent / (sample_rate * 2), 3), "text": msg.get("text", ""),
+                               "final": msg["type"] == "result"})
+    return script
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+STT 음성 구간 게이트 (stt_worker_gcloud.py에서 스트림마다 하나씩 사용)
+- webrtcvad로 16-bit mono PCM을 FRAME_MS 단위로 판정해, 말하는 구간만 Google STT로 보냅니다.
+  긴 침묵은 버려 전송량/과금 오디오를 줄이고, 발화 시작 앞(pre-roll)과 끝 뒤(hang-over)는 여유로 함께 보냅니다.
+  (hang-over 동안의 침묵은 서버가 문장 끝을 판단하는 데도 쓰임)
+- 발화 끝(hang-over 동안 연속 무음)을 로컬에서 판단해 "speech_end" 이벤트를 냅니다. (최종 인식 결과보다 먼저 UI 반응용)
+- 침묵이 길어도 스트림이 오디오 없음으로 끊기지 않도록 keepalive_ms마다 침묵 프레임 하나를 보냅니다.
+- 받은/보낸 오디오 길이(초)를 stats()로 제공합니다.
+- webrtcvad를 불러올 수 없으면 VAD_AVAILABLE이 False이며, 워커는 게이트 없이 모든 오디오를 보냅니다.
+"""
+
+import collections
+
+try:
+    import webrtcvad
+    VAD_AVAILABLE = True
+except Exception as e: # webrtcvad(-wheels) 미설치 -> 게이트 없이 동작
+    print(f"[VAD][WARN] webrtcvad unavailable, sending all audio: {e}", flush=True)
+    webrtcvad = None
+    VAD_AVAILABLE = False
+
+SAMPLE_WIDTH = 2        # 16-bit PCM
+TRIGGER_MS = 150        # 발화 시작 판단 구간
+TRIGGER_RATIO = 0.6     # 이 구간에서 음성 프레임 비율이 이 이상이면 발화 시작
+
+
+class VadGate:
+    """process(chunk)로 들어온 오디오 중 보낼 부분과 이벤트를 돌려주는 상태 기계 (침묵 <-> 발화)"""
+
+    def __init__(self, sample_rate=16000, aggressiveness=2, frame_ms=30, preroll_ms=300, hangover_ms=800, keepalive_ms=4000):
+        if frame_ms not in (10, 20, 30): raise ValueError("frame_ms must be 10, 20 or 30")
+        self.vad = webrtcvad.Vad(int(aggressiveness))
+        self.sample_rate, self.frame_ms = sample_rate, frame_ms
+        self.frame_bytes = sample_rate * frame_ms // 1000 * SAMPLE_WIDTH
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.keepalive_frames = max(1, keepalive_ms // frame_ms)
+        self.trigger = collections.deque(maxlen=max(1, TRIGGER_MS // frame_ms)) # 최근 프레임의 음성 여부
+        # 침묵 중 최근 프레임 (발화가 시작되면 앞에 붙여 보냄). 시작 판단 구간보다 짧으면 첫 음절이 잘리므로 그 이상으로
+        self.preroll = collections.deque(maxlen=max(preroll_ms // frame_ms, self.trigger.maxlen))
+        self.pending = bytearray() # 프레임 크기에 못 미친 나머지
+        self.in_speech = False
+        self.silent_run = 0        # 발화 중 연속 무음 프레임 수
+        self.since_sent = 0        # 침묵 중 마지막 전송 이후 프레임 수
+        self.received_bytes = self.sent_bytes = 0
+        self.utterances = 0
+
+    def process(self, chunk):
+        """chunk(bytes)를 처리해 (보낼 오디오 bytes 또는 None, 이벤트 목록)을 반환합니다."""
+        self.received_bytes += len(chunk)
+        self.pending += chunk
+        n = len(self.pending) // self.frame_bytes * self.frame_bytes
+        view = memoryview(self.pending)
+        out, events, frame = [], [], None
+        for off in range(0, n, self.frame_bytes):
+            frame = view[off:off + self.frame_bytes]
+            voiced = self.vad.is_speech(frame, self.sample_rate)
+            if self.in_speech:
+                out.append(frame)
+                self.silent_run = 0 if voiced else self.silent_run + 1
+                if self.silent_run >= self.hangover_frames:
+                    self.in_speech, self.since_sent = False, 0
+                    self.trigger.clear()
+                    events.append("speech_end")
+                continue
+            self.trigger.append(voiced)
+            self.preroll.append(bytes(frame))
+            self.since_sent += 1
+            if sum(self.trigger) >= TRIGGER_RATIO * self.trigger.maxlen:
+                out += self.preroll
+                self.preroll.clear()
+                self.in_speech, self.silent_run = True, 0
+                self.utterances += 1
+                events.append("speech_start")
+            elif self.since_sent >= self.keepalive_frames:
+                out.append(frame)
+                self.since_sent = 0
+                self.preroll.clear() # 보낸 프레임이 발화 시작 때 pre-roll로 다시 나가지 않도록 (그 앞 프레임을 뒤에 보내면 순서도 어긋남)
+        data = b"".join(out) if out else None
+        del out, view, frame # pending을 줄이기 전에 버퍼를 가리키는 memoryview를 모두 놓아야 함
+        del self.pending[:n]
+        if data: self.sent_bytes += len(data)
+        return data, events
+
+    def flush(self):
+        """스트림 종료 시 발화 중이면 프레임 크기에 못 미친 나머지도 보냅니다."""
+        data = bytes(self.pending) if self.in_speech and self.pending else None
+        self.pending.clear()
+        if data: self.sent_bytes += len(data)
+        return data
+
+    def stats(self):
+        rate = self.sample_rate * SAMPLE_WIDTH
+        received, sent = self.received_bytes / rate, self.sent_bytes / rate
+        return {"received_sec": round(received, 2), "sent_sec": round(sent, 2),
+                "sent_ratio": round(sent / received, 3) if received else 0.0, "utterances": self.utterances}
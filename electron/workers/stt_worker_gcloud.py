@@ -3,23 +3,64 @@
 로컬 IPC 워커 (STT) - Windows Named Pipe - [Google Cloud Speech-to-Text]
 - 파이프명: \\.\pipe\stt_whisper
 - main.js로부터 GOOGLE_APPLICATION_CREDENTIALS 환경 변수를 상속받아 사용합니다.
+- 파이프 송수신은 pipe_transport.open_server()의 서버(Windows: 오버랩드 Named Pipe, 그 밖: Unix 도메인 소켓)가 맡아
+  interim/result/error 메시지는 오디오 청크 수신과 상관없이 나오는 즉시 전달됩니다.
+- 오디오 전송 방식은 연결 직후 협상합니다.
+  클라이언트 {"command": "hello", "framing": "binary"} -> 워커 {"type": "hello", "framing": "binary"}
+  이후 그 연결은 이진 프레임(FRAME_AUDIO: PCM 원본, FRAME_CONTROL: start/stop 등 JSON)만 보냅니다.
+  hello를 보내지 않은 클라이언트는 기존 JSON 줄({"chunk": base64}) 그대로 동작합니다.
+- STT_VAD=1이면(기본 꺼짐) stt_vad.VadGate가 침묵을 걸러 말하는 구간(+앞뒤 여유)만 Google로 보내고,
+  로컬에서 발화 끝을 판단하면 {"type": "speech_end"}를 바로 보냅니다. 스트림마다 받은/보낸 오디오 길이를 출력합니다.
+- SpeechClient/gRPC 채널은 워커 시작 때 한 번 만들어 유지하고, 다음 스트림을 미리 열어 두어 START가 바로 시작됩니다.
+  {"command": "prepare", "language": "en-US"}로 곧 시작할 언어의 스트림을 미리 열 수 있습니다.
+  STT_SPEECH_ENDPOINT=127.0.0.1:50051 처럼 주면 로컬 가짜 서버(bench/fake_speech_server.py)에 붙습니다.
+- 인식 엔진은 stt_backends 모듈의 백엔드입니다. STT_BACKEND=google(기본) | whisper(로컬 오프라인) | auto
+  auto는 Google을 쓰다가 네트워크 오류가 나면 그때 로컬 Whisper 모델(STT_WHISPER_DIR에 배포한 파일)을 불러
+  현재 발화를 Whisper로 이어 인식하고, 잠시(STT_FALLBACK_HOLD_SEC) Whisper를 씁니다. (Google이 정상인 동안은 모델을 읽지 않음)
+  어느 엔진이든 interim/result/error 메시지 형식은 같습니다.
+- 스트림 지연(START -> 첫 interim, speech_end/STOP -> 최종 결과)과 카운터를 kiosk_metrics.MetricsStore에 모으고,
+  {"command": "metrics"}를 보낸 연결에 JSON 한 줄({"type": "metrics", ...})로 답합니다.
+  큐 깊이(transcribe_q / 세션 오디오 큐)와 버린 청크(스트림 없음)/메시지(받을 클라이언트 없음) 수도 함께 기록합니다.
+- STT_RECORD_DIR을 주면 세션(start/오디오/stop과 보낸 결과, 시각 포함)을 stt_session 형식으로 기록합니다.
+  bench/replay_stt.py가 이 기록을 가짜 Speech 서버에 대고 다시 재생해 워커가 더하는 지연을 잽니다.
 """
 
-import os, sys, time, json, queue, threading, base64, traceback
-import pywintypes, win32pipe, win32file, win32con
+import os, sys, time, json, queue, threading, base64
 
+# 임베디드 파이썬(._pth)은 스크립트 폴더를 sys.path에 넣지 않으므로 공용 모듈 경로를 직접 추가
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pipe_transport import open_server, FRAME_AUDIO, FRAME_CONTROL
+from stt_vad import VadGate, VAD_AVAILABLE
+from kiosk_metrics import MetricsStore, metrics_reply
+from stt_session import SessionRecorder
+from stt_backends import GoogleBackend, WhisperBackend, GOOGLE_AVAILABLE, is_network_error
 
 
-# 구글 클라이언트 라이브러리 임포트
-try:
-    from google.cloud import speech
-except ImportError:
-    print("FATAL: google-cloud-speech 라이브러리가 필요합니다.", flush=True)
-    sys.exit(1)
-
 # --- 설정 ---
 PIPE_NAME = r"\\.\pipe\stt_whisper"
 SAMPLE_RATE = 16000
+# 파이프 인스턴스 수 (Electron 1 + 모니터링/벤치마크 등 보조 클라이언트)
+PIPE_INSTANCES = int(os.environ.get('STT_PIPE_INSTANCES', '4'))
+# 이진 프레임 협상 허용 여부 (STT_BINARY_FRAMING=0 이면 hello에 "line"으로 답해 JSON 줄 방식 유지)
+BINARY_FRAMING = os.environ.get('STT_BINARY_FRAMING', '1') != '0'
+# 음성 구간 게이트 (webrtcvad, STT_VAD=1일 때만). 공격성 0~3 (클수록 잡음을 더 많이 침묵으로 봄), 앞/뒤 여유와 침묵 중 keepalive 간격(ms)
+USE_VAD = os.environ.get('STT_VAD', '0') != '0' and VAD_AVAILABLE
+VAD_AGGRESSIVENESS = int(os.environ.get('STT_VAD_AGGRESSIVENESS', '2'))
+VAD_PREROLL_MS = int(os.environ.get('STT_VAD_PREROLL_MS', '300'))
+VAD_HANGOVER_MS = int(os.environ.get('STT_VAD_HANGOVER_MS', '800'))
+VAD_KEEPALIVE_MS = int(os.environ.get('STT_VAD_KEEPALIVE_MS', '4000'))
+# 인식 엔진: google(기본) | whisper(로컬, 오프라인) | auto(Google, 네트워크 오류/연결 불가 시 로컬 Whisper로 전환)
+BACKEND = os.environ.get('STT_BACKEND', 'google').lower()
+REPLAY_MAX_SEC = float(os.environ.get('STT_FALLBACK_REPLAY_SEC', '30')) # 전환 시 새 엔진에 다시 보낼 현재 발화 오디오 한도
+DEFAULT_LANGUAGE = "ko-KR"
+# 다음 발화용 스트림 미리 열기. 오디오 없이 이 시간(초)이 지나면 닫음 (Google은 ~10초 동안 오디오가 없으면 스트림을 끊음)
+PREOPEN = os.environ.get('STT_PREOPEN', '1') != '0'
+PREOPEN_IDLE_SEC = float(os.environ.get('STT_PREOPEN_IDLE_SEC', '8'))
+# 긴 세션 교체: ROLLOVER_SEC 이후 말하는 중이 아닐 때, 늦어도 MAX_SEC에 새 스트림으로 (API 한도 305초)
+STREAM_ROLLOVER_SEC = float(os.environ.get('STT_STREAM_ROLLOVER_SEC', '240'))
+STREAM_MAX_SEC = float(os.environ.get('STT_STREAM_MAX_SEC', '290'))
+PREOPEN_LEAD_SEC = 5 # 교체 몇 초 전에 다음 스트림을 미리 열지
+RECORD_DIR = os.environ.get('STT_RECORD_DIR') or None # 세션 기록 폴더 (비우면 기록 안 함)
 
 # UTF-8 인코딩 설정
 try:
@@ -28,159 +69,314 @@ try:
 except Exception: pass
 
 
-def google_stt_worker(transcribe_q: queue.Queue, signal_q: queue.Queue, stop_evt: threading.Event):
-    """오디오 청크/명령을 받아 Google STT 스트림을 관리하는 워커 스레드"""
+def create_backends():
+    """STT_BACKEND 설정에 따라 (google, whisper) 백엔드를 만듭니다. 쓰지 않는 쪽은 None.
+    Whisper는 배포된 모델 파일이 있을 때만 만들고, whisper 모드에서만 시작 때 불러옵니다. (auto는 첫 네트워크 오류 때)"""
+    if BACKEND not in ("google", "whisper", "auto"):
+        print(f"[STT][WARN] Unknown STT_BACKEND '{BACKEND}'. Using google.", flush=True)
+    google = GoogleBackend() if GOOGLE_AVAILABLE and BACKEND != "whisper" else None
+    whisper = WhisperBackend() if BACKEND in ("whisper", "auto") else None
+    if whisper and not whisper.available():
+        print(f"[STT][WARN] Whisper model '{whisper.model_name}.pt' not found in STT_WHISPER_DIR. Local fallback disabled.", flush=True)
+        whisper = None
+    if google is None and whisper is None:
+        print("FATAL: google-cloud-speech 라이브러리 또는 STT_WHISPER_DIR의 Whisper 모델이 필요합니다.", flush=True)
+        sys.exit(1)
+    if google: threading.Thread(target=google.warm, daemon=True).start()
+    if whisper and google is None: whisper.load_async()
+    print(f"[STT] Backend mode: {BACKEND} (google={'on' if google else 'off'}, "
+          f"whisper={('loading' if google is None else 'on first failure') if whisper else 'off'})", flush=True)
+    return google, whisper
+
+
+def google_stt_worker(transcribe_q: queue.Queue, send, stop_evt: threading.Event, metrics: MetricsStore = None):
+    """오디오 청크/명령을 받아 STT 스트림을 관리하는 워커 스레드. send(bytes)로 결과를 클라이언트에 보냅니다.
+    - 엔진은 stt_backends의 백엔드(Google/로컬 Whisper)이며 어느 쪽이든 같은 interim/result/error 메시지를 보냅니다.
+      auto 모드에서는 START마다 Google이 정상이면 Google을, 최근 네트워크 오류가 있었으면 Whisper를 씁니다.
+      발화 중 Google 스트림이 네트워크 오류로 끊기면 현재 발화 오디오를 Whisper 세션에 다시 보내 이어서 인식합니다.
+    - SpeechClient/채널은 한 번만 만들고, 다음 발화용 스트림을 미리 열어 둬(standby) START를 바로 처리합니다.
+      (STOP 직후, prepare 명령, 시작 시. Google은 오디오 없이 ~10초가 지나면 스트림을 끊으므로 PREOPEN_IDLE_SEC 뒤 닫음)
+    - 긴 세션은 API 스트림 길이 한도 전에 새 스트림으로 넘깁니다. (가능하면 말하는 중이 아닐 때, 오디오 손실 없음)
+    - metrics가 있으면 스트림 지연/카운터를 기록합니다. (세션 스레드의 on_emit에서 결과 도착 시각 기록)"""
     print(f"[STT] Worker started.", flush=True)
-    stt_thread = None
-    audio_chunk_queue = None
-
-    def _stt_generator(q: queue.Queue):
-        """오디오 청크 큐에서 데이터를 뽑아 Google STT API로 yield하는 제너레이터"""
-        while True:
-            chunk = q.get()
-            if chunk is None: return # 스트림 종료 신호
-            yield speech.StreamingRecognizeRequest(audio_content=chunk)
-
-    def _run_stt_stream(q: queue.Queue, sig_q: queue.Queue, lang_code: str):
-        """실제 Google STT API를 호출하고 응답을 처리하는 내부 스레드"""
-        print(f"[STT] Internal STT thread started for language: {lang_code}", flush=True)
-        try:
-            client = speech.SpeechClient()
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=SAMPLE_RATE,
-                language_code=lang_code,
-                enable_automatic_punctuation=True,
-                model="latest_long"
-            )
-            streaming_config = speech.StreamingRecognitionConfig(
-                config=config,
-                interim_results=True # 중간 결과 받기
-            )
-            responses = client.streaming_recognize(streaming_config, _stt_generator(q))
-
-            # 응답 처리 루프
-            for response in responses:
-                if not response.results or not response.results[0].alternatives:
-                    continue
-                result = response.results[0]
-                transcript = result.alternatives[0].transcript.strip()
-
-                if result.is_final:
-                    response_data = {"type": "result", "text": transcript}
-                    sig_q.put(json.dumps(response_data, ensure_ascii=False).encode("utf-8") + b"\n")
-                else:
-                    response_data = {"type": "interim", "text": transcript}
-                    sig_q.put(json.dumps(response_data, ensure_ascii=False).encode("utf-8") + b"\n")
-        except Exception as e:
-            print(f"[STT ERR] Streaming failed: {e}", flush=True)
-            response_data = {"type": "error", "message": str(e)}
-            sig_q.put(json.dumps(response_data, ensure_ascii=False).encode("utf-8") + b"\n")
-        print(f"[STT] Internal STT thread finished for {lang_code}.", flush=True)
+    metrics = metrics or MetricsStore()
+    google, whisper = create_backends()
+    active = standby = gate = stopped = None # stopped: STOP으로 입력을 닫고 최종 결과를 기다리는 스트림
+    utterance = bytearray() # 현재 발화 오디오 (엔진 전환 시 다시 보냄)
+    replay_max = int(REPLAY_MAX_SEC * SAMPLE_RATE * 2)
+    totals = {"received_sec": 0.0, "sent_sec": 0.0, "streams": 0}
+
+    def _backend():
+        if google is None: return whisper
+        if whisper is None: return google
+        if google.healthy(): return google
+        whisper.load_async() # Google 연결 불가 -> 아직이면 로컬 모델을 읽기 시작 (그동안은 Google로 시도)
+        return whisper if whisper.healthy() else google
+
+    def _on_failure(session, e):
+        """세션 스레드에서 호출. 쓰는 중인 Google 스트림의 네트워크 오류면 워커가 Whisper로 넘기고 error를 보내지 않음
+        Whisper 모델을 아직 읽지 않았으면 읽은 뒤 FAILOVER를 넣습니다. (그동안 오디오는 utterance에 쌓여 있다가 다시 보냄)"""
+        if session not in (active, stopped) or session.backend is not google or not (whisper and is_network_error(e)):
+            return False
+        if whisper.ready.is_set() and not whisper.healthy(): return False # 모델을 읽지 못함 -> 오류 그대로 전달
+        item = {"command": "FAILOVER", "session": session, "error": str(e)}
+        whisper.load_async(then=lambda: transcribe_q.put(item))
+        return True
+
+    def _open(lang_code):
+        backend = _backend()
+        return backend.open(lang_code, on_failure=_on_failure)
+
+    def _on_emit(session, message):
+        """세션 스레드에서 호출. START -> 첫 interim, speech_end/STOP -> 다음 최종 결과까지의 지연 기록"""
+        now, kind, marks = time.perf_counter(), message.get("type"), session.marks
+        metrics.incr(f"{kind}s")
+        if kind in ("interim", "result") and "start" in marks and not marks.get("first"):
+            marks["first"] = now
+            metrics.observe("first_result_ms", (now - marks["start"]) * 1000)
+        if kind != "result": return
+        for mark in ("speech_end", "stop"):
+            t = marks.pop(mark, None)
+            if t is not None:
+                metrics.observe(f"final_after_{mark}_ms", (now - t) * 1000)
+                break
+
+    def _take(lang_code):
+        """예비 스트림이 같은 언어/엔진이고 아직 쓸 수 있으면 그것을, 아니면 새 스트림을 돌려줍니다."""
+        nonlocal standby
+        session, standby = standby, None
+        if session and session.backend is _backend() and session.usable(lang_code, PREOPEN_IDLE_SEC):
+            print(f"[STT] Using pre-opened stream #{session.id} (opened {session.age():.1f}s ago)", flush=True)
+            metrics.incr("preopen_hits")
+            return session
+        if session: session.finish()
+        metrics.incr("preopen_misses")
+        return _open(lang_code)
+
+    def _preopen(lang_code):
+        """다음 스트림을 미리 엽니다. (Google만. 로컬 Whisper 세션은 여는 비용이 없음)"""
+        nonlocal standby
+        if not PREOPEN or _backend() is not google: return
+        if standby and standby.backend is google and standby.usable(lang_code, PREOPEN_IDLE_SEC): return
+        if standby: standby.finish()
+        standby = _open(lang_code)
+
+    def _end_gate():
+        """스트림 종료: 게이트에 남은 오디오를 보내고 받은/보낸 오디오 길이를 출력"""
+        if gate is None: return
+        rest = gate.flush()
+        if rest and active: active.put(rest)
+        stats = gate.stats()
+        if stats["received_sec"]: metrics.observe("vad_sent_ratio", stats["sent_ratio"])
+        totals["received_sec"] += stats["received_sec"]
+        totals["sent_sec"] += stats["sent_sec"]
+        totals["streams"] += 1
+        print(f"[VAD] Stream audio {json.dumps(stats)} / total received {totals['received_sec']:.1f}s sent {totals['sent_sec']:.1f}s "
+              f"over {totals['streams']} stream(s)", flush=True)
+
+    def _feed(data):
+        active.put(data)
+        metrics.observe("session_q_depth", active.audio_q.qsize())
+        utterance.extend(data)
+        if len(utterance) > replay_max: del utterance[:len(utterance) - replay_max]
+
+    def _failover(item):
+        """Google 스트림이 네트워크 오류로 끊김 -> Whisper 세션을 열고 현재 발화 오디오를 다시 보냄"""
+        nonlocal active, stopped
+        lost = item["session"]
+        if lost not in (active, stopped): return
+        if not whisper.healthy(): # 모델 로딩 실패 -> 전환 없이 오류 전달
+            print(f"[STT ERR] Streaming failed: {item['error']} (whisper unavailable)", flush=True)
+            send(json.dumps({"type": "error", "message": item["error"]}, ensure_ascii=False).encode("utf-8") + b"\n")
+            if lost is stopped: stopped = None
+            return
+        nxt = whisper.open(lost.lang_code, on_failure=_on_failure)
+        nxt.activate(send, _on_emit)
+        nxt.marks.update(lost.marks) # 끊긴 스트림에서 기다리던 지연 측정을 이어서
+        metrics.incr("failovers")
+        if utterance: nxt.put(bytes(utterance))
+        print(f"[STT][WARN] Stream #{lost.id} lost ({item['error']}). Switched to whisper stream #{nxt.id}, "
+              f"replayed {len(utterance) / (SAMPLE_RATE * 2):.1f}s.", flush=True)
+        if lost is active: active = nxt
+        else: # 이미 STOP된 스트림 -> 다시 보낸 오디오의 최종 결과만 내고 끝냄
+            nxt.finish()
+            stopped = None
+
+    def _rollover():
+        """스트림 길이 한도 전에 다음 스트림을 미리 열고, 말하는 중이 아닐 때(늦어도 STREAM_MAX_SEC) 넘깁니다. (Google만)"""
+        nonlocal active
+        if active.backend is not google: return
+        age = active.age()
+        if age < STREAM_ROLLOVER_SEC - PREOPEN_LEAD_SEC: return
+        _preopen(active.lang_code)
+        if age < STREAM_ROLLOVER_SEC or (gate and gate.in_speech and age < STREAM_MAX_SEC): return
+        nxt = _take(active.lang_code)
+        nxt.activate(send, _on_emit)
+        metrics.incr("rollovers")
+        active.finish() # 이전 스트림은 받은 오디오의 최종 결과까지 보내고 끝남
+        print(f"[STT] Rolled over stream #{active.id} -> #{nxt.id} after {age:.0f}s.", flush=True)
+        active = nxt
+
+    _preopen(DEFAULT_LANGUAGE) # 첫 스트림에서 인증 토큰/RPC 경로를 미리 준비
 
     # STT 워커 메인 루프
     while not stop_evt.is_set():
+        if standby and standby.age() >= PREOPEN_IDLE_SEC: # 오디오 없이 오래 열어 두면 서버가 끊으므로 닫음
+            standby.finish()
+            standby = None
         try:
             item = transcribe_q.get(timeout=0.1)
+            metrics.observe("transcribe_q_depth", transcribe_q.qsize())
             if isinstance(item, dict):
                 command = item.get("command")
                 if command == "START":
-                    lang_code = item.get("language", "ko-KR")
+                    lang_code = item.get("language", DEFAULT_LANGUAGE)
                     print(f"[STT] /start command. Initializing for {lang_code}...", flush=True)
-                    if stt_thread and stt_thread.is_alive():
-                        if audio_chunk_queue: audio_chunk_queue.put(None)
-                        stt_thread.join(timeout=0.5)
-                    audio_chunk_queue = queue.Queue()
-                    stt_thread = threading.Thread(target=_run_stt_stream, args=(audio_chunk_queue, signal_q, lang_code), daemon=True)
-                    stt_thread.start()
+                    _end_gate()
+                    if active: active.finish()
+                    active = gate = stopped = None
+                    utterance.clear()
+                    try:
+                        active = _take(lang_code)
+                    except Exception as e:
+                        print(f"[STT ERR] Could not open stream: {e}", flush=True)
+                        metrics.incr("open_errors")
+                        send(json.dumps({"type": "error", "message": str(e)}, ensure_ascii=False).encode("utf-8") + b"\n")
+                        continue
+                    active.activate(send, _on_emit)
+                    active.marks["start"] = item.get("t") or time.perf_counter() # 파이프 수신 시각 기준
+                    metrics.incr(f"streams_{active.backend.name}")
+                    print(f"[STT] Stream #{active.id} on {active.backend.name}", flush=True)
+                    gate = VadGate(SAMPLE_RATE, VAD_AGGRESSIVENESS, preroll_ms=VAD_PREROLL_MS, hangover_ms=VAD_HANGOVER_MS,
+                                   keepalive_ms=VAD_KEEPALIVE_MS) if USE_VAD else None
                 elif command == "STOP":
                     print("[STT] /stop command. Finalizing stream.", flush=True)
-                    if stt_thread and stt_thread.is_alive() and audio_chunk_queue:
-                        audio_chunk_queue.put(None)
-                        stt_thread.join(timeout=1.0)
-                    stt_thread = audio_chunk_queue = None
+                    _end_gate()
+                    if active:
+                        active.marks.setdefault("stop", item.get("t") or time.perf_counter())
+                        active.finish()
+                        _preopen(active.lang_code) # 다음 발화(대화 턴) 대비
+                    stopped, active, gate = active, None, None
+                elif command == "PREPARE":
+                    if active is None: _preopen(item.get("language", DEFAULT_LANGUAGE))
+                elif command == "FAILOVER":
+                    _failover(item)
             elif isinstance(item, bytes): # 오디오 청크
-                if audio_chunk_queue:
-                    audio_chunk_queue.put(item)
+                if active is None: metrics.incr("chunks_dropped"); continue
+                if gate is None:
+                    _feed(item)
+                else:
+                    data, events = gate.process(item)
+                    if data: _feed(data)
+                    if "speech_end" in events:
+                        send(json.dumps({"type": "speech_end"}).encode("utf-8") + b"\n")
+                        active.marks["speech_end"] = time.perf_counter()
+                        metrics.incr("speech_ends")
+                        active.endpoint() # 로컬 엔진은 여기서 발화를 확정
+                        utterance.clear()
+                _rollover()
             elif item is None: break
         except queue.Empty: continue
         except Exception as e:
             print(f"[STT][ERR] Worker loop error: {e}", flush=True)
 
     # 뒷정리
-    if stt_thread and stt_thread.is_alive():
-        if audio_chunk_queue: audio_chunk_queue.put(None)
-        stt_thread.join(timeout=0.5)
+    _end_gate()
+    for session in (active, standby):
+        if session: session.finish()
+    for backend in (google, whisper):
+        if backend: backend.close()
     print(f"[STT] Worker stopped.", flush=True)
 
-def run_pipe_loop(transcribe_q: queue.Queue, stop_evt: threading.Event, signal_q: queue.Queue):
-    """Windows Named Pipe를 통해 main.js와 통신하는 메인 루프"""
-    print("[PIPE] Worker started.", flush=True)
-    while not stop_evt.is_set():
-        handle = None
+class PipeHandler:
+    """클라이언트 메시지(JSON 줄 또는 이진 프레임)를 transcribe_q 명령/오디오로 바꿉니다. (pipe_transport 읽기 스레드에서 호출)
+    스트림을 시작한 클라이언트가 끊기면 STT 스트림을 멈춥니다. (보조 클라이언트 연결/해제는 영향 없음)"""
+
+    def __init__(self, transcribe_q: queue.Queue, stop_evt: threading.Event, metrics: MetricsStore = None,
+                 recorder: SessionRecorder = None):
+        self.transcribe_q, self.stop_evt, self.metrics, self.recorder = transcribe_q, stop_evt, metrics, recorder
+        self.owner = None # 마지막으로 start를 보낸 연결
+
+    def _audio(self, chunk):
+        self.transcribe_q.put(chunk)
+        if self.recorder: self.recorder.audio(chunk)
+
+    def handle_line(self, conn, line):
+        line = line.decode("utf-8", errors="ignore").strip()
+        if not line: return
         try:
-            handle = win32pipe.CreateNamedPipe(PIPE_NAME, win32con.PIPE_ACCESS_DUPLEX | win32file.FILE_FLAG_OVERLAPPED,
-                                               win32pipe.PIPE_TYPE_MESSAGE | win32pipe.PIPE_READMODE_MESSAGE | win32pipe.PIPE_WAIT,
-                                               1, 65536, 65536, 0, None)
-            print(f"[PIPE] Pipe created. Waiting for client on {PIPE_NAME}...", flush=True)
-            win32pipe.ConnectNamedPipe(handle, None)
-            print("[PIPE] Client Connected", flush=True)
-            buf = b""
-            while not stop_evt.is_set():
-                try: # STT 결과 전송
-                    signal = signal_q.get_nowait()
-                    win32file.WriteFile(handle, signal)
-                except queue.Empty: pass
-                except pywintypes.error: break
-                try: # 오디오/명령 수신
-                    _, data = win32file.ReadFile(handle, 4096)
-                    buf += data
-                    while b"\n" in buf:
-                        line, buf = buf.split(b"\n", 1)
-                        line = line.decode("utf-8", errors="ignore").strip()
-                        if not line: continue
-                        try:
-                            obj = json.loads(line)
-                            command, chunk_b64 = obj.get("command"), obj.get("chunk")
-                            if command == "start":
-                                lang = obj.get("language", "ko-KR")
-                                transcribe_q.put({"command": "START", "language": lang})
-                            elif command == "stop":
-                                transcribe_q.put({"command": "STOP"})
-                            elif chunk_b64:
-                                transcribe_q.put(base64.b64decode(chunk_b64))
-                            elif obj.get("text") == "/quit":
-                                stop_evt.set(); break
-                        except Exception as e: print(f"[PIPE][ERR] JSON/Data Error: {e}", flush=True)
-                except pywintypes.error as e:
-                    if e.winerror in [109, 232]: break
-                    else: raise
-        except Exception as e:
-            print(f"[PIPE] Error: {e}", flush=True)
-            time.sleep(1)
-        finally:
-            if handle: win32file.CloseHandle(handle)
-            print("[PIPE] Connection loop reset. Signaling STT worker to stop.", flush=True)
-            transcribe_q.put({"command": "STOP"}) # 연결 끊길 시 STT 스트림 중지
-            while not signal_q.empty(): signal_q.get_nowait() # 큐 비우기
-    print("[PIPE] Worker stopped.", flush=True)
+            self.handle_command(conn, json.loads(line))
+        except Exception as e: print(f"[PIPE][ERR] JSON/Data Error: {e}", flush=True)
+
+    def handle_frame(self, conn, kind, payload):
+        """이진 프레임. payload는 수신 버퍼의 memoryview라 오디오는 큐에 넣을 bytes로 한 번만 복사합니다."""
+        if kind == FRAME_AUDIO:
+            self._audio(bytes(payload))
+        elif kind == FRAME_CONTROL:
+            try:
+                self.handle_command(conn, json.loads(bytes(payload)))
+            except Exception as e: print(f"[PIPE][ERR] Control frame error: {e}", flush=True)
+        else:
+            print(f"[PIPE][WARN] Unknown frame type {kind} ({len(payload)} bytes). Ignored.", flush=True)
+
+    def handle_command(self, conn, obj):
+        command, chunk_b64 = obj.get("command"), obj.get("chunk")
+        if self.recorder and command in ("start", "stop"): self.recorder.command(obj)
+        if command == "hello":
+            framing = "binary" if BINARY_FRAMING and obj.get("framing") == "binary" else "line"
+            conn.send(json.dumps({"type": "hello", "framing": framing}).encode("utf-8") + b"\n")
+            if framing == "binary": conn.set_binary(self.handle_frame)
+            print(f"[PIPE] Client #{conn.id} audio framing: {framing}", flush=True)
+        elif command == "start":
+            self.owner = conn
+            self.transcribe_q.put({"command": "START", "language": obj.get("language", "ko-KR"), "t": time.perf_counter()})
+        elif command == "stop":
+            self.transcribe_q.put({"command": "STOP", "t": time.perf_counter()})
+        elif command == "prepare": # 곧 시작할 언어의 스트림을 미리 열어 둠 (ipcHandlers.js speech:prepare-stream)
+            self.transcribe_q.put({"command": "PREPARE", "language": obj.get("language", DEFAULT_LANGUAGE), "t": time.perf_counter()})
+        elif command == "metrics":
+            snapshot = self.metrics.snapshot(obj.get("windows")) if self.metrics else {}
+            conn.send(metrics_reply(worker="stt", queue_depth=self.transcribe_q.qsize(), **snapshot))
+        elif chunk_b64:
+            self._audio(base64.b64decode(chunk_b64))
+        elif obj.get("text") == "/quit":
+            self.stop_evt.set()
+
+    def on_disconnect(self, conn):
+        if conn is not self.owner: return
+        print("[PIPE] Stream owner disconnected. Signaling STT worker to stop.", flush=True)
+        self.owner = None
+        self.transcribe_q.put({"command": "STOP"}) # 연결 끊길 시 STT 스트림 중지
+
+def pipe_sender(server, metrics, recorder=None):
+    """워커의 send(): 연결된 모든 클라이언트에 보내고, 받을 클라이언트가 없으면 messages_dropped를 셉니다."""
+    def send(data):
+        if recorder: recorder.reply(data)
+        if not server.send(data): metrics.incr("messages_dropped")
+    return send
 
 # --- 메인 실행 ---
 def main():
     print("[INIT] Starting Google STT Worker...", flush=True)
-    transcribe_q, signal_q = queue.Queue(), queue.Queue(maxsize=20)
+    transcribe_q = queue.Queue()
     stop_evt = threading.Event()
+    metrics = MetricsStore()
+    recorder = SessionRecorder(RECORD_DIR) if RECORD_DIR else None
+    if recorder: print(f"[INIT] Recording STT sessions to {RECORD_DIR}", flush=True)
+    handler = PipeHandler(transcribe_q, stop_evt, metrics, recorder)
+    server = open_server(PIPE_NAME, handler.handle_line, name="PIPE", instances=PIPE_INSTANCES, on_disconnect=handler.on_disconnect)
+
+    send = pipe_sender(server, metrics, recorder)
 
     print("[INIT] Starting worker threads...", flush=True)
-    th_stt = threading.Thread(target=google_stt_worker, args=(transcribe_q, signal_q, stop_evt), daemon=True)
-    th_pipe = threading.Thread(target=run_pipe_loop, args=(transcribe_q, stop_evt, signal_q), daemon=True)
+    th_stt = threading.Thread(target=google_stt_worker, args=(transcribe_q, send, stop_evt, metrics), daemon=True)
     th_stt.start()
-    th_pipe.start()
+    server.start()
 
-    print(f"[READY] Pipe server listening on {PIPE_NAME}", flush=True)
+    print(f"[READY] Pipe server listening on {server.pipe_name}", flush=True)
     try:
         while not stop_evt.is_set():
-            if not all(t.is_alive() for t in [th_stt, th_pipe]):
+            if not (th_stt.is_alive() and server.alive()):
                 print("[ERROR] A worker thread died unexpectedly. Exiting.", flush=True)
                 stop_evt.set()
             time.sleep(0.5)
@@ -190,12 +386,11 @@ def main():
         print("[EXIT] Shutting down...", flush=True)
         stop_evt.set()
         transcribe_q.put(None)
-        try:
-            handle = win32file.CreateFile(PIPE_NAME, win32con.GENERIC_WRITE, 0, None, win32con.OPEN_EXISTING, 0, None)
-            win32file.CloseHandle(handle)
-        except Exception: pass
+        server.close()
         th_stt.join(timeout=2.0)
-        th_pipe.join(timeout=2.0)
+        if recorder: recorder.close()
+        print(f"[EXIT] Pipe stats {json.dumps(server.stats())}", flush=True)
+        print(f"[EXIT] STT counters {json.dumps(metrics.counters)}", flush=True)
         print("[EXIT] Shutdown complete.", flush=True)
 
 if __name__ == "__main__":
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""워커 모듈 단위 테스트 공용 설정: 워커 폴더(공용 모듈)와 bench 폴더(mock_tts)를 import 경로에 넣습니다."""
+
+import os, sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKERS_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, WORKERS_DIR)
+sys.path.insert(0, os.path.join(WORKERS_DIR, 'bench'))
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""pipe_transport 단위 테스트: 여러 번의 읽기에 걸친 줄/이진 프레임 복원, 방식 전환, 수신 버퍼 재사용 (소켓/파이프 없이)"""
+
+import pipe_transport
+from pipe_transport import RxBuffer, SocketConnection, encode_frame, FRAME_AUDIO, FRAME_CONTROL, FRAME_HEADER
+
+
+class _Recorder:
+    def __init__(self):
+        self.lines, self.frames = [], []
+
+    def on_line(self, conn, line):
+        self.lines.append(line)
+
+    def on_frame(self, conn, kind, payload):
+        self.frames.append((kind, bytes(payload))) # payload는 호출 중에만 유효하므로 복사
+
+
+def _conn(rec):
+    return SocketConnection(None, rec.on_line, name="TEST")
+
+
+def _receive(conn, rx, data, read_size):
+    """data를 read_size 바이트씩 나눠 읽은 것처럼 수신 버퍼에 채우고 처리합니다."""
+    for off in range(0, len(data), read_size):
+        part = data[off:off + read_size]
+        rx.writable()[:len(part)] = part
+        rx.end += len(part)
+        assert conn._dispatch(rx)
+
+
+def test_lines_split_across_reads():
+    rec = _Recorder()
+    conn, rx = _conn(rec), RxBuffer()
+    _receive(conn, rx, b'{"text": "hello"}\n{"cmd": "stop"}\npartial', read_size=5)
+    assert rec.lines == [b'{"text": "hello"}', b'{"cmd": "stop"}']
+    assert bytes(rx.view[rx.start:rx.end]) == b"partial" # 개행 전까지는 남겨 둠
+
+
+def test_frames_split_across_reads():
+    rec = _Recorder()
+    conn, rx = _conn(rec), RxBuffer()
+    conn.set_binary(rec.on_frame)
+    audio, control = bytes(range(256)) * 4, b'{"type": "end"}'
+    stream = encode_frame(FRAME_AUDIO, audio) + encode_frame(FRAME_CONTROL, control)
+    for size in (1, 3, FRAME_HEADER.size + 1): # 헤더 중간, 페이로드 중간에서 끊김
+        rec.frames.clear()
+        _receive(conn, rx, stream, read_size=size)
+        assert rec.frames == [(FRAME_AUDIO, audio), (FRAME_CONTROL, control)]
+        assert len(rx) == 0
+
+
+def test_several_frames_in_one_read_and_empty_payload():
+    rec = _Recorder()
+    conn, rx = _conn(rec), RxBuffer()
+    conn.set_binary(rec.on_frame)
+    stream = b"".join(encode_frame(FRAME_AUDIO, bytes([n]) * n) for n in range(5))
+    _receive(conn, rx, stream, read_size=len(stream))
+    assert rec.frames == [(FRAME_AUDIO, bytes([n]) * n) for n in range(5)]
+
+
+def test_set_binary_in_line_handler_applies_to_rest_of_same_read():
+    rec = _Recorder()
+    conn, rx = _conn(rec), RxBuffer()
+    def on_line(c, line):
+        rec.on_line(c, line)
+        if line == b'{"cmd": "binary"}': c.set_binary(rec.on_frame)
+    conn.on_line = on_line
+    _receive(conn, rx, b'{"cmd": "binary"}\n' + encode_frame(FRAME_AUDIO, b"\n\n\x00pcm"), read_size=64)
+    assert rec.lines == [b'{"cmd": "binary"}']
+    assert rec.frames == [(FRAME_AUDIO, b"\n\n\x00pcm")] # 페이로드의 개행을 줄로 자르지 않음
+
+
+def test_oversized_frame_header_is_rejected():
+    conn, rx = _conn(_Recorder()), RxBuffer()
+    conn.set_binary(lambda *a: None)
+    header = FRAME_HEADER.pack(FRAME_AUDIO, pipe_transport.MAX_MESSAGE + 1)
+    rx.writable()[:len(header)] = header
+    rx.end += len(header)
+    assert not conn._dispatch(rx)
+
+
+def test_rx_buffer_compacts_tail_then_grows():
+    rx = RxBuffer(size=32)
+    rx.writable()[:24] = b"a" * 20 + b"tail"
+    rx.end, rx.start = 24, 20 # 앞 20바이트는 처리됨
+    buf = rx.buf
+    free = rx.writable(min_free=16)
+    assert rx.buf is buf and (rx.start, rx.end) == (0, 4) and len(free) == 28 # 꼬리만 앞으로 당김
+    assert bytes(rx.view[:4]) == b"tail"
+    rx.writable()[:26] = b"b" * 26
+    rx.end = 30
+    free = rx.writable(min_free=16)
+    assert len(rx.buf) == 64 and len(free) == 34 # 당겨도 모자라면 두 배로
+    assert bytes(rx.view[:30]) == b"tail" + b"b" * 26
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""stt_vad 단위 테스트: 발화 시작 앞 pre-roll, 침묵 중 keepalive, hang-over 뒤 speech_end, 프레임 경계에 걸친 입력"""
+
+import numpy as np
+import pytest
+
+import stt_vad
+from stt_vad import VadGate
+
+pytestmark = pytest.mark.skipif(not stt_vad.VAD_AVAILABLE, reason="webrtcvad not installed")
+
+SR, FRAME_MS = 16000, 30
+FRAME = SR * FRAME_MS // 1000 * 2
+SILENCE = bytes(FRAME)
+
+
+def _speech(frames):
+    """webrtcvad가 음성으로 판정하는 배음 신호 (150Hz 기본음)"""
+    t = np.arange(frames * FRAME // 2) / SR
+    sig = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 20))
+    return (sig / np.abs(sig).max() * 12000).astype(np.int16).tobytes()
+
+
+def _gate(**kw):
+    return VadGate(SR, aggressiveness=2, frame_ms=FRAME_MS, **kw)
+
+
+def _feed(gate, data, chunk=FRAME):
+    sent, events = bytearray(), []
+    for off in range(0, len(data), chunk):
+        out, ev = gate.process(data[off:off + chunk])
+        if out: sent += out
+        events += ev
+    return bytes(sent), events
+
+
+def test_long_silence_is_dropped():
+    gate = _gate(keepalive_ms=60000)
+    sent, events = _feed(gate, SILENCE * 50)
+    assert sent == b"" and events == []
+    assert gate.stats()["received_sec"] == pytest.approx(1.5) and gate.stats()["sent_sec"] == 0.0
+
+
+def test_speech_start_sends_preroll_before_onset():
+    gate = _gate(preroll_ms=300, keepalive_ms=60000)
+    _feed(gate, SILENCE * 20)
+    speech = _speech(10)
+    sent, events = _feed(gate, speech)
+    assert events == ["speech_start"]
+    assert gate.preroll.maxlen == 10 and len(sent) == 17 * FRAME # pre-roll 10프레임(침묵 7 + 시작 판단 3) + 나머지 음성 7
+    assert sent.startswith(SILENCE * 7) and not sent.startswith(SILENCE * 8) # 발화 앞 침묵이 함께 나감 (첫 음절이 잘리지 않도록)
+    assert sent.endswith(speech[-FRAME:]) and speech[:FRAME] in sent
+    assert gate.utterances == 1
+
+
+def test_keepalive_frame_is_not_resent_as_preroll():
+    gate = _gate(preroll_ms=300, keepalive_ms=300) # 10프레임마다 keepalive
+    sent, _ = _feed(gate, SILENCE * 10)
+    assert sent == SILENCE # 침묵 중 프레임 하나만
+    before = gate.sent_bytes
+    sent, events = _feed(gate, SILENCE * 3 + _speech(10))
+    assert events == ["speech_start"]
+    assert gate.sent_bytes - before == len(sent)
+    assert len(sent) == 13 * FRAME # keepalive로 보낸 프레임과 그 이전 침묵은 pre-roll에 없음 (침묵 3 + 음성 10)
+    assert sent.startswith(SILENCE * 3) and not sent.startswith(SILENCE * 4)
+
+
+def test_hangover_ends_speech_and_stops_sending():
+    gate = _gate(hangover_ms=300, keepalive_ms=60000)
+    _feed(gate, SILENCE * 5 + _speech(20))
+    sent, events = _feed(gate, SILENCE * 40)
+    assert events == ["speech_end"]
+    assert FRAME * 10 <= len(sent) < FRAME * 40 # hang-over 동안의 침묵만 보내고 이후는 버림
+    assert not gate.in_speech
+
+
+def test_frames_split_across_chunks_keep_order():
+    data = SILENCE * 5 + _speech(20)
+    whole, _ = _feed(_gate(keepalive_ms=60000), data)
+    split, events = _feed(_gate(keepalive_ms=60000), data, chunk=FRAME * 2 // 3) # 프레임 경계와 어긋나게
+    assert split == whole and events == ["speech_start"]
+
+    gate = _gate(keepalive_ms=60000)
+    _feed(gate, data)
+    out, _ = gate.process(b"\x01\x00" * 7) # 프레임에 못 미친 나머지
+    assert out is None and gate.flush() == b"\x01\x00" * 7
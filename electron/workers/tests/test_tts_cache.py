@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""tts_cache 단위 테스트: 메모리 LRU 캐시의 바이트 예산과 single-flight(같은 키 동시 MISS는 한 번만 합성)"""
+
+import threading
+import numpy as np
+
+from tts_cache import AudioLRUCache
+
+
+def _audio(n=100):
+    return (22050, np.zeros(n, dtype=np.int16))
+
+
+def _run_concurrently(n, target):
+    """n개 스레드가 target(i)를 거의 동시에 시작하도록 하고 결과 목록을 반환합니다."""
+    barrier, results = threading.Barrier(n), [None] * n
+    def run(i):
+        barrier.wait()
+        results[i] = target(i)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for th in threads: th.start()
+    for th in threads: th.join(timeout=5.0)
+    return results
+
+
+def test_lru_evicts_oldest_within_byte_budget_and_keeps_pinned():
+    cache = AudioLRUCache(450) # 항목 하나 200바이트
+    cache.put("pinned", _audio(), pin=True)
+    cache.put("a", _audio())
+    cache.get("pinned")
+    cache.put("b", _audio())
+    assert cache.contains("pinned") and not cache.contains("a") and cache.contains("b")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_concurrent_misses_run_factory_once():
+    cache = AudioLRUCache(1024 * 1024)
+    calls, release = [], threading.Event()
+    def factory():
+        calls.append(1)
+        release.wait(2.0)
+        return _audio()
+    def release_when_all_wait():
+        while cache.stats()["waits"] < 3: release.wait(0.005)
+        release.set()
+    threading.Thread(target=release_when_all_wait, daemon=True).start()
+    results = _run_concurrently(4, lambda i: cache.get_or_create("k", factory))
+    assert len(calls) == 1
+    assert sorted(source for _, source in results) == ["miss", "wait", "wait", "wait"]
+    assert all(value is results[0][0] for value, _ in results)
+    assert cache.get_or_create("k", factory)[1] == "hit"
+
+
+def test_failed_factory_is_not_cached_and_waiters_get_none():
+    cache = AudioLRUCache(1024 * 1024)
+    started, release = threading.Event(), threading.Event()
+    def failing():
+        started.set()
+        release.wait(2.0)
+        raise RuntimeError("synth failed")
+    leader_error = []
+    def leader():
+        try: cache.get_or_create("k", failing)
+        except RuntimeError as e: leader_error.append(e)
+    th = threading.Thread(target=leader)
+    th.start()
+    started.wait(2.0)
+    waiter = {}
+    tw = threading.Thread(target=lambda: waiter.update(result=cache.get_or_create("k", _audio)))
+    tw.start()
+    while cache.stats()["waits"] == 0 and tw.is_alive(): tw.join(0.005) # 대기자가 붙은 뒤에 실패시킴
+    release.set()
+    th.join(2.0); tw.join(2.0)
+    assert leader_error and waiter["result"] == (None, "wait")
+    assert not cache.contains("k")
+    value, source = cache.get_or_create("k", _audio) # 다음 요청은 다시 합성
+    assert source == "miss" and value is not None
+
+
+def test_claimed_key_makes_lookups_wait_for_fulfil():
+    cache = AudioLRUCache(1024 * 1024)
+    assert cache.try_claim("k")
+    assert not cache.try_claim("k") # 이미 예약됨
+    waiter = {}
+    tw = threading.Thread(target=lambda: waiter.update(result=cache.get_or_create("k", _audio)))
+    tw.start()
+    while cache.stats()["waits"] == 0 and tw.is_alive(): tw.join(0.005)
+    value = _audio()
+    cache.fulfil("k", value)
+    tw.join(2.0)
+    assert waiter["result"] == (value, "wait")
+    assert not cache.try_claim("k") # 캐시에 있으므로 예약하지 않음
+
+
+def test_failed_claim_releases_waiters_and_allows_a_new_claim():
+    cache = AudioLRUCache(1024 * 1024)
+    assert cache.try_claim("k")
+    waiter = {}
+    tw = threading.Thread(target=lambda: waiter.update(result=cache.get_or_create("k", _audio)))
+    tw.start()
+    while cache.stats()["waits"] == 0 and tw.is_alive(): tw.join(0.005)
+    cache.fulfil("k", None) # 합성 실패/취소
+    tw.join(2.0)
+    assert waiter["result"] == (None, "wait")
+    assert not cache.contains("k")
+    assert cache.try_claim("k")
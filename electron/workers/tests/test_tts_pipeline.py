@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""tts_pipeline 단위 테스트: 순서 복원, 세대 취소, 세그먼트 대기열, 배치 묶기, 로딩 중인 언어 대기 (모델/오디오 장치 없이 MockEngine으로)"""
+
+import os, time, queue, itertools, threading
+import pytest
+
+import tts_pipeline
+from tts_pipeline import TtsPipeline, Voice, JobQueue
+from tts_profiles import PROFILES
+from tts_cache import AudioLRUCache
+from mock_tts import MockEngine
+
+_pipe_ids = itertools.count(1)
+LONG_KR = ("천안 독립기념관은 매주 월요일에 휴관하며, 관람 시간은 오전 9시 30분부터 오후 6시까지입니다. "
+           "주차는 무료이고 전시관 안에는 휠체어와 유모차를 빌릴 수 있는 안내 데스크가 있습니다. "
+           "단체 관람은 일주일 전에 예약해 주시고, 해설 프로그램은 하루 네 번 운영합니다.")
+
+
+@pytest.fixture
+def pipeline():
+    profile = dict(PROFILES["KR"], pipe_name=rf"\\.\pipe\melo_tts_test_{os.getpid()}_{next(_pipe_ids)}")
+    p = TtsPipeline(profile, n_synth_workers=1)
+    engine = MockEngine(profile["default_sr"], frontend_ms=0, char_ms=0, rtf=0, post_ms=0, busy=False)
+    p.voices = {"KR": Voice(profile, engine, 0, AudioLRUCache(64 * 1024 * 1024))}
+    yield p
+    p.transport.close()
+
+
+def _warm(voice, rtf=0.1):
+    """합성을 몇 번 한 것처럼 RTF와 글자당 오디오 길이를 채웁니다."""
+    voice.rtf, voice.sec_per_char = rtf, voice.engine.audio_ms_per_char / 1000.0 / voice.profile["speed"]
+
+
+def test_job_queue_take_front_stops_where_another_worker_took_items():
+    q = JobQueue()
+    for n in range(4): q.put(n)
+    head = q.peek(3)
+    assert head == [0, 1, 2] and q.qsize() == 4
+    assert q.get(timeout=0) == 0 # 다른 워커가 먼저 꺼냄
+    assert q.take_front(head) == [] # 0이 이미 없으므로 아무것도 꺼내지 않음
+    assert q.take_front([1, 2]) == [1, 2]
+    assert q.clear() == 1
+    with pytest.raises(queue.Empty): q.get(timeout=0.01)
+
+
+def test_gather_batch_forms_multi_segment_batch_while_audio_is_queued(pipeline, monkeypatch):
+    monkeypatch.setattr(tts_pipeline, "BATCH_MAX", 4)
+    voice = pipeline.voices["KR"]
+    _warm(voice)
+    pipeline.submit(LONG_KR)
+    assert pipeline.job_q.qsize() > 2
+    pipeline._play_end = time.perf_counter() + 10.0 # 앞 발화가 10초 더 재생됨
+    job = pipeline.job_q.get(timeout=0)
+    spk_id, speed, gain = voice.resolve(job[4])
+    batch = pipeline._gather_batch(job, voice, spk_id, speed, gain)
+    assert len(batch) > 1
+    assert [item[0] for item, _, _ in batch] == list(range(len(batch))) # 순번 순서대로, 큐 맨 앞부터
+    assert pipeline.job_q.qsize() == pipeline._next_seq - len(batch)
+
+    results = pipeline.synth_batch(0, voice, [item[3] for item, _, _ in batch], [spk for _, spk, _ in batch], speed,
+                                   timings=[{} for _ in batch])
+    assert all(r is not None for r in results)
+    assert voice.engine.calls == 1 # 배치 한 번으로 모두 합성
+
+
+def test_gather_batch_keeps_first_segment_alone_when_nothing_plays(pipeline, monkeypatch):
+    monkeypatch.setattr(tts_pipeline, "BATCH_MAX", 4)
+    voice = pipeline.voices["KR"]
+    _warm(voice)
+    pipeline.submit(LONG_KR)
+    job = pipeline.job_q.get(timeout=0)
+    assert len(pipeline._gather_batch(job, voice, *voice.resolve(job[4]))) == 1
+
+
+def test_queued_play_audio_counts_toward_batch_budget(pipeline):
+    voice = pipeline.voices["KR"]
+    sr = voice.sample_rate
+    audio = voice.engine.synthesize("안녕하세요", 0, 1.0)
+    pipeline.reorder.put(0, (pipeline.generation, sr, audio, 1.0, None))
+    assert pipeline._audio_ahead_sec() == pytest.approx(audio.size / sr, rel=0.01)
+    pipeline.interrupt() # stop -> 재생 큐의 이전 세대 오디오는 더 이상 앞 오디오가 아님
+    assert pipeline._audio_ahead_sec() == 0.0
+
+
+def test_segments_for_a_loading_language_are_held_until_it_loads(pipeline):
+    pipeline.loading.add("EN")
+    pipeline.submit("Hello, welcome to Cheonan.", lang="EN")
+    job = pipeline.job_q.get(timeout=0)
+    assert pipeline._voice_or_defer(job) is None
+    assert pipeline.job_q.qsize() == 0 and pipeline.reorder.next_seq == 0 # 버리지 않고 순번도 넘기지 않음
+
+    profile = PROFILES["EN"]
+    pipeline.voices["EN"] = Voice(profile, MockEngine(profile["default_sr"], busy=False), 0, AudioLRUCache(1024 * 1024))
+    pipeline.voice_loaded("EN")
+    assert pipeline.job_q.get(timeout=0) is job
+    assert pipeline._voice_or_defer(job) is pipeline.voices["EN"]
+
+
+def test_segments_for_a_language_the_host_does_not_load_are_skipped(pipeline):
+    pipeline.submit("Hello, welcome to Cheonan.", lang="EN")
+    job = pipeline.job_q.get(timeout=0)
+    assert pipeline._voice_or_defer(job) is None
+    assert pipeline.reorder.next_seq == 1 # 순번만 넘겨 뒤 세그먼트 재생이 막히지 않음
+
+
+def test_reorder_buffer_releases_in_sequence_order():
+    out = queue.Queue()
+    reorder = tts_pipeline.ReorderBuffer(out)
+    reorder.put(2, "c")
+    reorder.put(1, "b")
+    assert out.empty() # 0이 아직 없음
+    reorder.put(0, "a")
+    assert [out.get_nowait() for _ in range(3)] == ["a", "b", "c"]
+    reorder.put(4, "e")
+    reorder.put(3, None) # 실패한 세그먼트는 순번만 넘김
+    assert out.get_nowait() == "e" and out.empty()
+    assert reorder.next_seq == 5
+
+
+def test_reorder_buffer_reset_drops_pending_and_late_results():
+    out = queue.Queue()
+    reorder = tts_pipeline.ReorderBuffer(out)
+    reorder.put(1, "old-1")
+    reorder.reset(3) # stop: 0~2번은 이전 발화
+    reorder.put(0, "old-0")
+    reorder.put(2, "old-2")
+    assert out.empty()
+    reorder.put(3, "new")
+    assert out.get_nowait() == "new" and out.empty()
+
+
+def test_interrupt_cancels_queued_and_in_flight_segments(pipeline):
+    voice = pipeline.voices["KR"]
+    voice.engine.frontend_ms = 300 # 합성 중에 stop이 오도록
+    pipeline._spawn(pipeline.synth_worker, 0)
+    pipeline.submit(LONG_KR)
+    n = pipeline._next_seq
+    deadline = time.perf_counter() + 2.0
+    while pipeline._busy[0] is None and time.perf_counter() < deadline: time.sleep(0.005)
+    pipeline.interrupt()
+    assert pipeline.job_q.qsize() == 0
+    deadline = time.perf_counter() + 2.0
+    while pipeline.stop_stats()["cancelled"] == 0 and time.perf_counter() < deadline: time.sleep(0.01)
+    pipeline.stop_evt.set()
+    for th in pipeline.threads: th.join(timeout=2.0)
+
+    stats = pipeline.stop_stats()
+    assert stats["cancelled"] == 1 and stats["skipped"] == n - 1
+    assert pipeline.play_q.empty() # 이전 세대 결과는 재생 큐에 들어가지 않음
+    assert voice.engine.calls == 1 and voice.engine.audio_sec == 0.0 # 전처리 뒤 음향 모델 전에 멈춤
+    assert stats["release"]["count"] == 1 # 합성 CPU가 풀린 시점 기록
+
+
+def test_stale_generation_result_is_not_played(pipeline):
+    voice = pipeline.voices["KR"]
+    pipeline.submit("안녕하세요.")
+    job = pipeline.job_q.get(timeout=0)
+    pipeline.interrupt()
+    pipeline.submit("새 발화입니다.")
+    audio = voice.engine.synthesize(job[3], 0, 1.0)
+    pipeline._finish(voice, job, (voice.sample_rate, audio), {}, time.perf_counter(), 1.0) # stop 전에 꺼낸 세그먼트가 늦게 끝남
+    assert pipeline.play_q.empty()
+
+
+def test_failed_batch_releases_claimed_keys(pipeline):
+    voice = pipeline.voices["KR"]
+    def broken_batch(items, speed, cancel=None, timings=None): raise RuntimeError("acoustic model failed")
+    voice.engine.synthesize_batch = broken_batch
+    segs = ["첫 번째 문장입니다.", "두 번째 문장입니다."]
+    results = pipeline.synth_batch(0, voice, segs, [0, 0], 1.0, timings=[{} for _ in segs])
+    assert results == [None, None]
+    for seg in segs: # 예약이 풀려 다음 요청이 기다리지 않고 직접 합성
+        value, source = voice.cache.get_or_create(tts_pipeline.cache_key(seg, 0, 1.0), lambda: None)
+        assert (value, source) == (None, "miss")
+
+
+def test_batch_leaves_keys_claimed_elsewhere_to_their_owner(pipeline):
+    voice = pipeline.voices["KR"]
+    segs = ["첫 번째 문장입니다.", "두 번째 문장입니다."]
+    other = tts_pipeline.cache_key(segs[1], 0, 1.0)
+    assert voice.cache.try_claim(other) # 다른 워커가 두 번째 세그먼트를 합성 중
+    owner_audio = (voice.sample_rate, voice.engine.synthesize(segs[1], 0, 1.0))
+    batch = voice.engine.synthesize_batch
+    def batch_then_owner_finishes(items, *args, **kwargs):
+        threading.Timer(0.05, voice.cache.fulfil, (other, owner_audio)).start() # 배치가 끝난 뒤 다른 워커 결과가 나옴
+        return batch(items, *args, **kwargs)
+    voice.engine.synthesize_batch = batch_then_owner_finishes
+    timings = [{} for _ in segs]
+    results = pipeline.synth_batch(0, voice, segs, [0, 0], 1.0, timings=timings)
+    assert results[0] is not None and results[1] is owner_audio # 두 번째는 그 워커 결과를 받음
+    assert [t["cache"] for t in timings] == ["miss", "shared"]
+    assert voice.engine.calls == 2 # 배치는 첫 세그먼트만 (소유자 합성 1번 + 배치 1번)
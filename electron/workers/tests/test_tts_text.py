@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""tts_text 단위 테스트: 언어별 세그먼트 경계 규칙(문장 끝, 절 경계, 약어), 첫 세그먼트 길이, RTF 예산, 정규화"""
+
+from tts_text import split_chunks, normalize_text, RULES
+
+KR = ("천안 독립기념관은 매주 월요일에 휴관하며, 관람 시간은 오전 9시 30분부터 오후 6시까지입니다. "
+      "주차는 무료이고 전시관 안에는 휠체어와 유모차를 빌릴 수 있는 안내 데스크가 있습니다. "
+      "단체 관람은 일주일 전에 예약해 주시고, 해설 프로그램은 하루 네 번 운영합니다.")
+EN = ("Dr. Kim will meet you at the main gate at 10 a.m. tomorrow, and the guided tour of the exhibition halls "
+      "lasts about two hours. Please bring your ticket and arrive ten minutes early so that we can start on time.")
+
+
+def _first_in_range(segments, language):
+    rules = RULES[language]
+    return rules["first_min"] <= len(segments[0]) <= rules["first_max"]
+
+
+def test_kr_splits_at_punctuation_and_sentence_ends():
+    segments = split_chunks(KR, "KR")
+    assert segments[0] == "천안 독립기념관은 매주 월요일에 휴관하며," # 첫 세그먼트는 가장 이른 절 경계
+    assert _first_in_range(segments, "KR")
+    assert all(seg[-1] in ".," for seg in segments)
+    assert " ".join(segments) == normalize_text(KR) # 글자를 잃거나 바꾸지 않음
+
+
+def test_kr_clause_ending_is_a_boundary_without_punctuation():
+    text = ("주차는 무료이고 전시관 안에는 휠체어와 유모차를 빌릴 수 있는 안내 데스크가 있습니다 "
+            "단체 관람은 예약해 주세요 해설 프로그램은 하루 네 번 운영합니다")
+    segments = split_chunks(text, "KR")
+    assert segments[0] == "주차는 무료이고" # 연결 어미 '-이고'에서 자름
+    assert _first_in_range(segments, "KR")
+
+
+def test_en_abbreviations_do_not_end_a_sentence():
+    segments = split_chunks(EN, "EN")
+    assert segments[0] == "Dr. Kim will meet you at the main gate at 10 a.m. tomorrow," # Dr. / a.m. 뒤에서 자르지 않음
+    assert _first_in_range(segments, "EN")
+    assert not any(seg.endswith(("Dr.", "a.m.")) for seg in segments)
+    assert segments[-1].startswith("Please")
+
+
+def test_en_clause_words_start_a_new_segment_without_punctuation():
+    text = ("The museum opens at nine in the morning and closes at six in the evening "
+            "except on Mondays when it is closed for maintenance and cleaning")
+    segments = split_chunks(text, "EN")
+    assert _first_in_range(segments, "EN")
+    assert all(seg.split()[0] in ("and", "when") for seg in segments[1:]) # 접속사 앞에서 절이 시작됨
+
+
+def test_long_run_without_spaces_is_hard_split():
+    segments = split_chunks("가" * 100, "KR")
+    assert len(segments[0]) == RULES["KR"]["first_max"]
+    assert "".join(segments).replace(" ", "") == "가" * 100
+
+
+def test_segment_length_follows_rtf_and_default_is_reproducible():
+    fast, slow = split_chunks(KR, "KR", rtf=0.1), split_chunks(KR, "KR", rtf=2.0)
+    assert fast[0] == slow[0] # 첫 세그먼트는 RTF와 무관
+    assert len(fast) < len(slow) # 합성이 느릴수록 짧게 나눠 재생을 앞섬
+    assert split_chunks(KR, "KR") == split_chunks(KR, "KR", rtf=None) # 캐시 팩과 같은 분할
+
+
+def test_short_text_is_one_segment_and_normalized():
+    assert split_chunks("짧은  문장입니다！！", "KR") == ["짧은 문장입니다!"]
+    assert split_chunks("   ", "KR") == []
+    assert normalize_text("  안녕하세요！！  “천안”입니다…  ") == "안녕하세요! '천안'입니다..."
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 오디오 캐시 공용 모듈 (tts_host.py / build_tts_pack.py 공용)
+- 합성 결과(int16 PCM)를 콘텐츠 주소(해시) 기반 파일로 디스크에 저장해 워커 재시작 후에도 재사용합니다.
+- 읽기는 np.memmap으로 매핑된 int16 버퍼를 그대로 반환하므로 재생기로 넘길 때 복사가 없습니다.
+- 쓰기는 임시 파일 작성 후 os.replace()로 교체하는 원자적 방식이라, 도중에 죽어도 깨진 항목이 남지 않습니다.
+  합성 워커는 put_later()로 쓰기 스레드 하나에 맡깁니다. (대기열은 WRITE_QUEUE_MAX개까지, 넘치면 버림 - 메모리 캐시에는 남아 있음)
+- 키에 언어/모델 리비전/샘플레이트(namespace)가 포함되므로 KR/EN 워커가 같은 폴더를 공유해도 충돌하지 않습니다.
+- 메모리 캐시(LRUCache)는 바이트 예산 기반 LRU이며(오디오, 텍스트 전처리 결과 공용), 자주 쓰는 문구는 고정(pin)해 제거되지 않게 할 수 있습니다.
+- 같은 키를 여러 합성 스레드가 동시에 요청하면 하나만 합성하고 나머지는 그 결과를 기다립니다(single-flight).
+  배치 합성은 try_claim()/fulfil()로 여러 키를 기다리지 않고 한꺼번에 예약합니다.
+- build_tts_pack.py가 미리 합성한 캐시 팩(인덱스 + int16 PCM 단일 파일)을 시작 시 매핑해 고정 항목으로 사용합니다.
+"""
+
+import os, json, time, queue, struct, hashlib, tempfile, threading
+from collections import OrderedDict
+import numpy as np
+
+CACHE_MAGIC = b"MTC1"
+HEADER = struct.Struct("<4sIQ") # magic, sample_rate, n_samples
+TMP_MAX_AGE_SEC = 3600
+WRITE_QUEUE_MAX = 64 # 디스크 쓰기 대기열 상한 (fsync가 밀려도 메모리에 쌓이는 오디오를 제한)
+KEY_FORMAT = 2 # cache_key 형식이 바뀌면 올림 (2: 게인 제외 + 정규화 텍스트)
+PACK_MAGIC = b"MTP1"
+PACK_ALIGN = 16
+CACHE_ROOT = os.path.join(os.environ.get('LOCALAPPDATA', tempfile.gettempdir()), 'MeloTTS_Cache')
+PACK_DIR = os.environ.get('MELO_TTS_PACK_DIR') or os.path.join(CACHE_ROOT, 'packs')
+
+
+def model_revision(language, default="unknown"):
+    """HF 허브 캐시에 내려받은 MeloTTS 체크포인트의 커밋 해시를 찾습니다. (못 찾으면 default)"""
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        from melo.download_utils import LANG_TO_HF_REPO_ID
+        path = try_to_load_from_cache(LANG_TO_HF_REPO_ID[language], "checkpoint.pth")
+        if isinstance(path, str):
+            return os.path.basename(os.path.dirname(path))
+    except Exception:
+        pass
+    return default
+
+
+def cache_namespace(profile, sr, variant=""):
+    """캐시 항목이 유효한 모델 범위 (언어 | 모델 리비전 | 샘플레이트 | 키 형식 [| 양자화 변형])"""
+    namespace = f"{profile['language']}|{profile['revision'] or model_revision(profile['language'])}|{sr}|k{KEY_FORMAT}"
+    return f"{namespace}|{variant}" if variant else namespace
+
+
+def pack_path(language, pack_dir=PACK_DIR):
+    return os.path.join(pack_dir, f"tts_pack_{language.lower()}.bin")
+
+
+def write_pack(path, namespace, entries):
+    """entries: [(key, sr, int16 배열)] -> [magic | index 길이 | JSON index | 16바이트 정렬된 PCM 블록들]"""
+    index, offset = [], 0
+    for key, sr, audio in entries:
+        index.append({"key": key, "sr": int(sr), "offset": offset, "n": int(audio.size)})
+        offset += -(-audio.nbytes // PACK_ALIGN) * PACK_ALIGN
+    meta = {"namespace": namespace, "entries": index}
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    data_start = -(-(len(PACK_MAGIC) + 4 + len(meta_bytes)) // PACK_ALIGN) * PACK_ALIGN
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PACK_MAGIC + struct.pack("<I", len(meta_bytes)) + meta_bytes)
+        for (_, _, audio), item in zip(entries, index):
+            f.seek(data_start + item["offset"])
+            f.write(np.ascontiguousarray(audio, dtype=np.int16).data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def load_pack(path):
+    """캐시 팩을 매핑해 (namespace, {key: (sr, int16 view)})를 반환합니다. 항목은 복사 없는 memmap 뷰입니다."""
+    mm = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(mm[:4]) != PACK_MAGIC: raise ValueError(f"not a TTS cache pack: {path}")
+    meta_len = struct.unpack("<I", bytes(mm[4:8]))[0]
+    meta = json.loads(bytes(mm[8:8 + meta_len]).decode("utf-8"))
+    data_start = -(-(8 + meta_len) // PACK_ALIGN) * PACK_ALIGN
+    entries = {}
+    for item in meta["entries"]:
+        start = data_start + item["offset"]
+        entries[item["key"]] = (item["sr"], mm[start:start + 2 * item["n"]].view(np.int16))
+    return meta["namespace"], entries
+
+
+class DiskAudioCache:
+    """디스크 영구 오디오 캐시. get()/put()은 여러 스레드/프로세스에서 동시에 호출해도 안전합니다."""
+
+    def __init__(self, root, namespace, max_bytes=512 * 1024 * 1024):
+        self.root = root
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._write_q = queue.Queue(WRITE_QUEUE_MAX)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self.write_dropped = 0
+
+    def _path(self, key):
+        digest = hashlib.sha256(f"{self.namespace}|{key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest + ".pcm")
+
+    def get(self, key):
+        """(sr, 읽기 전용 int16 memmap)을 반환합니다. 없거나 손상된 경우 None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                magic, sr, n = HEADER.unpack(f.read(HEADER.size))
+            if magic != CACHE_MAGIC or n == 0 or os.path.getsize(path) != HEADER.size + 2 * n:
+                return None
+            audio = np.memmap(path, dtype=np.int16, mode="r", offset=HEADER.size, shape=(n,))
+        except (OSError, ValueError, struct.error):
+            return None
+        try: os.utime(path, None) # 정리(prune) 시 최근 사용 순서 판단용
+        except OSError: pass
+        return sr, audio
+
+    def put(self, key, sr, audio_int16):
+        """int16 오디오를 원자적으로 저장합니다. 이미 있으면 건너뜁니다."""
+        if audio_int16.size == 0: return
+        path = self._path(key)
+        if os.path.exists(path): return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(HEADER.pack(CACHE_MAGIC, int(sr), int(audio_int16.size)))
+                f.write(np.ascontiguousarray(audio_int16, dtype=np.int16).data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except OSError:
+            # Windows에서는 다른 워커가 같은 키를 먼저 써서 매핑 중이면 교체가 거부됨 -> 내용이 같으므로 무시
+            try: os.remove(tmp_path)
+            except OSError: pass
+
+    def put_later(self, key, sr, audio_int16):
+        """put()을 쓰기 스레드에 맡깁니다. (호출 스레드는 fsync를 기다리지 않음) 대기열이 차 있으면 버리고 False"""
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="disk-cache-writer", daemon=True)
+                self._writer.start()
+        try:
+            self._write_q.put_nowait((key, sr, audio_int16))
+            return True
+        except queue.Full:
+            self.write_dropped += 1
+            return False
+
+    def _write_loop(self):
+        while True:
+            item = self._write_q.get()
+            if item is None: break
+            self.put(*item)
+
+    def close(self, timeout=2.0):
+        """대기 중인 쓰기를 마치고 쓰기 스레드를 멈춥니다."""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is None: return
+        self._write_q.put(None)
+        writer.join(timeout)
+
+    def prune(self):
+        """max_bytes를 넘으면 오래 안 쓴 항목부터 지웁니다. 매핑 중인 파일은 건너뜁니다."""
+        entries, total, now = [], 0, time.time()
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                try: st = os.stat(path)
+                except OSError: continue
+                if name.endswith(".tmp"):
+                    if now - st.st_mtime > TMP_MAX_AGE_SEC:
+                        try: os.remove(path)
+                        except OSError: pass
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        removed = 0
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * 0.9: break
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError: pass
+        return total, removed
+
+
+class _Flight:
+    """진행 중인 합성 1건. 대기 스레드는 event로 결과를 받습니다."""
+    __slots__ = ("event", "value")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+
+
+def _entry_bytes(value):
+    audio = value[1]
+    return getattr(audio, "nbytes", None) or len(audio)
+
+
+class LRUCache:
+    """바이트 예산 기반 LRU 메모리 캐시. 항목 크기는 sizeof(value)로 셉니다."""
+
+    def __init__(self, max_bytes, sizeof):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._static = {} # 캐시 팩 항목 (디스크 매핑, 예산/제거 대상 아님)
+        self._pinned = set()
+        self._inflight = {}
+        self._bytes = 0
+        self._hits = self._misses = self._waits = self._evictions = 0
+
+    def pin(self, key):
+        """키를 고정합니다. 아직 캐시에 없어도 나중에 들어오면 고정된 상태로 유지됩니다."""
+        with self._lock:
+            self._pinned.add(key)
+
+    def add_static(self, entries):
+        """캐시 팩처럼 미리 만들어진 읽기 전용 항목을 등록합니다. 메모리 예산에 포함되지 않고 제거되지도 않습니다."""
+        with self._lock:
+            self._static.update(entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._static.get(key) or self._entries.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            if key in self._entries: self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def contains(self, key):
+        """통계/LRU 순서에 영향 없이 캐시(팩 포함)에 있는지만 확인합니다."""
+        with self._lock:
+            return key in self._static or key in self._entries
+
+    def put(self, key, value, pin=False):
+        size = self._sizeof(value)
+        with self._lock:
+            if pin: self._pinned.add(key)
+            if key not in self._pinned and size > self.max_bytes: return
+            old = self._entries.pop(key, None)
+            if old is not None: self._bytes -= self._sizeof(old)
+            self._entries[key] = value
+            self._bytes += size
+            self._evict_locked()
+
+    def _evict_locked(self):
+        if self._bytes <= self.max_bytes: return
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes: break
+            if key in self._pinned: continue
+            self._bytes -= self._sizeof(self._entries.pop(key))
+            self._evictions += 1
+
+    def get_or_create(self, key, factory):
+        """(value, source)를 반환합니다. source: 'hit' | 'wait'(다른 스레드 결과 공유) | 'miss'(factory 직접 실행)
+        factory가 None을 반환하거나 예외를 던지면 캐시하지 않으며, 대기 중이던 스레드는 None을 받습니다."""
+        with self._lock:
+            value = self._static.get(key)
+            if value is not None:
+                self._hits += 1
+                return value, "hit"
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return value, "hit"
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self._misses += 1
+            else:
+                self._waits += 1
+        if not leader:
+            flight.event.wait()
+            return flight.value, "wait"
+        try:
+            flight.value = factory()
+            if flight.value is not None: self.put(key, flight.value)
+            return flight.value, "miss"
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.event.set()
+
+    def try_claim(self, key):
+        """캐시에 없고 다른 스레드가 만드는 중도 아니면 이 스레드가 만들기로 예약하고 True (기다리지 않음, 배치 합성용)
+        예약한 키는 반드시 fulfil()로 끝내야 같은 키를 get_or_create()로 기다리는 스레드가 풀립니다."""
+        with self._lock:
+            if key in self._static or key in self._entries or key in self._inflight: return False
+            self._inflight[key] = _Flight()
+            self._misses += 1
+            return True
+
+    def fulfil(self, key, value):
+        """try_claim()으로 예약한 키의 결과를 넣고 기다리던 스레드에 넘깁니다. value가 None(실패/취소)이면 캐시하지 않음"""
+        if value is not None: self.put(key, value)
+        with self._lock:
+            flight = self._inflight.pop(key)
+        flight.value = value
+        flight.event.set()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses + self._waits
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "pinned": len(self._pinned), "static_entries": len(self._static), "hits": self._hits, "misses": self._misses,
+                    "waits": self._waits, "evictions": self._evictions,
+                    "hit_rate": round((self._hits + self._waits) / lookups, 3) if lookups else 0.0}
+
+
+class AudioLRUCache(LRUCache):
+    """오디오 메모리 캐시. 값은 (sr, int16 오디오) 튜플입니다."""
+
+    def __init__(self, max_bytes):
+        super().__init__(max_bytes, _entry_bytes)
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+로컬 IPC TTS 호스트 - Windows Named Pipe (다국어 TTS, 프로세스 하나)
+- 한 인터프리터 안에서 언어별 MeloTTS 모델(KR, EN ...)을 나란히 로딩해 torch/transformers 런타임을 공유합니다.
+- 언어 프로필마다 기존 파이프를 그대로 엽니다: \\.\pipe\melo_tts (KR), \\.\pipe\melo_tts_en (EN)
+  각 파이프의 기본 언어는 그 프로필의 언어이며, 요청 JSON에 "lang"을 주면 다른 언어로 읽을 수 있습니다.
+  예) {"text": "Hello", "lang": "EN"}
+- 로딩할 언어는 MELO_TTS_LANGUAGES (기본 "KR,EN"). 언어를 추가할 때는 tts_profiles.PROFILES에 프로필만 추가하면 됩니다.
+- 시작 순서: 파이프 먼저 열기(요청은 큐에 쌓임) -> torch/melo 임포트 -> 언어별 모델 로딩(mmap) + 무음 워밍업
+  -> 해당 파이프로 "READY" 전송. 단계별 소요 시간은 [STARTUP] 보고서로 출력합니다.
+  먼저 준비된 파이프로 아직 로딩 중인 언어("lang")의 요청이 오면 그 세그먼트는 보관했다가 그 언어 로딩이 끝나면 합성합니다.
+- 파이프라인 로그는 kiosk_log 쓰기 스레드가 냅니다. 배포 모드(packaged)는 INFO부터, 개발 모드는 DEBUG부터 (KIOSK_LOG_LEVEL, KIOSK_LOG_FORMAT=json)
+
+실행: python tts_host.py [packaged|dev] [resourcesPath]
+"""
+
+import time
+T_PROCESS_START = time.perf_counter()
+import os, sys, json, threading, tempfile, shutil, importlib, contextlib
+
+# 임베디드 파이썬(._pth)은 스크립트 폴더를 sys.path에 넣지 않으므로 공용 모듈 경로를 직접 추가
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from tts_profiles import PROFILES, pick_speaker_id, cache_key
+import kiosk_log
+
+
+# --- 전역 변수 및 설정 ---
+LANGUAGES = [l.strip().upper() for l in os.environ.get('MELO_TTS_LANGUAGES', 'KR,EN').split(',') if l.strip()]
+N_SYNTH_WORKERS = 2 # 파이프마다 한 발화의 세그먼트들을 나눠 합성하는 스레드 수
+# 언어별 합성 프로세스 수. 0이면 이 프로세스 안에서 스레드로 합성, 1 이상이면 tts_procpool로 GIL 밖에서 합성
+SYNTH_PROCS = int(os.environ.get('MELO_TTS_SYNTH_PROCS', '0'))
+# 디스크 영구 캐시 (재부팅/워커 재시작 후에도 유지, 언어별 네임스페이스로 구분). MELO_TTS_DISK_CACHE=0 이면 사용 안 함
+DISK_CACHE_ENABLED = os.environ.get('MELO_TTS_DISK_CACHE', '1') != '0'
+DISK_CACHE_DIR = os.environ.get('MELO_TTS_AUDIO_CACHE_DIR') or os.path.join(os.environ.get('LOCALAPPDATA', tempfile.gettempdir()), 'MeloTTS_Cache', 'audio')
+DISK_CACHE_MAX_MB = int(os.environ.get('MELO_TTS_DISK_CACHE_MB', '512'))
+# 언어별 메모리 캐시 바이트 예산 (LRU). 고정(pin)할 문구는 MELO_TTS_PINNED_PHRASES 파일에 한 줄씩 적습니다
+AUDIO_CACHE_MAX_MB = int(os.environ.get('MELO_TTS_CACHE_MB', '128'))
+PINNED_PHRASES_FILE = os.environ.get('MELO_TTS_PINNED_PHRASES')
+CACHE_STATS_INTERVAL_SEC = 300
+
+# main.js에서 전달한 인수로 배포 모드(packaged) 여부 확인
+IS_PACKAGED = (len(sys.argv) > 1 and sys.argv[1] == 'packaged')
+BASE_PATH = sys.argv[2] if len(sys.argv) > 2 else None # main.js에서 전달한 resourcesPath
+kiosk_log.configure(packaged=IS_PACKAGED) # 배포 모드: 세그먼트마다 나오는 상세(DEBUG) 로그 끔 (KIOSK_LOG_LEVEL로 덮어씀)
+
+
+# --- 언어별 초기화 (모델 로딩 전에 한 번) ---
+def configure_korean():
+    """MeCab (한국어 형태소 분석기) 경로 설정"""
+    try:
+        if IS_PACKAGED:
+            if BASE_PATH:
+                mecab_dic_path = os.path.join(BASE_PATH, 'mecab_ko_dic')
+                mecabrc_path = os.path.join(mecab_dic_path, 'dicdir', 'mecabrc')
+                eunjeon_dic_path = os.path.join(mecab_dic_path, 'dicdir')
+
+                if os.path.exists(mecabrc_path):
+                    # eunjeon 라이브러리가 내장된 mecabrc 대신, 패키징된 사전 경로를 사용하도록 강제
+                    import eunjeon
+                    eunjeon_mecabrc_path = os.path.join(os.path.dirname(eunjeon.__file__), 'data', 'mecabrc')
+                    mecabrc_content = f'dicdir = {eunjeon_dic_path}\n'
+                    os.makedirs(os.path.dirname(eunjeon_mecabrc_path), exist_ok=True)
+                    with open(eunjeon_mecabrc_path, 'w', encoding='utf-8') as f:
+                        f.write(mecabrc_content)
+                    print(f"[INIT] Patched 'eunjeon/data/mecabrc' to use packaged dictionary.", flush=True)
+            else:
+                print("[INIT][FATAL] Packaged mode but BASE_PATH not provided.", flush=True)
+                sys.exit(1)
+        else: # 개발 모드
+            print("[INIT] Debug Mode. Relying on default 'mecab-ko-dic' package.", flush=True)
+    except Exception as e:
+        print(f"[INIT][WARN] Failed to configure MeCab for Korean TTS: {e}", flush=True)
+    return {}
+
+def configure_english():
+    """NLTK 데이터 경로 설정 (패키징 환경 대응). 합성 프로세스에 넘길 환경변수를 반환합니다."""
+    import nltk
+    try:
+        if IS_PACKAGED and BASE_PATH:
+            nltk_data_path = os.path.join(BASE_PATH, 'nltk_data')
+            if os.path.isdir(nltk_data_path):
+                nltk.data.path.append(nltk_data_path)
+                print(f"[INIT] NLTK Data Path added: {nltk_data_path}", flush=True)
+                return {'NLTK_DATA': nltk_data_path}
+        else:
+            print("[INIT] Debug Mode: Checking/Downloading NLTK data ('punkt')...", flush=True)
+            nltk.download('punkt', quiet=True)
+            print("[INIT] NLTK 'punkt' data is ready.", flush=True)
+    except Exception as e:
+        print(f"[INIT][WARN] Failed to configure NLTK data path: {e}", flush=True)
+    return {}
+
+LANGUAGE_SETUP = {"KR": configure_korean, "EN": configure_english}
+
+
+# HuggingFace 라이브러리 설정 (모든 언어 모델이 같은 캐시 폴더 사용)
+os.environ['HUGGINGFACE_HUB_DISABLE_SYMLINKS'] = '1'
+try: # 캐시 폴더 설정
+    local_app_data = os.environ.get('LOCALAPPDATA', '.')
+    hf_cache_path = os.path.join(local_app_data, 'MeloTTS_Cache', 'huggingface', 'hub')
+    os.makedirs(hf_cache_path, exist_ok=True)
+    os.environ['HF_HOME'] = hf_cache_path
+    os.environ['HUGGINGFACE_HUB_CACHE'] = hf_cache_path
+except Exception as e:
+    print(f"[FATAL] Failed to set cache env: {e}", flush=True)
+    sys.exit(1)
+
+# 필수 라이브러리 임포트 (torch/melo 같은 무거운 모듈은 파이프를 연 뒤 main()에서 임포트)
+try:
+    from tts_cache import AudioLRUCache, DiskAudioCache, cache_namespace, load_pack, pack_path
+    from tts_text import split_chunks
+    from tts_pipeline import TtsPipeline, Voice, warmup
+    from tts_synth import (LocalEngine, load_tts, FAST_INFERENCE, quantize_int8, model_variant,
+                           threads_per_worker, configure_interop_threads)
+    from tts_procpool import SynthProcessPool
+except ImportError as e:
+    print(f"FATAL: 필수 라이브러리 로딩 실패: {e}", flush=True)
+    sys.exit(1)
+
+# UTF-8 인코딩 설정
+try:
+    sys.stdout.reconfigure(encoding="utf-8")
+    sys.stderr.reconfigure(encoding="utf-8")
+except Exception: pass
+
+# 임시 디렉토리 설정
+try:
+    base_temp_dir = os.environ.get('LOCALAPPDATA', tempfile.gettempdir())
+    TMP_PATH = os.path.join(base_temp_dir, f"melo_tts_host_{os.getpid()}")
+    os.makedirs(TMP_PATH, exist_ok=True)
+    print(f"[INIT] Using temporary directory: {TMP_PATH}", flush=True)
+except Exception as e:
+    print(f"FATAL: Failed to create temporary directory: {e}", flush=True)
+    sys.exit(1)
+
+
+class StartupReport:
+    """시작 단계별 소요 시간 기록"""
+
+    def __init__(self):
+        self.phases = [("module imports", time.perf_counter() - T_PROCESS_START)]
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - t0))
+
+    def add(self, name, sec):
+        self.phases.append((name, sec))
+
+    def print(self, title):
+        total = time.perf_counter() - T_PROCESS_START
+        print(f"[STARTUP] --- {title} ---", flush=True)
+        for name, sec in self.phases:
+            print(f"[STARTUP] {name:<28} {sec:7.2f}s", flush=True)
+        print(f"[STARTUP] {'total since process start':<28} {total:7.2f}s", flush=True)
+        print(f"[STARTUP] report {json.dumps({'title': title, 'phases': dict(self.phases), 'total': round(total, 3)})}", flush=True)
+
+
+def load_voice(language, report):
+    """언어 하나의 모델/엔진을 로딩하고 캐시(고정 문구, 디스크, 캐시 팩)를 붙여 Voice로 반환합니다."""
+    profile = PROFILES[language]
+    with report.phase(f"{language}: language setup"):
+        child_env = LANGUAGE_SETUP.get(language, lambda: {})()
+    tmpdir = tempfile.mkdtemp(prefix=f"_melo_run_{language.lower()}_", dir=TMP_PATH)
+    with report.phase(f"{language}: model load"):
+        if SYNTH_PROCS > 0: # 자식 프로세스들이 각자 로딩 + 무음 워밍업까지 마친 뒤 반환
+            print(f"[INIT] Starting {SYNTH_PROCS} MeloTTS {language} synth process(es)...", flush=True)
+            if IS_PACKAGED and BASE_PATH: child_env['MELO_TTS_RESOURCES'] = BASE_PATH
+            engine = SynthProcessPool(profile, SYNTH_PROCS, env=child_env)
+            spk_id = engine.speaker_id
+        else:
+            print(f"[INIT] Loading MeloTTS {language} model...", flush=True)
+            tts = load_tts(profile, BASE_PATH if IS_PACKAGED else None)
+            spk_id = pick_speaker_id(tts, profile)
+            quantized = quantize_int8(tts, profile) if FAST_INFERENCE else []
+            n_threads = threads_per_worker(N_SYNTH_WORKERS) if FAST_INFERENCE else None
+            engine = LocalEngine(tts, tmpdir, int(getattr(tts.hps.data, "sampling_rate", profile["default_sr"])),
+                                 n_threads, model_variant(quantized))
+            if FAST_INFERENCE: print(f"[INIT] {language} fast inference: int8={quantized or 'none'}, intra-op threads/worker={n_threads}", flush=True)
+    target_sr = engine.sample_rate
+    print(f"[INIT] {language} model loaded. SpkID={spk_id}, SR={target_sr}", flush=True)
+
+    if SYNTH_PROCS == 0:
+        report.add(f"{language}: warmup (silent)", warmup(engine, spk_id, profile))
+
+    cache = AudioLRUCache(AUDIO_CACHE_MAX_MB * 1024 * 1024)
+    if PINNED_PHRASES_FILE and os.path.exists(PINNED_PHRASES_FILE):
+        with open(PINNED_PHRASES_FILE, encoding='utf-8') as f:
+            for phrase in f:
+                for seg in split_chunks(phrase, language): cache.pin(cache_key(seg, spk_id, profile["speed"]))
+        print(f"[INIT] {language} pinned phrases loaded: {cache.stats()['pinned']} segments", flush=True)
+
+    t_cache = time.perf_counter()
+    namespace = cache_namespace(profile, target_sr, engine.variant)
+    disk_cache = None
+    if DISK_CACHE_ENABLED:
+        try:
+            disk_cache = DiskAudioCache(DISK_CACHE_DIR, namespace, DISK_CACHE_MAX_MB * 1024 * 1024)
+            threading.Thread(target=disk_cache.prune, daemon=True).start()
+            print(f"[INIT] Disk audio cache: {DISK_CACHE_DIR} (namespace={disk_cache.namespace})", flush=True)
+        except Exception as e:
+            print(f"[INIT][WARN] Disk audio cache disabled: {e}", flush=True)
+
+    pack_file = pack_path(language)
+    if os.path.exists(pack_file): # build_tts_pack.py로 미리 합성한 문구들
+        try:
+            pack_namespace, pack_entries = load_pack(pack_file)
+            if pack_namespace == namespace:
+                cache.add_static(pack_entries)
+                print(f"[INIT] Cache pack loaded: {pack_file} ({len(pack_entries)} segments)", flush=True)
+            else:
+                print(f"[INIT][WARN] Cache pack ignored (built for {pack_namespace}, model is {namespace}). Rebuild it with build_tts_pack.py", flush=True)
+        except Exception as e:
+            print(f"[INIT][WARN] Failed to load cache pack {pack_file}: {e}", flush=True)
+    report.add(f"{language}: caches", time.perf_counter() - t_cache)
+
+    return Voice(profile, engine, spk_id, cache, disk_cache)
+
+
+# --- 메인 실행 ---
+def main(languages=None):
+    languages = languages or LANGUAGES
+    print(f"[INIT] IS_PACKAGED flag set to: {IS_PACKAGED}", flush=True)
+    print(f"[INIT] Starting TTS Host ({', '.join(languages)})...", flush=True)
+    report = StartupReport()
+
+    # 파이프 스레드를 모델 로딩 전에 시작 (로딩 중 들어온 요청은 job_q에 쌓임)
+    with report.phase("open pipes"):
+        pipelines = []
+        for language in languages:
+            if PROFILES[language].get("pipe_name"):
+                pipeline = TtsPipeline(PROFILES[language], max(N_SYNTH_WORKERS, SYNTH_PROCS))
+                pipeline.start_pipe()
+                pipelines.append(pipeline)
+        for pipeline in pipelines: pipeline.loading.update(languages) # 로딩 전 언어의 요청은 버리지 않고 로딩 뒤 합성
+    stop_evt = threading.Event()
+
+    # 언어를 하나씩 로딩하고, 로딩이 끝난 언어의 파이프부터 바로 합성을 시작 (voices는 모든 파이프라인이 공유)
+    voices = {}
+    try:
+        if SYNTH_PROCS == 0:
+            with report.phase("import torch/melo"):
+                # 무거운 임포트만 따로 재서 보고 (이후 load_tts 안의 임포트는 이미 불러온 모듈을 씀)
+                importlib.import_module("torch")
+                importlib.import_module("melo.api")
+                if FAST_INFERENCE: configure_interop_threads()
+        for language in languages:
+            voices[language] = load_voice(language, report)
+            for pipeline in pipelines:
+                pipeline.voice_loaded(language)
+                if pipeline.profile["language"] == language:
+                    print(f"[INIT] Starting worker threads (Play, Synth) for {pipeline.name}...", flush=True)
+                    pipeline.start_workers(voices)
+            report.print(f"{language} ready")
+    except Exception as e:
+        print(f"[INIT][FATAL] Failed to load model: {e}", flush=True)
+        for pipeline in pipelines: pipeline.stop_evt.set()
+        sys.exit(1)
+
+    print(f"[INIT] All threads started. Monitoring...", flush=True)
+    last_stats = time.time()
+    try:
+        while not stop_evt.is_set():
+            for pipeline in pipelines:
+                if pipeline.stop_evt.is_set() or not pipeline.all_alive():
+                    print(f"[ERROR] Pipeline {pipeline.name} stopped or a worker thread died. Exiting.", flush=True)
+                    stop_evt.set()
+            if time.time() - last_stats >= CACHE_STATS_INTERVAL_SEC:
+                for language, voice in voices.items():
+                    print(f"[CACHE] {language} stats {json.dumps(voice.cache.stats())}", flush=True)
+                    frontend = voice.engine.frontend_stats()
+                    if frontend: print(f"[CACHE] {language} frontend stats {json.dumps(frontend)}", flush=True)
+                for pipeline in pipelines:
+                    print(f"[PIPE] {pipeline.name} stats {json.dumps(pipeline.transport.stats())}", flush=True)
+                    print(f"[STOP] {pipeline.name} stats {json.dumps(pipeline.stop_stats())}", flush=True)
+                print(f"[LOG] stats {json.dumps(kiosk_log.stats())}", flush=True)
+                last_stats = time.time()
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("\n[EXIT] KeyboardInterrupt.", flush=True)
+    finally:
+        print("[EXIT] Shutting down...", flush=True)
+        for pipeline in pipelines: pipeline.shutdown()
+        for voice in voices.values():
+            voice.engine.close()
+            if voice.disk_cache: voice.disk_cache.close() # 대기 중인 디스크 쓰기 마무리
+        shutil.rmtree(TMP_PATH, ignore_errors=True)
+        kiosk_log.close() # 쓰기 스레드에 남은 줄을 내보낸 뒤 종료
+        print("[EXIT] Shutdown complete.", flush=True)
+
+if __name__ == "__main__":
+    main()
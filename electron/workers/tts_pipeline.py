@@ -0,0 +1,770 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 파이프라인 공용 모듈 (tts_host.py에서 파이프마다 하나씩 사용)
+- 파이프 수신 -> 세그먼트 분배(job_q) -> 합성 워커 N개 -> 순서 복원(ReorderBuffer) -> 재생(play_q)
+- 파이프 송수신은 pipe_transport.open_server()의 서버(Windows: Named Pipe, 그 밖: Unix 도메인 소켓)가 맡습니다. 수신은 handle_line()으로 들어오고,
+  START/DONE/READY는 재생 워커가 transport.send()로 보내는 즉시 연결된 클라이언트에 전달됩니다.
+- 발화를 받는 즉시 split_chunks로 나눠 세그먼트마다 전역 순번(seq)을 붙이므로, 한 발화의 세그먼트를
+  모든 합성 워커가 나눠 합성하고, 재생은 완료 순서와 상관없이 항상 텍스트 순서를 따릅니다.
+- 합성 모델(Voice)은 언어별로 한 번만 로딩해 모든 파이프라인이 공유하고, 요청의 "lang" 필드로 언어를 고릅니다.
+- 재생은 기본적으로 audio_output.StreamingOutput(sounddevice 연속 스트림)을 쓰고, 사용할 수 없으면 simpleaudio로 폴백합니다.
+  MELO_TTS_AUDIO_OUTPUT=null 이면 장치 없이 실제 시간으로 소비하는 널 출력(audio_output.NullStream)에 재생합니다. (벤치마크/헤드리스)
+- MELO_TTS_TRAFFIC_LOG 파일을 주면 받은 요청을 수신 시각과 함께 JSON 줄로 기록합니다. (bench/bench_pipeline.py --traffic 으로 재생)
+- 요청 JSON의 speed / gain / speaker로 발화마다 음성을 바꿀 수 있습니다. (생략 시 언어 프로필 기본값)
+  예) {"text": "천천히 말씀드릴게요.", "speed": 0.9, "gain": 1.5}, {"text": "Hello", "lang": "EN", "speaker": "EN-BR"}
+  speed/speaker는 캐시 키에 들어가고, gain은 재생 직전에 적용하므로 볼륨이 달라도 같은 캐시 항목을 씁니다.
+- 세그먼트/합성 결과/재생 항목에는 발화 세대(generation)가 붙습니다. stop은 세대를 올리므로 이전 세대 항목은
+  합성 전, 합성 중(모델 단계 사이, tts_synth.SynthCancelled), 재생 큐, 재생 중 어디서든 버려집니다.
+  stop 직후 새 발화가 바로 와서 interrupt_evt가 풀려도, 재생 워커는 세대가 바뀐 것으로 이전 발화를 멈춥니다.
+- stop부터 소리가 멈추기까지(silence), 이전 세대 합성이 모두 끝나 CPU가 풀리기까지(release)의 지연을 stop_stats()로 제공합니다.
+- 발화마다 kiosk_metrics.UtteranceTrace로 파이프 수신 -> job_q 대기 -> 전처리/음향 모델/후처리 -> play_q 대기 -> 재생 시작 -> DONE을
+  추적해 DONE 때 [TRACE] 한 줄로 출력하고, 단계별 지연/RTF/캐시 적중은 self.metrics(MetricsStore)에 모읍니다.
+  {"command": "metrics"}를 보낸 연결에는 metrics_snapshot()을 JSON 한 줄로 답합니다.
+- 로그는 kiosk_log로 남깁니다. (쓰기 스레드가 stdout에 모아 쓰므로 합성/재생 스레드는 flush를 기다리지 않음)
+  세그먼트마다 나오는 캐시/취소 줄은 DEBUG(배포 모드에서 꺼짐)이고, 캐시 적중/취소 수는 log.count로 모아 주기적으로 한 줄씩 냅니다.
+- MELO_TTS_BATCH_MAX > 1 이면 합성 워커가 job_q 앞쪽에서 같은 세대/언어/속도의 캐시에 없는 세그먼트를(다른 발화 것도) 최대 그 수만큼
+  함께 꺼내 엔진의 synthesize_batch로 한 번에 합성합니다. (tts_synth.LocalEngine: 음향 모델 패딩 배치)
+  이때는 측정 RTF로 세그먼트를 늘려 나누지 않고 기본 분할을 유지합니다. (호출당 비용은 세그먼트를 늘리는 대신 배치로 줄임)
+  배치는 그 세그먼트 앞에 재생될 오디오(재생 중/출력 버퍼 + 재생 큐 + 앞 순번 세그먼트의 예상 길이) 안에 끝날 때만 묶습니다.
+  (RTF x 배치 오디오 예상 길이 <= SAFETY x 앞 오디오 길이) 재생 중인 오디오가 없으면 첫 세그먼트는 늘 혼자 합성하므로
+  배치 때문에 첫 소리가 늦어지지 않습니다. 배치에 넣는 키는 메모리 캐시 single-flight에 먼저 예약해 다른 워커와 겹쳐 합성하지 않습니다.
+"""
+
+import os, time, json, queue, itertools, threading, traceback, collections
+import numpy as np
+import kiosk_log as log
+try:
+    import simpleaudio as sa
+except ImportError: # 리눅스 빌드/벤치마크 서버 -> 스트림(또는 널) 출력만 사용
+    sa = None
+
+try:
+    from audio_output import StreamingOutput
+except Exception as e: # sounddevice/PortAudio 로딩 실패 -> simpleaudio 재생으로 폴백
+    log.warn("PLAY", "Streaming output unavailable, using simpleaudio: %s", e)
+    StreamingOutput = None
+
+from pipe_transport import open_server, LatencyStats
+from kiosk_metrics import MetricsStore, UtteranceTrace, metrics_reply
+from tts_profiles import PROFILES, cache_key
+from tts_text import split_chunks, DEFAULT_RTF, SAFETY
+from tts_synth import SynthCancelled
+
+# 재생 방식: stream(기본, sounddevice 연속 스트림) | simpleaudio(세그먼트마다 play_buffer) | null(장치 없이 시간만 흘림)
+AUDIO_OUTPUT = os.environ.get('MELO_TTS_AUDIO_OUTPUT', 'stream')
+# null 출력의 재생 배속 (1.0: 실제 시간, 벤치마크에서 재생 대기를 줄일 때 키움)
+NULL_OUTPUT_SPEED = float(os.environ.get('MELO_TTS_NULL_OUTPUT_SPEED', '1.0'))
+# 출력 장치 (sounddevice 장치 번호 또는 이름 일부). 비우면 시스템 기본 장치
+AUDIO_DEVICE = os.environ.get('MELO_TTS_AUDIO_DEVICE') or None
+if AUDIO_DEVICE and AUDIO_DEVICE.isdigit(): AUDIO_DEVICE = int(AUDIO_DEVICE)
+# 요청 "lang" 필드 별칭
+RTF_EMA_ALPHA = 0.3
+SPEED_RANGE = (0.5, 2.0)
+GAIN_RANGE = (0.0, 4.0)
+LANG_ALIASES = {"KO": "KR", "EN-US": "EN"}
+# 파이프 인스턴스 수 (Electron 1 + 모니터링/벤치마크 등 보조 클라이언트)
+PIPE_INSTANCES = int(os.environ.get('MELO_TTS_PIPE_INSTANCES', '4'))
+# 받은 요청을 수신 시각과 함께 JSON 줄로 이어 쓸 파일 (bench/bench_pipeline.py --traffic 으로 재생). 비우면 기록 안 함
+TRAFFIC_LOG = os.environ.get('MELO_TTS_TRAFFIC_LOG')
+# 합성 워커가 한 번에 묶어 합성할 최대 세그먼트 수 (1: 배치 끔, 엔진에 synthesize_batch가 있을 때만)
+BATCH_MAX = int(os.environ.get('MELO_TTS_BATCH_MAX', '1'))
+
+
+class JobQueue:
+    """합성 워커가 나눠 가져가는 세그먼트 대기열 (deque + Condition)
+    배치 합성이 앞쪽 항목을 잠금 밖에서 살펴본 뒤(peek) 그대로 앞에 남아 있는 것만 꺼낼(take_front) 수 있습니다."""
+
+    def __init__(self):
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """맨 앞 항목을 꺼냅니다. timeout 안에 항목이 없으면 queue.Empty"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout): raise queue.Empty
+            return self._items.popleft()
+
+    def peek(self, n):
+        """앞에서 n개까지의 항목 (꺼내지 않음)"""
+        with self._cond:
+            return list(itertools.islice(self._items, n))
+
+    def take_front(self, items):
+        """items가 지금도 큐 맨 앞부터 그 순서로 있으면 꺼내 반환합니다. 다른 워커가 먼저 꺼낸 지점에서 멈춥니다."""
+        taken = []
+        with self._cond:
+            for item in items:
+                if not self._items or self._items[0] is not item: break
+                taken.append(self._items.popleft())
+        return taken
+
+    def clear(self):
+        """대기 중인 항목을 모두 버리고 버린 수를 반환합니다."""
+        with self._cond:
+            n = len(self._items)
+            self._items.clear()
+            return n
+
+    def qsize(self):
+        return len(self._items)
+
+
+class ReorderBuffer:
+    """합성이 끝난 순서와 상관없이 seq 순서대로만 out_q로 내보냅니다.
+    on_release(item)를 주면 out_q에 넣기 직전에 부릅니다. (재생 큐에 쌓인 오디오 길이 집계용)"""
+
+    def __init__(self, out_q, on_release=None):
+        self._out_q = out_q
+        self._on_release = on_release
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._next = 0
+
+    @property
+    def next_seq(self):
+        return self._next
+
+    def put(self, seq, item):
+        """item이 None이면(합성 실패/빈 오디오) 순번만 넘깁니다. reset() 이전 순번의 늦은 결과는 버립니다."""
+        with self._lock:
+            if seq < self._next: return
+            self._pending[seq] = item
+            while self._next in self._pending:
+                ready = self._pending.pop(self._next)
+                self._next += 1
+                if ready is None: continue
+                if self._on_release: self._on_release(ready)
+                self._out_q.put(ready)
+
+    def reset(self, next_seq):
+        with self._lock:
+            self._pending.clear()
+            self._next = max(self._next, next_seq)
+
+
+def _clamped(value, bounds, default):
+    if value is None: return default
+    try:
+        return min(max(float(value), bounds[0]), bounds[1])
+    except (TypeError, ValueError):
+        return default
+
+
+def apply_gain(audio_int16, gain):
+    """캐시된 int16 오디오에 게인을 적용한 새 배열 (캐시 항목은 그대로 둠). 1.0이면 복사 없이 그대로"""
+    if gain == 1.0: return audio_int16
+    out = np.asarray(audio_int16, dtype=np.float32) * gain
+    np.clip(out, -32768, 32767, out=out)
+    return out.astype(np.int16)
+
+
+class Voice:
+    """언어 하나의 합성 엔진과 캐시 묶음 (호스트가 언어별로 한 번만 만들어 모든 파이프라인이 공유)"""
+
+    def __init__(self, profile, engine, spk_id, cache, disk_cache=None):
+        self.profile, self.engine, self.spk_id, self.cache, self.disk_cache = profile, engine, spk_id, cache, disk_cache
+        self.language = profile["language"]
+        self.sample_rate = engine.sample_rate
+        self.speakers = getattr(engine, "speakers", {})
+        self.rtf = None # 세그먼트 합성 RTF 이동 평균 (split_chunks가 이후 세그먼트 길이를 정할 때 사용)
+        self.sec_per_char = None # 글자당 오디오 길이 이동 평균 (배치 지연 한도를 글자 수로 바꿀 때 사용)
+
+    def resolve(self, opts):
+        """요청 옵션 {speed, gain, speaker}를 (spk_id, speed, gain)으로 바꿉니다. 없거나 잘못된 값은 프로필 기본값"""
+        spk_id, speed, gain = self.spk_id, self.profile["speed"], self.profile["gain"]
+        if not opts: return spk_id, speed, gain
+        speaker = opts.get("speaker")
+        if speaker is not None:
+            name = str(speaker).upper().replace('_', '-')
+            if name in self.speakers: spk_id = self.speakers[name]
+            elif name.isdigit() and int(name) in self.speakers.values(): spk_id = int(name)
+            else: log.warn(f"VOICE-{self.language}", "Unknown speaker '%s'. Available: %s", speaker, ", ".join(self.speakers))
+        speed = _clamped(opts.get("speed"), SPEED_RANGE, speed)
+        gain = _clamped(opts.get("gain"), GAIN_RANGE, gain)
+        return spk_id, speed, gain
+
+    def observe_rtf(self, synth_sec, audio_samples):
+        if audio_samples <= 0: return
+        rtf = synth_sec / (audio_samples / self.sample_rate)
+        self.rtf = rtf if self.rtf is None else self.rtf + RTF_EMA_ALPHA * (rtf - self.rtf)
+
+    def observe_audio(self, chars, audio_samples):
+        if chars <= 0 or audio_samples <= 0: return
+        spc = audio_samples / self.sample_rate / chars
+        self.sec_per_char = spc if self.sec_per_char is None else self.sec_per_char + RTF_EMA_ALPHA * (spc - self.sec_per_char)
+
+
+class TtsPipeline:
+    """파이프 하나에 대한 수신/합성/재생 스레드 묶음. profile의 언어가 이 파이프의 기본 언어입니다."""
+
+    def __init__(self, profile, n_synth_workers=2):
+        self.profile = profile
+        self.name = profile["language"]
+        self.n_synth_workers = n_synth_workers
+        self.voices = {}
+        self.loading = set() # 호스트가 아직 로딩 중인 언어. 이 언어 세그먼트는 로딩이 끝날 때까지 _deferred에 보관
+        self._deferred = {}  # 언어 -> 로딩을 기다리는 작업 목록
+        self._deferred_lock = threading.Lock()
+        self.job_q, self.play_q = JobQueue(), queue.Queue()
+        self.stop_evt, self.interrupt_evt = threading.Event(), threading.Event()
+        self.reorder = ReorderBuffer(self.play_q, self._on_release)
+        self._seq_lock = threading.Lock()
+        self._next_seq = 0
+        self._chars = {} # seq -> 세그먼트 글자 수 (배치 지연 한도 계산용, 재생 순번이 지나면 정리)
+        self.generation = 0 # stop마다 1씩 증가. 작업/결과/재생 항목의 세대가 이 값과 다르면 버림
+        # stop 지연 측정: 소리가 멈추기까지 / 이전 세대 합성이 모두 끝나기까지, 취소/버린 세그먼트 수, 취소된 합성이 쓴 CPU
+        self._stop_lock = threading.Lock()
+        self._stop_t = self._release_t = None
+        self._busy = [None] * n_synth_workers # 합성 워커별 합성 중인 세그먼트의 세대
+        self._stop_latency = {"silence": LatencyStats(), "release": LatencyStats()}
+        self._stop_counts = {"stops": 0, "cancelled": 0, "skipped": 0, "dropped": 0, "stale_cpu_ms": 0.0}
+        self.metrics = MetricsStore()
+        self._playing = [] # 재생을 시작했고 DONE을 기다리는 발화 추적 (재생 워커 전용)
+        self._play_end = 0.0 # 출력에 넘긴 오디오가 모두 재생되는 예상 시각 (재생 워커가 쓰고 배치 지연 한도 계산에서 읽음)
+        self._queued_lock = threading.Lock()
+        self._queued_sec = 0.0 # 재생 큐에 있는 현재 세대 오디오 길이 (ReorderBuffer가 넘길 때 더하고 재생 워커가 출력에 넘길 때 뺌)
+        self._traffic_lock = threading.Lock()
+        self.output = None
+        self.ready = False # 기본 언어 모델 로딩/워밍업이 끝나 바로 합성할 수 있는 상태
+        self.threads = []
+        # START/DONE/READY 신호는 transport.send()로 연결된 모든 클라이언트에 바로 나감
+        self.transport = open_server(profile["pipe_name"], self.handle_line, name=f"PIPE-{self.name}",
+                                    instances=PIPE_INSTANCES, on_connect=self._on_connect)
+
+    # --- 세그먼트 분배 ---
+    def submit(self, text, lang=None, opts=None, trace=None):
+        """발화를 세그먼트로 나눠 순번을 붙여 job_q에 넣습니다. (모델 로딩 전에도 호출 가능)
+        opts: 요청의 음성 옵션 {speed, gain, speaker} (합성 워커에서 Voice.resolve로 해석)
+        trace: 파이프 수신 시각부터 잰 발화 추적 (없으면 지금부터)"""
+        lang = LANG_ALIASES.get(str(lang).upper(), str(lang).upper()) if lang else self.profile["language"]
+        if lang not in PROFILES:
+            log.warn(f"PIPE-{self.name}", "Unknown lang '%s'. Using %s.", lang, self.profile["language"])
+            lang = self.profile["language"]
+        segs = split_chunks(text, lang)
+        voice = self.voices.get(lang)
+        if voice is not None and voice.rtf is not None and not self._batching(voice):
+            # 기본 분할 결과가 모두 캐시(팩/고정 문구 포함)에 있으면 그대로 쓰고, 아니면 측정된 RTF로 다시 나눔
+            # (배치 합성을 쓰면 기본 분할 그대로: RTF 분할은 세그먼트를 재생 여유만큼 늘려 배치할 여유가 남지 않음)
+            spk_id, speed, _ = voice.resolve(opts)
+            if not all(voice.cache.contains(cache_key(seg, spk_id, speed)) for seg in segs):
+                segs = split_chunks(text, lang, voice.rtf, self.n_synth_workers)
+        trace = trace or UtteranceTrace(chars=len(text))
+        trace.segments = len(segs)
+        self.metrics.incr("utterances")
+        self.metrics.incr("segments", len(segs))
+        t_enq = time.perf_counter()
+        trace.mark("split", t_enq)
+        with self._seq_lock:
+            for seq in [s for s in self._chars if s < self.reorder.next_seq]: del self._chars[seq]
+            for seg in segs:
+                self._chars[self._next_seq] = len(seg)
+                self.job_q.put((self._next_seq, self.generation, lang, seg, opts, trace, t_enq))
+                self._next_seq += 1
+
+    def interrupt(self):
+        """세대를 올려 대기 중인 세그먼트를 버리고, 이미 합성 중인 세그먼트는 다음 모델 단계 전에 멈추게 합니다."""
+        with self._seq_lock:
+            self.generation += 1
+            skipped = self.job_q.clear()
+            self.reorder.reset(self._next_seq)
+            self._play_end = 0.0
+            with self._queued_lock: self._queued_sec = 0.0
+        with self._stop_lock:
+            self._stop_t = self._release_t = time.perf_counter()
+            self._stop_counts["stops"] += 1
+            self._stop_counts["skipped"] += skipped
+        self.interrupt_evt.set()
+        self._check_release()
+
+    def _check_release(self):
+        """stop 이후 이전 세대를 합성하던 워커가 모두 손을 뗐으면 release 지연을 기록합니다."""
+        with self._stop_lock:
+            if self._release_t is None or any(g is not None and g != self.generation for g in self._busy): return
+            sec, self._release_t = time.perf_counter() - self._release_t, None
+        self._stop_latency["release"].add(sec)
+        log.info(f"STOP-{self.name}", "Synth CPU released %.0fms after stop", sec * 1000)
+
+    def _silenced(self):
+        """재생 워커가 stop을 처리해 출력을 멈춘 직후 호출 (silence 지연 기록)"""
+        with self._stop_lock:
+            if self._stop_t is None: return
+            sec, self._stop_t = time.perf_counter() - self._stop_t, None
+        self._stop_latency["silence"].add(sec)
+        log.info(f"STOP-{self.name}", "Silent %.0fms after stop", sec * 1000)
+
+    def _drop_stale(self, backlog):
+        """재생 큐에서 이전 세대 항목을 버리고 현재 세대 항목은 순서대로 backlog에 옮깁니다. (재생 워커 전용)"""
+        while True:
+            try: backlog.append(self.play_q.get_nowait())
+            except queue.Empty: break
+        kept = [item for item in backlog if item[2] is None or item[0] == self.generation] # audio None: 종료 신호
+        dropped = len(backlog) - len(kept)
+        backlog.clear()
+        backlog.extend(kept)
+        with self._stop_lock: self._stop_counts["dropped"] += dropped
+
+    def stop_stats(self):
+        with self._stop_lock: counts = dict(self._stop_counts, stale_cpu_ms=round(self._stop_counts["stale_cpu_ms"], 1))
+        return dict(counts, **{k: v.summary() for k, v in self._stop_latency.items()})
+
+    # --- 지표/발화 추적 ---
+    def _observe(self, trace, name, ms):
+        self.metrics.observe(name, ms)
+        trace.add(name, ms)
+
+    def _on_play(self, meta, t_audible, sec):
+        """세그먼트를 출력에 넘긴 직후 (재생 워커). t_audible: 실제로 소리가 나기 시작할 예상 시각, sec: 세그먼트 길이"""
+        trace, t_ready = meta
+        self._play_end = max(self._play_end, time.perf_counter()) + sec / self._play_rate()
+        with self._queued_lock: self._queued_sec = max(0.0, self._queued_sec - sec)
+        self.metrics.observe("play_q_wait_ms", (time.perf_counter() - t_ready) * 1000)
+        ttfa = trace.mark("first_audio", t_audible)
+        if ttfa is not None:
+            self.metrics.observe("ttfa_ms", ttfa)
+            self._playing.append(trace)
+
+    def _on_done(self, stopped=False):
+        """DONE 전송(또는 stop) 시 재생 중이던 발화 추적을 닫고 타임라인을 출력합니다. (재생 워커)"""
+        for trace in self._playing:
+            total = trace.mark("stopped" if stopped else "done")
+            if stopped:
+                self.metrics.incr("utterances_stopped")
+            else:
+                self.metrics.observe("utterance_ms", total)
+                self.metrics.incr("utterances_done")
+            log.info(f"TRACE-{self.name}", "utterance", **trace.timeline()) # 필드는 쓰기 스레드에서 문자열/JSON으로
+        self._playing.clear()
+
+    def metrics_snapshot(self, windows=None):
+        """{"command": "metrics"} 응답 내용: 지표 + stop 통계 + 파이프 송신 지연 + 로그 통계 + 언어별 오디오 캐시"""
+        snapshot = self.metrics.snapshot(windows)
+        snapshot.update(pipeline=self.name, stop=self.stop_stats(), pipe=self.transport.stats(), log=log.stats(),
+                        cache={lang: voice.cache.stats() for lang, voice in self.voices.items()})
+        return snapshot
+
+    def _play_rate(self):
+        """재생 배속 (널 출력은 MELO_TTS_NULL_OUTPUT_SPEED, 그 밖에는 1.0)"""
+        return getattr(self.output, "null_speed", None) or 1.0
+
+    def _on_release(self, item):
+        """ReorderBuffer가 세그먼트를 재생 큐에 넘길 때 (합성 워커 스레드)"""
+        gen, sr, audio = item[:3]
+        with self._queued_lock:
+            if gen == self.generation: self._queued_sec += audio.size / sr
+
+    def _audio_ahead_sec(self):
+        """지금부터 재생이 끝날 때까지 남은 시간(초): 재생 중/출력 버퍼 오디오 + 재생 큐의 현재 세대 오디오"""
+        return max(0.0, self._play_end - time.perf_counter()) + self._queued_sec / self._play_rate()
+
+    def _drained(self):
+        """받은 세그먼트가 모두 재생 큐를 빠져나갔는지 (DONE 신호 판단용)"""
+        return self.play_q.empty() and self.reorder.next_seq >= self._next_seq
+
+    # --- 스레드 시작/종료 ---
+    def start_pipe(self):
+        self.transport.start()
+
+    def start_workers(self, voices):
+        """voices: {언어: Voice}. 출력 스트림은 이 파이프 기본 언어의 샘플레이트로 엽니다."""
+        self.voices = voices
+        target_sr = voices[self.profile["language"]].sample_rate
+        if AUDIO_OUTPUT in ('stream', 'null') and StreamingOutput is not None:
+            try:
+                self.output = StreamingOutput(target_sr, AUDIO_DEVICE, null_speed=NULL_OUTPUT_SPEED if AUDIO_OUTPUT == 'null' else None)
+                log.info(f"PLAY-{self.name}", "%s output opened (sr=%d, block=%d, latency=%.0fms)", "Null" if AUDIO_OUTPUT == 'null' else "Streaming",
+                         target_sr, self.output.blocksize, self.output.latency_samples / target_sr * 1000)
+            except Exception as e:
+                log.warn(f"PLAY-{self.name}", "Failed to open output stream, using simpleaudio: %s", e)
+        if self.output is None and sa is None and StreamingOutput is not None:
+            log.warn(f"PLAY-{self.name}", "simpleaudio unavailable. Playing to null output (no sound).")
+            self.output = StreamingOutput(target_sr, null_speed=NULL_OUTPUT_SPEED)
+        self._spawn(self.stream_play_worker if self.output else self.play_worker)
+        for wid in range(self.n_synth_workers):
+            self._spawn(self.synth_worker, wid)
+        self.ready = True
+        self.transport.send(b"READY\n")
+
+    def voice_loaded(self, language):
+        """호스트가 voices[language]를 넣은 뒤 호출. 그 언어를 기다리던 세그먼트를 다시 job_q에 넣습니다."""
+        with self._deferred_lock:
+            self.loading.discard(language)
+            jobs = self._deferred.pop(language, [])
+        if jobs: log.info(f"PIPE-{self.name}", "%s loaded. Resuming %d held segment(s).", language, len(jobs))
+        for job in jobs: self.job_q.put(job)
+
+    def _voice_or_defer(self, job):
+        """작업 언어의 Voice. 아직 로딩 중인 언어면 작업을 보관하고 None (voice_loaded에서 다시 큐에 넣음)"""
+        lang = job[2]
+        with self._deferred_lock:
+            voice = self.voices.get(lang)
+            if voice is None and lang in self.loading:
+                self._deferred.setdefault(lang, []).append(job)
+                self.metrics.incr("deferred_segments")
+                log.debug(f"PIPE-{self.name}", "Language %s is still loading. Holding segment #%d.", lang, job[0])
+                return None
+        if voice is None: # 이 호스트가 로딩하지 않는 언어 -> 순번만 넘김
+            log.error(f"PIPE-{self.name}", "Language %s is not loaded in this host.", lang)
+            self.reorder.put(job[0], None)
+        return voice
+
+    def _spawn(self, target, *args):
+        th = threading.Thread(target=target, args=args, daemon=True)
+        th.start()
+        self.threads.append(th)
+
+    def all_alive(self):
+        return self.transport.alive() and all(t.is_alive() for t in self.threads)
+
+    def shutdown(self):
+        self.stop_evt.set()
+        for _ in range(self.n_synth_workers): self.job_q.put(None)
+        self.play_q.put((self.generation, 0, None, 1.0, None))
+        self.transport.close()
+        for th in self.threads: th.join(timeout=2.0)
+
+    # --- 스레드 워커 함수들 ---
+    def _save_to_disk(self, disk_cache, key, sr, audio):
+        """디스크 쓰기(fsync)는 재생 순서에 영향이 없도록 결과를 넘긴 뒤 캐시의 쓰기 스레드에서 처리"""
+        if not disk_cache.put_later(key, sr, audio) and log.sampled(f"disk-{self.name}", 100):
+            log.warn(f"SYNTH-{self.name}", "Disk cache write queue full. Dropped %d write(s) so far.", disk_cache.write_dropped)
+
+    def synth_segment(self, wid, voice, seg, spk_id, speed, cancel=None, timings=None):
+        """세그먼트 1개를 캐시(메모리 -> 팩 -> 디스크) 또는 합성으로 얻어 (sr, int16)을 반환합니다. 실패/취소 시 None
+        timings(dict)를 주면 단계별 ms와 "cache"(hit | disk | shared | miss), 합성했으면 "rtf"를 채웁니다."""
+        key = cache_key(seg, spk_id, speed)
+        disk_cache = voice.disk_cache
+        sr = voice.sample_rate
+        synthesized = None
+
+        def load_or_synth():
+            # 메모리 캐시 MISS 시 디스크 캐시 -> 실제 합성 순으로 시도 (같은 키는 한 스레드만 실행)
+            nonlocal synthesized
+            if disk_cache:
+                hit = disk_cache.get(key)
+                if hit: return hit
+            log.debug(f"SYNTH-{self.name}-{wid}", "Cache MISS «%s». Synthesizing...", seg)
+            t0 = time.perf_counter()
+            audio_int16 = voice.engine.synthesize(seg, spk_id, speed, cancel, timings)
+            if audio_int16 is None: return None
+            voice.observe_rtf(time.perf_counter() - t0, audio_int16.size)
+            if timings is not None: timings["rtf"] = (time.perf_counter() - t0) / (audio_int16.size / sr)
+            synthesized = audio_int16
+            return (sr, audio_int16) # simpleaudio는 버퍼 프로토콜 객체를 바로 재생하므로 tobytes() 복사 불필요
+
+        for attempt in range(2):
+            try:
+                audio_data_tuple, source = voice.cache.get_or_create(key, load_or_synth)
+            except SynthCancelled:
+                log.debug(f"SYNTH-{self.name}-{wid}", "Cancelled «%s»", seg)
+                log.count(f"SYNTH-{self.name}", "cancelled")
+                return None
+            except Exception:
+                log.error(f"SYNTH-{self.name}-{wid}", "Synth failed for «%s»:\n%s", seg, traceback.format_exc())
+                return None
+            # 같은 키를 먼저 합성하던 스레드가 stop으로 취소됨 -> 이 세그먼트가 아직 유효하면 직접 한 번 더
+            if audio_data_tuple is not None or source != "wait" or (cancel and cancel()): break
+        if audio_data_tuple is None: return None
+        origin = "miss" if synthesized is not None else {"hit": "hit", "miss": "disk"}.get(source, "shared")
+        if timings is not None: timings["cache"] = origin
+        log.count(f"SYNTH-{self.name}", f"cache_{origin}") # 세그먼트마다 줄을 쓰지 않고 AGGREGATE_SEC마다 합쳐서
+        if synthesized is None:
+            log.debug(f"SYNTH-{self.name}-{wid}", "Cache %s «%s»", {"hit": "HIT", "disk": "DISK HIT"}.get(origin, "SHARED"), seg)
+        elif disk_cache:
+            self._save_to_disk(disk_cache, key, sr, synthesized)
+        return audio_data_tuple
+
+    def synth_batch(self, wid, voice, segs, spk_ids, speed, cancel=None, timings=None):
+        """세그먼트 여러 개(같은 속도)를 디스크 캐시 또는 엔진 배치 합성 한 번으로 얻어 세그먼트별 (sr, int16) 목록을 반환합니다. 실패/취소 시 None
+        메모리 캐시 single-flight에서 예약(try_claim)한 키만 배치에 넣고, 이미 캐시에 있거나 다른 워커가 만드는 중인 세그먼트는
+        배치가 끝난 뒤 synth_segment로 (적중 또는 그 결과를 기다려) 얻습니다. timings: 세그먼트별 dict 목록"""
+        sr, cache, disk_cache = voice.sample_rate, voice.cache, voice.disk_cache
+        keys = [cache_key(seg, spk, speed) for seg, spk in zip(segs, spk_ids)]
+        claimed = [cache.try_claim(key) for key in keys]
+        results, pending = [None] * len(segs), {i for i, c in enumerate(claimed) if c} # pending: 예약했지만 아직 fulfil 안 한 세그먼트
+        try:
+            todo = []
+            for i in sorted(pending):
+                hit = disk_cache.get(keys[i]) if disk_cache else None
+                if not hit: todo.append(i); continue
+                cache.fulfil(keys[i], hit)
+                pending.discard(i)
+                results[i], timings[i]["cache"] = hit, "disk"
+            if todo:
+                log.debug(f"SYNTH-{self.name}-{wid}", "Cache MISS x%d %s. Synthesizing batch...", len(todo), [segs[i] for i in todo])
+                t0 = time.perf_counter()
+                audio = voice.engine.synthesize_batch([(segs[i], spk_ids[i]) for i in todo], speed, cancel, [timings[i] for i in todo])
+                elapsed = time.perf_counter() - t0
+                samples = sum(a.size for a in audio if a is not None)
+                voice.observe_rtf(elapsed, samples) # 배치 처리량 기준 (세그먼트 분할이 배치 효과를 반영하도록)
+                for i, a in zip(todo, audio):
+                    value = (sr, a) if a is not None else None
+                    cache.fulfil(keys[i], value)
+                    pending.discard(i)
+                    if value is None: continue
+                    results[i] = value
+                    timings[i].update(cache="miss", rtf=elapsed / (samples / sr))
+                    if disk_cache: self._save_to_disk(disk_cache, keys[i], sr, a)
+        except SynthCancelled:
+            log.debug(f"SYNTH-{self.name}-{wid}", "Cancelled batch of %d", len(segs))
+            log.count(f"SYNTH-{self.name}", "cancelled", len(segs))
+            return [None] * len(segs)
+        except Exception:
+            log.error(f"SYNTH-{self.name}-{wid}", "Batch synth failed for %s:\n%s", segs, traceback.format_exc())
+            return [None] * len(segs)
+        finally:
+            for i in pending: cache.fulfil(keys[i], None) # 예약한 키를 기다리는 워커가 직접 합성하도록 풀어 줌
+        for i, claim in enumerate(claimed):
+            if claim:
+                if "cache" in timings[i]: log.count(f"SYNTH-{self.name}", f"cache_{timings[i]['cache']}")
+            elif not (cancel and cancel()):
+                results[i] = self.synth_segment(wid, voice, segs[i], spk_ids[i], speed, cancel, timings[i])
+        return results
+
+    def _batching(self, voice):
+        return BATCH_MAX > 1 and hasattr(voice.engine, "synthesize_batch")
+
+    def _gather_batch(self, job, voice, spk_id, speed, gain):
+        """job과 함께 합성할 세그먼트를 job_q 앞쪽에서 꺼냅니다. 반환: [(job, spk_id, gain)] (첫 항목은 job)
+        배치 합성 시간(RTF 기준 추정)이 job 앞에 재생될 오디오(출력/재생 큐에 있는 오디오 + 앞 순번 세그먼트의 예상 길이)의
+        SAFETY 비율 안에 들 때만 묶습니다. 재생 중인 오디오가 없으면 첫 세그먼트는 항상 혼자 합성합니다."""
+        seq, gen, lang, seg, opts = job[:5]
+        batch = [(job, spk_id, gain)]
+        if not self._batching(voice) or voice.sec_per_char is None: return batch
+        if voice.cache.contains(cache_key(seg, spk_id, speed)): return batch
+        next_seq = self.reorder.next_seq
+        with self._seq_lock: chars_ahead = sum(self._chars.get(s, 0) for s in range(next_seq, seq))
+        ahead_sec = self._audio_ahead_sec() + voice.sec_per_char * chars_ahead
+        budget = SAFETY * ahead_sec / ((voice.rtf or DEFAULT_RTF) * voice.sec_per_char) # 배치 전체 글자 수 한도
+        if len(seg) >= budget: return batch
+        candidates = self.job_q.peek(BATCH_MAX - 1) # 음성 옵션 해석/캐시 확인은 큐 잠금 밖에서 (resolve가 로그를 남길 수 있음)
+        chars, picked = len(seg), []
+        for nxt in candidates:
+            if nxt is None or nxt[1] != gen or nxt[2] != lang or chars + len(nxt[3]) > budget: break
+            nxt_spk, nxt_speed, nxt_gain = (spk_id, speed, gain) if nxt[4] == opts else voice.resolve(nxt[4])
+            if nxt_speed != speed or voice.cache.contains(cache_key(nxt[3], nxt_spk, nxt_speed)): break
+            picked.append((nxt, nxt_spk, nxt_gain))
+            chars += len(nxt[3])
+        if not picked: return batch
+        taken = self.job_q.take_front([item[0] for item in picked]) # 그 사이 다른 워커가 꺼내 갔으면 앞에 남은 만큼만
+        return batch + picked[:len(taken)]
+
+    def _finish(self, voice, job, result, timings, t_start, gain):
+        """합성 결과의 단계별 지표/추적을 남기고 순번과 함께 ReorderBuffer에 넣습니다."""
+        seq, gen, trace = job[0], job[1], job[5]
+        if result: voice.observe_audio(len(job[3]), result[1].size)
+        for stage in ("frontend_ms", "acoustic_ms", "post_ms"):
+            if stage in timings: self._observe(trace, stage, timings[stage])
+        if "rtf" in timings: self.metrics.observe("rtf", timings["rtf"])
+        if "cache" in timings:
+            self.metrics.incr(f"cache_{timings['cache']}")
+            trace.count_cache(timings["cache"])
+        t_ready = time.perf_counter()
+        self._observe(trace, "segment_ms", (t_ready - t_start) * 1000)
+        self.reorder.put(seq, (gen,) + result + (gain, (trace, t_ready)) if result else None)
+
+    def synth_worker(self, wid):
+        """job_q에서 세그먼트를 받아(BATCH_MAX > 1이면 뒤따르는 세그먼트와 묶어) 합성하고 결과를 순번과 함께 ReorderBuffer에 넣는 워커"""
+        log.info(f"SYNTH-{self.name}-{wid}", "Worker started.")
+        while not self.stop_evt.is_set():
+            try:
+                job = self.job_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if job is None: break
+            seq, gen, lang, seg, opts, trace, t_enq = job
+            self._busy[wid] = gen # 세대 확인 전에 표시 (확인 직후 stop이 와도 release 판단에서 빠지지 않도록)
+            if gen != self.generation or seq < self.reorder.next_seq: # 이미 중단(stop)된 발화의 세그먼트
+                self._busy[wid] = None
+                with self._stop_lock: self._stop_counts["skipped"] += 1
+                self._check_release()
+                continue
+            voice = self._voice_or_defer(job)
+            if voice is None:
+                self._busy[wid] = None
+                continue
+            spk_id, speed, gain = voice.resolve(opts)
+            batch = self._gather_batch(job, voice, spk_id, speed, gain)
+            cancel = lambda: self.generation != gen or self.stop_evt.is_set()
+            t_cpu, t_start = time.thread_time(), time.perf_counter()
+            for item, _, _ in batch:
+                item[5].mark("synth_start", t_start)
+                self._observe(item[5], "in_q_wait_ms", (t_start - item[6]) * 1000)
+            if BATCH_MAX > 1: self.metrics.observe("batch_size", len(batch))
+            timings = [{} for _ in batch]
+            try:
+                if len(batch) == 1:
+                    results = [self.synth_segment(wid, voice, seg, spk_id, speed, cancel, timings[0])]
+                else:
+                    results = self.synth_batch(wid, voice, [item[3] for item, _, _ in batch], [spk for _, spk, _ in batch], speed, cancel, timings)
+            finally:
+                self._busy[wid] = None
+            if cancel(): # stop 이후에 끝난 합성 (중간에 멈췄거나 마지막 단계였음)
+                with self._stop_lock:
+                    self._stop_counts["cancelled"] += len(batch)
+                    self._stop_counts["stale_cpu_ms"] += (time.thread_time() - t_cpu) * 1000
+                self._check_release()
+                continue
+            for (item, _, item_gain), result, item_timings in zip(batch, results, timings):
+                self._finish(voice, item, result, item_timings, t_start, item_gain)
+        log.info(f"SYNTH-{self.name}-{wid}", "Worker stopped.")
+
+    def play_worker(self):
+        """play_q에서 오디오 데이터를 받아 재생하고 main.js로 신호를 보내는 워커"""
+        play_q, stop_evt, interrupt_evt, send = self.play_q, self.stop_evt, self.interrupt_evt, self.transport.send
+        log.info(f"PLAY-{self.name}", "Worker started.")
+        done_signal_sent = True
+        start_signal_sent = False
+        handled_gen = self.generation
+        backlog = collections.deque() # stop 처리 때 재생 큐에서 걸러낸 현재 세대 항목
+        while not stop_evt.is_set():
+            if handled_gen != self.generation: # stop (그 사이 새 발화가 와서 interrupt_evt가 풀렸어도 처리)
+                handled_gen = self.generation
+                sa.stop_all()
+                self._drop_stale(backlog)
+                if not done_signal_sent:
+                    send(b"DONE\n")
+                done_signal_sent, start_signal_sent = True, False
+                self._silenced()
+                self._on_done(stopped=True)
+                log.debug(f"PLAY-{self.name}", "Interrupt handled.")
+            if interrupt_evt.is_set():
+                time.sleep(0.02)
+                continue
+            try:
+                gen, sr, audio_bytes, gain, meta = backlog.popleft() if backlog else play_q.get(timeout=0.05)
+                if audio_bytes is None: break
+                if gen == self.generation:
+                    audio_bytes = apply_gain(audio_bytes, gain)
+                    done_signal_sent = False
+                    if not start_signal_sent:
+                        send(b"START\n")
+                        start_signal_sent = True
+                    play_obj = sa.play_buffer(audio_bytes, 1, 2, sr)
+                    self._on_play(meta, time.perf_counter(), len(audio_bytes) / sr)
+                    while play_obj.is_playing():
+                        if self.generation != gen:
+                            sa.stop_all()
+                            break
+                        time.sleep(0.01)
+            except queue.Empty:
+                pass
+            # 다음 세그먼트가 아직 합성 중이면 DONE을 보내지 않고 기다림
+            if not done_signal_sent and handled_gen == self.generation and not interrupt_evt.is_set() and not backlog and self._drained():
+                send(b"DONE\n")
+                done_signal_sent, start_signal_sent = True, False
+                self._on_done()
+        sa.stop_all()
+        log.info(f"PLAY-{self.name}", "Worker stopped.")
+
+    def stream_play_worker(self):
+        """play_q의 세그먼트를 연속 출력 스트림에 이어 붙이고, 실제 재생 위치 기준으로 START/DONE을 보내는 워커"""
+        play_q, stop_evt, interrupt_evt, send = self.play_q, self.stop_evt, self.interrupt_evt, self.transport.send
+        out = self.output
+        log.info(f"PLAY-{self.name}", "Worker started (stream).")
+        active = False          # 재생할 세그먼트를 받은 뒤 DONE을 보내기 전까지
+        start_sent = False
+        start_pos = done_pos = None # 재생 위치가 이 값을 지나면 START / DONE
+        handled_gen = self.generation
+        backlog = collections.deque() # stop 처리 때 재생 큐에서 걸러낸 현재 세대 항목
+
+        def tick():
+            nonlocal start_pos, start_sent
+            if start_pos is not None and out.played_pos() > start_pos:
+                send(b"START\n")
+                start_pos, start_sent = None, True
+            return handled_gen != self.generation or stop_evt.is_set()
+
+        while not stop_evt.is_set():
+            if handled_gen != self.generation: # stop (그 사이 새 발화가 와서 interrupt_evt가 풀렸어도 처리)
+                handled_gen = self.generation
+                out.flush()
+                self._drop_stale(backlog)
+                if active and start_sent:
+                    send(b"DONE\n")
+                active, start_sent, start_pos, done_pos = False, False, None, None
+                self._silenced()
+                self._on_done(stopped=True)
+                log.debug(f"PLAY-{self.name}", "Interrupt handled.")
+            if interrupt_evt.is_set():
+                time.sleep(0.02)
+                continue
+            try:
+                gen, sr, audio, gain, meta = backlog.popleft() if backlog else play_q.get(timeout=out.blocksize / out.samplerate)
+                if audio is None: break
+                if gen == self.generation:
+                    if sr != out.samplerate: # 이 파이프 기본 언어와 SR이 다른 언어를 요청한 경우
+                        log.warn(f"PLAY-{self.name}", "Sample rate changed %d -> %d. Reopening stream.", out.samplerate, sr)
+                        out.close()
+                        self.output = out = StreamingOutput(sr, AUDIO_DEVICE, null_speed=out.null_speed)
+                    if not active:
+                        active, start_pos = True, out.queued_pos()
+                    done_pos = None
+                    self._on_play(meta, time.perf_counter() + out.buffered_sec(), len(audio) / sr) # 앞서 쌓인 오디오가 끝난 뒤 들림
+                    out.write_segment(apply_gain(audio, gain), tick)
+            except queue.Empty:
+                # 다음 세그먼트가 없거나 버퍼가 바닥나기 직전이면 크로스페이드용으로 보류한 꼬리를 내보냄
+                if out.has_tail() and (self._drained() or out.buffered_sec() < 2.0 * out.blocksize / out.samplerate):
+                    out.release_tail()
+            if tick(): continue # 재생 중 stop -> 다음 반복에서 처리
+            if active and done_pos is None and not out.has_tail() and not backlog and self._drained():
+                done_pos = out.queued_pos()
+            if done_pos is not None and out.played_pos() >= done_pos and not interrupt_evt.is_set():
+                if start_sent: send(b"DONE\n")
+                active, start_sent, start_pos, done_pos = False, False, None, None
+                self._on_done()
+        out.close()
+        log.info(f"PLAY-{self.name}", "Worker stopped. (underflows=%d)", out.underflows)
+
+    # --- 파이프 수신 (pipe_transport 읽기 스레드에서 호출) ---
+    def _record(self, obj):
+        try:
+            with self._traffic_lock, open(TRAFFIC_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"t": round(time.time(), 3), "pipe": self.name, "request": obj}, ensure_ascii=False) + "\n")
+        except OSError as e:
+            if log.sampled(f"traffic-{self.name}", 100): log.warn(f"PIPE-{self.name}", "Failed to record traffic: %s", e)
+
+    def _on_connect(self, conn):
+        if self.ready: conn.send(b"READY\n") # 재연결한 클라이언트에도 준비 상태 알림
+
+    def handle_line(self, conn, line):
+        """클라이언트가 보낸 JSON 한 줄 처리"""
+        t_recv = time.perf_counter()
+        line = line.decode("utf-8", errors="ignore").strip()
+        if not line: return
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            if line == "/quit": self.stop_evt.set()
+            return
+        command = obj.get("command", "")
+        text = obj.get("text", "")
+        if TRAFFIC_LOG and command != "metrics": self._record(obj)
+        if command == "stop":
+            self.interrupt()
+        elif command == "quit":
+            self.stop_evt.set()
+        elif command == "metrics":
+            conn.send(metrics_reply(**self.metrics_snapshot(obj.get("windows"))))
+        elif text and text.strip():
+            if self.interrupt_evt.is_set(): self.interrupt_evt.clear()
+            opts = {k: obj[k] for k in ("speed", "gain", "speaker") if obj.get(k) is not None}
+            self.submit(text, obj.get("lang"), opts or None, UtteranceTrace(t_recv, len(text)))
+
+
+def warmup(engine, spk_id, profile):
+    """모델 로딩 후 자주 나오는 입력 길이들로 한 번씩 합성해 보는 무음 워밍업 (재생하지 않음). 소요 시간(초)을 반환합니다."""
+    t0 = time.perf_counter()
+    for text in profile.get("warmup_texts", (profile["warmup_text"],)):
+        try:
+            t = time.perf_counter()
+            audio_int16 = engine.synthesize(text, spk_id, profile["speed"])
+            n = 0 if audio_int16 is None else audio_int16.size
+            log.info(f"WARMUP-{profile['language']}", "%3d chars -> %5.2fs audio in %.2fs", len(text), n / engine.sample_rate, time.perf_counter() - t)
+        except Exception:
+            log.warn(f"WARMUP-{profile['language']}", "\n%s", traceback.format_exc())
+    return time.perf_counter() - t0
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+프로세스 풀 합성 엔진 (MELO_TTS_SYNTH_PROCS > 0 일 때 tts_host.py에서 사용)
+- 합성 프로세스마다 모델을 한 번만 로딩하고, 텍스트 전처리(MeCab/g2p, BERT)와 후처리를 GIL 밖에서 병렬로 돌립니다.
+- 오디오는 프로세스별 공유 메모리 슬랩(SharedMemory)으로 돌려받고, 파이프로는 길이 같은 작은 메시지만 주고받습니다.
+- tts_synth.LocalEngine과 같은 synthesize() 인터페이스이므로 재생/캐시/파이프 프로토콜은 그대로입니다.
+- 슬랩 앞 CTRL_BYTES는 제어 영역입니다. synthesize(cancel=...)의 cancel()이 True가 되면 부모가 첫 바이트를 1로 바꾸고,
+  자식은 모델 단계 사이마다 그 값을 확인해 합성을 멈춘 뒤 ('cancelled',)로 답합니다.
+
+자식 프로세스는 multiprocessing spawn 대신 이 파일을 직접 실행합니다.
+(spawn은 부모 워커 스크립트를 다시 임포트해 MeCab/NLTK 설정과 임시 폴더 생성이 자식에서도 실행되기 때문)
+"""
+
+import os, sys, time, queue, threading, subprocess
+import numpy as np
+from multiprocessing import shared_memory
+from multiprocessing.connection import Listener, Client
+
+# 자식 프로세스는 이 파일을 직접 실행하고, 임베디드 파이썬(._pth)은 스크립트 폴더를 sys.path에 넣지 않으므로 직접 추가
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from tts_synth import SynthCancelled
+
+SLAB_SEC = float(os.environ.get('MELO_TTS_SYNTH_SLAB_SEC', '60')) # 프로세스별 공유 메모리 크기 (오디오 초)
+START_TIMEOUT_SEC = 300
+CTRL_BYTES = 16           # 슬랩 앞 제어 영역 (0: 취소 플래그). 오디오는 그 뒤에 씀
+CANCEL_POLL_SEC = 0.01    # 결과를 기다리며 cancel()을 확인하는 간격
+
+
+def _attach_untracked(name):
+    """기존 공유 메모리에 연결. POSIX에서는 resource_tracker가 종료 시 남이 만든 공유 메모리를 지우지 않도록 등록 해제"""
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == 'posix':
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class _Proc:
+    def __init__(self, idx, popen, conn, slab, speaker_id, sample_rate, variant, speakers):
+        self.idx, self.popen, self.conn, self.slab = idx, popen, conn, slab
+        self.speaker_id, self.sample_rate, self.variant, self.speakers = speaker_id, sample_rate, variant, speakers
+
+
+class SynthProcessPool:
+    """합성 프로세스 N개. synthesize()는 유휴 프로세스 하나를 빌려 쓰고 돌려놓습니다. (스레드 여러 개에서 동시 호출 가능)"""
+
+    def __init__(self, profile, n_procs, env=None):
+        self.profile = profile
+        self.n_procs = n_procs
+        self._env = dict(os.environ, **(env or {}))
+        # 프로세스들이 torch 스레드를 나눠 쓰도록 (코어 수 초과 구독 방지)
+        self._env.setdefault('MELO_TTS_POOL_THREADS', str(int(os.environ.get('MELO_TTS_INTRA_THREADS', '0')) or max(1, (os.cpu_count() or 2) // n_procs)))
+        self._authkey = os.urandom(16)
+        self._listener = Listener(authkey=self._authkey)
+        self._idle = queue.Queue()
+        self._procs = []
+        self._closed = False
+        for idx in range(n_procs):
+            self._start_proc(idx)
+        first = self._procs[0]
+        self.speaker_id, self.sample_rate, self.variant, self.speakers = first.speaker_id, first.sample_rate, first.variant, first.speakers
+
+    def _start_proc(self, idx):
+        t0 = time.time()
+        env = dict(self._env, MELO_TTS_POOL_AUTHKEY=self._authkey.hex())
+        cmd = [sys.executable, os.path.abspath(__file__), self.profile["language"], str(self._listener.address), str(idx)]
+        popen = subprocess.Popen(cmd, env=env)
+        conn = self._listener.accept()
+        if not conn.poll(START_TIMEOUT_SEC):
+            popen.kill()
+            raise RuntimeError(f"Synth process {idx} did not become ready in {START_TIMEOUT_SEC}s")
+        msg = conn.recv()
+        if msg[0] != 'ready':
+            popen.kill()
+            raise RuntimeError(f"Synth process {idx} failed to start: {msg[1]}")
+        _, speaker_id, sample_rate, slab_name, variant, speakers = msg
+        proc = _Proc(idx, popen, conn, _attach_untracked(slab_name), speaker_id, sample_rate, variant, speakers)
+        self._procs.append(proc)
+        self._idle.put(proc)
+        print(f"[POOL] Synth process {idx} ready (pid={popen.pid}, {time.time() - t0:.1f}s)", flush=True)
+        return proc
+
+    def _restart_async(self, dead):
+        def run():
+            try:
+                dead.popen.kill()
+                dead.slab.close()
+            except Exception: pass
+            if dead in self._procs: self._procs.remove(dead)
+            if self._closed: return
+            try:
+                self._start_proc(dead.idx)
+            except Exception as e:
+                print(f"[POOL][ERR] Failed to restart synth process {dead.idx}: {e}", flush=True)
+        threading.Thread(target=run, daemon=True).start()
+
+    def synthesize(self, text, speaker_id, speed, cancel=None, timings=None):
+        proc = self._idle.get()
+        try:
+            proc.slab.buf[0] = 0
+            proc.conn.send(('synth', text, speaker_id, speed))
+            if cancel is not None:
+                while not proc.conn.poll(CANCEL_POLL_SEC):
+                    if proc.slab.buf[0] == 0 and cancel(): proc.slab.buf[0] = 1 # 자식이 다음 모델 단계 전에 멈춤
+            msg = proc.conn.recv()
+        except (EOFError, OSError) as e:
+            print(f"[POOL][ERR] Synth process {proc.idx} died: {e}. Restarting...", flush=True)
+            self._restart_async(proc)
+            raise RuntimeError(f"synth process {proc.idx} died") from e
+        if msg[0] != 'ok':
+            self._idle.put(proc)
+            if msg[0] == 'error': raise RuntimeError(msg[1])
+            if msg[0] == 'cancelled': raise SynthCancelled()
+            return None
+        _, n, overflow_name, child_timings = msg
+        if timings is not None: timings.update(child_timings)
+        try:
+            if overflow_name is None: # 슬랩은 다음 요청에 재사용되므로 복사해서 반환 (캐시 저장용 1회 복사)
+                return np.frombuffer(proc.slab.buf, dtype=np.int16, count=n, offset=CTRL_BYTES).copy()
+            shm = _attach_untracked(overflow_name) # 슬랩보다 긴 오디오 (자식이 다음 요청 때 해제)
+            try:
+                return np.frombuffer(shm.buf, dtype=np.int16, count=n).copy()
+            finally:
+                shm.close()
+        finally:
+            self._idle.put(proc)
+
+    def frontend_stats(self):
+        """프로세스별 텍스트 전처리 캐시 통계를 합산합니다. (유휴 프로세스를 하나씩 빌려 조회)"""
+        total = None
+        for _ in range(len(self._procs)):
+            proc = self._idle.get()
+            try:
+                proc.conn.send(('stats',))
+                stats = proc.conn.recv()[1]
+            except (EOFError, OSError):
+                stats = None
+            finally:
+                self._idle.put(proc)
+            if stats is None: continue
+            if total is None: total = dict.fromkeys(stats, 0)
+            for k, v in stats.items():
+                if k != "hit_rate": total[k] += v
+        if total:
+            lookups = total["hits"] + total["misses"] + total["waits"]
+            total["hit_rate"] = round((total["hits"] + total["waits"]) / lookups, 3) if lookups else 0.0
+        return total
+
+    def close(self):
+        self._closed = True
+        for proc in list(self._procs):
+            try:
+                proc.conn.send(None)
+                proc.popen.wait(timeout=5)
+            except Exception:
+                proc.popen.kill()
+            try: proc.slab.close()
+            except Exception: pass
+        self._listener.close()
+
+
+# --- 자식 프로세스 ---
+def _child_main(language, address, idx):
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+        sys.stderr.reconfigure(encoding="utf-8")
+    except Exception: pass
+    tag = f"[POOL-{idx}]"
+    conn = Client(address, authkey=bytes.fromhex(os.environ['MELO_TTS_POOL_AUTHKEY']))
+    slab = overflow = None
+    try:
+        import torch
+        from tts_profiles import PROFILES, pick_speaker_id
+        from tts_synth import (load_tts, synth_to_int16, new_frontend_cache, speaker_map, FAST_INFERENCE, quantize_int8, model_variant,
+                               configure_interop_threads)
+        torch.set_num_threads(int(os.environ.get('MELO_TTS_POOL_THREADS', '1')))
+        if FAST_INFERENCE: configure_interop_threads()
+        profile = PROFILES[language]
+        tmpdir = os.path.join(os.environ.get('LOCALAPPDATA', '.'), f"melo_tts_pool_{os.getpid()}")
+        os.makedirs(tmpdir, exist_ok=True)
+        tts = load_tts(profile, os.environ.get('MELO_TTS_RESOURCES'))
+        spk_id = pick_speaker_id(tts, profile)
+        variant = model_variant(quantize_int8(tts, profile) if FAST_INFERENCE else [])
+        sr = int(getattr(tts.hps.data, "sampling_rate", profile["default_sr"]))
+        frontend_cache = new_frontend_cache()
+        for text in profile.get("warmup_texts", (profile["warmup_text"],)): # 무음 워밍업
+            synth_to_int16(tts, text, spk_id, profile["speed"], tmpdir, sr, frontend_cache)
+        slab = shared_memory.SharedMemory(create=True, size=CTRL_BYTES + int(SLAB_SEC * sr) * 2)
+        cancel = lambda: slab.buf[0] != 0
+        conn.send(('ready', spk_id, sr, slab.name, variant, speaker_map(tts)))
+    except Exception as e:
+        conn.send(('error', repr(e)))
+        return
+
+    try:
+        while True:
+            try:
+                msg = conn.recv()
+            except EOFError:
+                break
+            if overflow is not None: # 부모가 이전 결과를 복사한 뒤이므로 해제
+                overflow.close(); overflow.unlink(); overflow = None
+            if msg is None: break
+            if msg[0] == 'stats':
+                conn.send(('stats', frontend_cache.stats() if frontend_cache else None))
+                continue
+            _, text, speaker_id, speed = msg
+            timings = {}
+            try:
+                audio = synth_to_int16(tts, text, speaker_id, speed, tmpdir, sr, frontend_cache, cancel, timings)
+            except SynthCancelled:
+                conn.send(('cancelled',))
+                continue
+            except Exception as e:
+                print(f"{tag}[ERR] Synth failed for «{text}»: {e}", flush=True)
+                conn.send(('error', repr(e)))
+                continue
+            if audio is None:
+                conn.send(('empty',))
+                continue
+            if audio.nbytes <= slab.size - CTRL_BYTES:
+                np.frombuffer(slab.buf, dtype=np.int16, count=audio.size, offset=CTRL_BYTES)[:] = audio
+                conn.send(('ok', audio.size, None, timings))
+            else:
+                overflow = shared_memory.SharedMemory(create=True, size=audio.nbytes)
+                np.frombuffer(overflow.buf, dtype=np.int16, count=audio.size)[:] = audio
+                conn.send(('ok', audio.size, overflow.name, timings))
+    finally:
+        if overflow is not None:
+            overflow.close(); overflow.unlink()
+        slab.close(); slab.unlink()
+        import shutil
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    _child_main(sys.argv[1], sys.argv[2], int(sys.argv[3]))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+언어별 TTS 설정 (tts_host.py / build_tts_pack.py 공용)
+- 기본 음성 파라미터(speed, gain)와 캐시 키에 들어가는 값을 워커와 캐시 팩 빌더가 같은 곳에서 읽도록 한 곳에 모아둡니다.
+"""
+
+from tts_text import normalize_text
+
+PROFILES = {
+    "KR": {
+        "language": "KR",
+        "pipe_name": r"\\.\pipe\melo_tts",
+        "speed": 1.3,
+        "gain": 1.0,
+        "speaker_tags": ("KR", "KO"),
+        "default_sr": 44100,
+        "warmup_text": "워밍업입니다.",
+        # 무음 워밍업용 문장들 (짧은 첫 세그먼트 ~ split_chunks 기본 길이까지 자주 나오는 입력 길이)
+        "warmup_texts": ("워밍업입니다.",
+                         "안녕하세요, 천안 관광 안내 키오스크입니다. 궁금한 곳을 말씀해 주세요.",
+                         "독립기념관은 겨레의 집을 중심으로 일곱 개의 전시관이 있으며, 관람 시간은 오전 아홉 시 반부터 오후 여섯 시까지입니다. 입장료는 무료입니다."),
+        "revision": None, # HF 허브 캐시에서 조회 (tts_cache.model_revision)
+        "packaged_model": None,
+    },
+    "EN": {
+        "language": "EN",
+        "pipe_name": r"\\.\pipe\melo_tts_en",
+        "speed": 1.2,
+        "gain": 1.8, # 영어 모델용 볼륨 조절
+        "speaker_tags": ("EN-US",),
+        "default_sr": 24000,
+        "warmup_text": "Warming up.",
+        "warmup_texts": ("Warming up.",
+                         "Hello, welcome to the Cheonan tour guide kiosk. Where would you like to go?",
+                         "The Independence Hall of Korea has seven exhibition halls around the Grand Hall of the Nation, and it is open from nine thirty in the morning to six in the evening. Admission is free."),
+        "revision": "bb4fb7346d566d277ba8c8c7dbfdf6786139b8ef", # 패키징된 melo-en-model 스냅샷 커밋
+        "packaged_model": "melo-en-model", # resourcesPath 아래 HF 스냅샷 폴더
+    },
+}
+
+
+def pick_speaker_id(tts, profile):
+    spk2id = getattr(tts.hps.data, "spk2id", {})
+    for k, v in spk2id.items():
+        if any(tag in str(k).upper() for tag in profile["speaker_tags"]): return int(v)
+    return int(next(iter(spk2id.values()), 0))
+
+
+def cache_key(seg, spk_id, speed):
+    """메모리/디스크/팩 캐시 공통 키. 모델 출력이 달라지는 값(텍스트, 화자, 속도)만 넣습니다.
+    게인은 재생 시 적용하므로 키에 없고, 텍스트는 정규화해서 공백/부호 표기만 다른 세그먼트는 같은 키가 됩니다."""
+    return f"{normalize_text(seg)}|{spk_id}|{float(speed)}"
@@ -0,0 +1,469 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 합성 공용 모듈 (tts_host.py / build_tts_pack.py 공용)
+- MeloTTS 모델 출력(float32)을 임시 WAV 파일 없이 NumPy 배열로 바로 받습니다.
+- tts.tts_to_file()과 같은 추론 단계를 거치되, 파일 쓰기/읽기/삭제와 int16 왕복 변환을 하지 않습니다.
+- 임시 WAV 경유 방식은 폴백으로만 남겨둡니다. (MELO_TTS_FILE_SYNTH=1 이면 항상 파일 방식)
+  메모리 합성은 MeloTTS 내부 함수(split_sentences_into_pieces, get_text_for_tts_infer, model.infer)를 직접 부르므로
+  requirements.txt에 고정한 melotts 커밋의 시그니처를 모델 로딩 때 확인하고, 다르면 [SYNTH][ERROR]를 남기고 파일 방식으로 합성합니다.
+- torch/melo/scipy는 처음 쓸 때 임포트합니다. (호스트가 모델 로딩 전에 파이프부터 열 수 있도록)
+- 텍스트 전처리 결과(문장 조각별 phones/tones/언어 ID/BERT 특징)를 정규화된 세그먼트 단위로 메모리에 캐시합니다.
+  속도/화자만 다른 재합성은 음향 모델만 다시 돌립니다. (MELO_TTS_FRONTEND_CACHE_MB, 0이면 사용 안 함)
+- CPU 고속 추론 모드(MELO_TTS_FAST_INFERENCE=1, 기본 꺼짐): BERT(와 선택 시 음향 모델)의 Linear 층을 동적 INT8로 양자화하고,
+  합성 스레드마다 torch intra-op 스레드 수를 코어 수 / 합성 스레드 수로 고정해 과구독을 막습니다.
+- 합성 함수들은 cancel(): bool 콜백을 받아 모델 단계 사이(문장 조각 전처리, 조각별 음향 모델, 후처리 전)마다 확인하고,
+  True면 SynthCancelled를 던져 남은 단계를 건너뜁니다. (stop 뒤 이미 합성 중인 세그먼트가 CPU를 계속 쓰지 않도록)
+- timings(dict)를 주면 단계별 소요 시간(ms)을 채웁니다: frontend_ms, acoustic_ms, post_ms (kiosk_metrics 발화 추적용)
+- 배치 합성(synth_batch_to_int16 / LocalEngine.synthesize_batch): 세그먼트 여러 개의 문장 조각을 0으로 패딩해 음향 모델 한 번으로
+  추론하고, y_mask의 조각별 프레임 수로 오디오를 잘라 세그먼트별로 되돌립니다. (호출당 오버헤드와 작은 행렬 비효율을 줄임)
+  속도(length_scale)는 배치 전체에 하나라 같은 속도의 세그먼트만 묶고, 화자는 조각마다 다를 수 있습니다.
+  BERT 특징은 MeloTTS 텍스트 처리(g2p와 word2ph 정렬)에 묶여 있어 세그먼트별로 뽑고 전처리 캐시로 재사용합니다.
+"""
+
+import os, re, math, time, uuid, inspect, functools, threading
+import numpy as np
+from tts_text import normalize_text
+
+USE_INMEMORY_SYNTH = os.environ.get('MELO_TTS_FILE_SYNTH', '0') != '1'
+# 체크포인트를 torch.load(mmap=True)로 매핑해 읽음 (파일 전체를 메모리로 읽어 들인 뒤 역직렬화하지 않음)
+MMAP_WEIGHTS = os.environ.get('MELO_TTS_MMAP_WEIGHTS', '1') != '0'
+FRONTEND_CACHE_MB = int(os.environ.get('MELO_TTS_FRONTEND_CACHE_MB', '64'))
+# CPU 고속 추론 모드 (opt-in). 양자화 대상: "bert", "acoustic" (쉼표 구분, 기본 bert만 - 음향 모델은 음질 확인 후 켜기)
+FAST_INFERENCE = os.environ.get('MELO_TTS_FAST_INFERENCE', '0') == '1'
+QUANTIZE_PARTS = {p.strip() for p in os.environ.get('MELO_TTS_QUANTIZE', 'bert').split(',') if p.strip()} if FAST_INFERENCE else set()
+# 합성 스레드당 intra-op / 프로세스 inter-op 스레드 수 (0이면 자동: 코어 수 / 합성 스레드 수, inter-op 1)
+INTRA_THREADS = int(os.environ.get('MELO_TTS_INTRA_THREADS', '0'))
+INTER_THREADS = int(os.environ.get('MELO_TTS_INTER_THREADS', '0'))
+
+# MeloTTS audio_numpy_concat()과 동일한 문장 사이 무음 길이 (초)
+SENTENCE_GAP_SEC = 0.05
+# 메모리 합성이 직접 부르는 MeloTTS 내부 함수의 인자 (requirements.txt의 melotts 커밋 기준)
+MELO_SIGNATURES = {
+    "TTS.split_sentences_into_pieces": ("text", "language", "quiet"),
+    "utils.get_text_for_tts_infer": ("text", "language_str", "hps", "device", "symbol_to_id"),
+    "SynthesizerTrn.infer": ("x", "x_lengths", "sid", "tone", "language", "bert", "ja_bert", "noise_scale", "length_scale",
+                             "noise_scale_w", "sdp_ratio"),
+}
+
+
+class SynthCancelled(Exception):
+    """cancel() 콜백이 True를 반환해 합성을 중간에 멈춤 (오류가 아니므로 폴백/재시도하지 않음)"""
+
+
+def check_cancel(cancel):
+    if cancel is not None and cancel(): raise SynthCancelled()
+
+
+def text_frontend(tts, text, cancel=None):
+    """텍스트 전처리 (문장 조각 분할 -> g2p/MeCab -> BERT). 속도/화자와 무관하므로 캐시할 수 있습니다.
+    반환: 조각별 (bert, ja_bert, phones, tones, lang_ids) 텐서 튜플 목록"""
+    from melo import utils as melo_utils
+    language = tts.language
+    features = []
+    for t in tts.split_sentences_into_pieces(text, language, quiet=True):
+        check_cancel(cancel)
+        if language in ('EN', 'ZH_MIX_EN'):
+            t = re.sub(r'([a-z])([A-Z])', r'\1 \2', t)
+        features.append(tuple(melo_utils.get_text_for_tts_infer(t, language, tts.hps, tts.device, tts.symbol_to_id)))
+    return features
+
+def features_nbytes(features):
+    return sum(x.element_size() * x.nelement() for piece in features for x in piece) or 1
+
+def new_frontend_cache(max_mb=FRONTEND_CACHE_MB):
+    from tts_cache import LRUCache
+    return LRUCache(max_mb * 1024 * 1024, features_nbytes) if max_mb > 0 else None
+
+def melo_version():
+    try:
+        from importlib.metadata import version
+        return version("melotts")
+    except Exception:
+        return "unknown"
+
+def check_melo_api(tts):
+    """메모리 합성이 쓰는 MeloTTS 내부 함수의 인자가 고정한 버전과 같은지 확인합니다. 반환: 다른 점 목록 (같으면 빈 목록)"""
+    from melo import utils as melo_utils
+    funcs = {"TTS.split_sentences_into_pieces": getattr(tts, "split_sentences_into_pieces", None),
+             "utils.get_text_for_tts_infer": getattr(melo_utils, "get_text_for_tts_infer", None),
+             "SynthesizerTrn.infer": getattr(tts.model, "infer", None)}
+    problems = []
+    for name, expected in MELO_SIGNATURES.items():
+        if funcs[name] is None:
+            problems.append(f"{name} missing")
+            continue
+        params = inspect.signature(funcs[name]).parameters
+        missing = [p for p in expected if p not in params]
+        if missing: problems.append(f"{name} lacks {', '.join(missing)}")
+    return problems
+
+def synth_float32(tts, text, speaker_id, speed, sdp_ratio=0.2, noise_scale=0.6, noise_scale_w=0.8, frontend_cache=None, cancel=None,
+                  timings=None):
+    """텍스트를 합성해 (sr, float32 오디오)를 반환합니다. 파라미터 기본값은 tts_to_file()과 동일합니다.
+    frontend_cache(tts_cache.LRUCache)를 주면 정규화된 텍스트 기준으로 전처리 결과를 재사용합니다.
+    cancel()이 True가 되면 다음 단계 전에 SynthCancelled를 던집니다."""
+    import torch
+    sr = int(tts.hps.data.sampling_rate)
+    gap = int((sr * SENTENCE_GAP_SEC) / speed)
+    text = normalize_text(text)
+    check_cancel(cancel)
+    t0 = time.perf_counter()
+    features = cached_frontend(tts, text, frontend_cache, cancel)
+    t1 = time.perf_counter()
+    pieces = []
+    for bert, ja_bert, phones, tones, lang_ids in features:
+        check_cancel(cancel)
+        with torch.no_grad():
+            device = tts.device
+            x_tst = phones.to(device).unsqueeze(0)
+            x_tst_lengths = torch.LongTensor([phones.size(0)]).to(device)
+            speakers = torch.LongTensor([speaker_id]).to(device)
+            audio = tts.model.infer(x_tst, x_tst_lengths, speakers,
+                                    tones.to(device).unsqueeze(0), lang_ids.to(device).unsqueeze(0),
+                                    bert.to(device).unsqueeze(0), ja_bert.to(device).unsqueeze(0),
+                                    sdp_ratio=sdp_ratio, noise_scale=noise_scale, noise_scale_w=noise_scale_w,
+                                    length_scale=1. / speed)[0][0, 0]
+            pieces.append(audio.float().cpu().numpy())
+    if timings is not None:
+        timings["frontend_ms"] = (t1 - t0) * 1000
+        timings["acoustic_ms"] = (time.perf_counter() - t1) * 1000
+
+    return sr, join_pieces(pieces, gap) # NaN 제거/클리핑은 postprocess_to_int16에서 한 번에
+
+def cached_frontend(tts, text, frontend_cache=None, cancel=None):
+    """정규화된 텍스트의 전처리 결과 (frontend_cache가 있으면 재사용)"""
+    if frontend_cache is None: return text_frontend(tts, text, cancel)
+    features, _ = frontend_cache.get_or_create(f"{tts.language}|{text}", lambda: text_frontend(tts, text, cancel))
+    if features is None: features = text_frontend(tts, text, cancel) # 같은 텍스트를 먼저 전처리하던 스레드가 취소됨
+    return features
+
+def join_pieces(pieces, gap):
+    """문장 조각 오디오를 조각마다 gap 샘플 무음을 붙여 이어 붙입니다.
+    audio_numpy_concat()은 Python list를 거쳐 float64 -> float32로 변환하므로, 미리 할당한 float32 버퍼에 바로 복사"""
+    out = np.zeros(sum(p.size + gap for p in pieces), dtype=np.float32)
+    pos = 0
+    for p in pieces:
+        out[pos:pos + p.size] = p
+        pos += p.size + gap
+    return out
+
+def acoustic_batch(tts, pieces, speaker_ids, speed, sdp_ratio=0.2, noise_scale=0.6, noise_scale_w=0.8):
+    """문장 조각 여러 개를 음소 길이에 맞춰 0으로 패딩해 음향 모델 한 번으로 추론하고, 조각별 float32 오디오를 입력 순서대로 반환합니다.
+    pieces: text_frontend 결과 조각 (bert, ja_bert, phones, tones, lang_ids), speaker_ids: 조각별 화자 ID
+    패딩 위치는 x_lengths 마스크로 가려지며, 출력은 y_mask의 조각별 프레임 수 x hop 길이로 잘라냅니다."""
+    import torch
+    device, n = tts.device, len(pieces)
+    lengths = [p[2].size(0) for p in pieces]
+    width = max(lengths)
+    bert0, ja_bert0 = pieces[0][0], pieces[0][1]
+    x, tones, lang_ids = (torch.zeros(n, width, dtype=torch.long) for _ in range(3))
+    bert = torch.zeros(n, bert0.size(0), width, dtype=bert0.dtype)
+    ja_bert = torch.zeros(n, ja_bert0.size(0), width, dtype=ja_bert0.dtype)
+    for i, (b, jb, ph, tn, lg) in enumerate(pieces):
+        k = lengths[i]
+        x[i, :k], tones[i, :k], lang_ids[i, :k] = ph, tn, lg
+        bert[i, :, :k], ja_bert[i, :, :k] = b, jb
+    with torch.no_grad():
+        o, _, y_mask = tts.model.infer(x.to(device), torch.LongTensor(lengths).to(device), torch.LongTensor(speaker_ids).to(device),
+                                       tones.to(device), lang_ids.to(device), bert.to(device), ja_bert.to(device),
+                                       sdp_ratio=sdp_ratio, noise_scale=noise_scale, noise_scale_w=noise_scale_w,
+                                       length_scale=1. / speed)[:3]
+        frames = y_mask.sum(dim=(1, 2)).long().tolist()
+        hop = o.size(-1) // y_mask.size(-1) # 디코더 업샘플 배율 (= hps.data.hop_length)
+        audio = o[:, 0].float().cpu().numpy()
+    return [audio[i, :frames[i] * hop] for i in range(n)]
+
+def synth_batch_float32(tts, texts, speaker_ids, speed, frontend_cache=None, cancel=None, timings=None):
+    """세그먼트 여러 개를 전처리(세그먼트별, 캐시 재사용) -> 음향 모델 배치 추론 한 번으로 합성해 [(sr, float32)]를 반환합니다.
+    timings: 세그먼트별 dict 목록. acoustic_ms는 배치 전체 시간(각 세그먼트가 기다린 시간), batch에 배치 크기를 채웁니다."""
+    sr = int(tts.hps.data.sampling_rate)
+    gap = int((sr * SENTENCE_GAP_SEC) / speed)
+    features, frontend_ms = [], []
+    for text in texts:
+        check_cancel(cancel)
+        t0 = time.perf_counter()
+        features.append(cached_frontend(tts, normalize_text(text), frontend_cache, cancel))
+        frontend_ms.append((time.perf_counter() - t0) * 1000)
+    check_cancel(cancel)
+    t1 = time.perf_counter()
+    owners = [i for i, f in enumerate(features) for _ in f]
+    audio = acoustic_batch(tts, [p for f in features for p in f], [speaker_ids[i] for i in owners], speed) if owners else []
+    pieces = [[] for _ in texts]
+    for i, a in zip(owners, audio): pieces[i].append(a)
+    if timings is not None:
+        acoustic_ms = (time.perf_counter() - t1) * 1000
+        for t, ms in zip(timings, frontend_ms): t.update(frontend_ms=ms, acoustic_ms=acoustic_ms, batch=len(texts))
+    return [(sr, join_pieces(p, gap)) for p in pieces]
+
+
+# --- 모델 로딩 ---
+def resolve_model_files(profile, resources_path=None):
+    """(config.json, checkpoint.pth) 로컬 경로. 패키징된 스냅샷 -> HF 허브 캐시 순으로 찾고, 없으면 (None, None) (MeloTTS가 내려받음)"""
+    language, revision = profile["language"], profile.get("revision")
+    if resources_path and profile.get("packaged_model") and revision:
+        snapshot = os.path.join(resources_path, profile["packaged_model"], 'snapshots', revision)
+        files = (os.path.join(snapshot, 'config.json'), os.path.join(snapshot, 'checkpoint.pth'))
+        if all(os.path.exists(f) for f in files): return files
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        from melo.download_utils import LANG_TO_HF_REPO_ID
+        files = tuple(try_to_load_from_cache(LANG_TO_HF_REPO_ID[language], name, revision=revision) for name in ('config.json', 'checkpoint.pth'))
+        if all(isinstance(f, str) for f in files): return files
+    except Exception:
+        pass
+    return None, None
+
+def _load_checkpoint(ckpt_path, device):
+    """체크포인트를 torch.load(mmap=True)로 매핑해 읽습니다. (전역 torch.load를 바꾸지 않아 다른 스레드의 로딩과 섞이지 않음)"""
+    import torch
+    try:
+        return torch.load(ckpt_path, map_location=device, mmap=True, weights_only=True)
+    except RuntimeError: # zip 포맷이 아닌 구형 체크포인트는 mmap 불가
+        return torch.load(ckpt_path, map_location=device, weights_only=True)
+
+def _build_tts(language, device, config_path, ckpt_path):
+    """melo.api.TTS.__init__과 같은 순서로 모델을 만들고, 가중치만 _load_checkpoint()로 읽어 넣습니다."""
+    import torch
+    from torch import nn
+    from melo.api import TTS
+    from melo.models import SynthesizerTrn
+    from melo.download_utils import load_or_download_config
+    if device == 'auto':
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    hps = load_or_download_config(language, config_path=config_path)
+    tts = TTS.__new__(TTS)
+    nn.Module.__init__(tts)
+    tts.model = SynthesizerTrn(len(hps.symbols), hps.data.filter_length // 2 + 1, hps.train.segment_size // hps.data.hop_length,
+                               n_speakers=hps.data.n_speakers, num_tones=hps.num_tones, num_languages=hps.num_languages,
+                               **hps.model).to(device)
+    tts.model.eval()
+    tts.symbol_to_id = {s: i for i, s in enumerate(hps.symbols)}
+    tts.hps, tts.device = hps, device
+    tts.model.load_state_dict(_load_checkpoint(ckpt_path, device)['model'], strict=True)
+    language = language.split('_')[0]
+    tts.language = 'ZH_MIX_EN' if language == 'ZH' else language
+    return tts
+
+def load_tts(profile, resources_path=None, device="auto"):
+    """로컬 스냅샷/캐시가 있으면 HF 허브 조회 없이 그 파일로, 가중치는 mmap으로 MeloTTS 모델을 만듭니다.
+    로컬 파일이 없으면(또는 MELO_TTS_MMAP_WEIGHTS=0) MeloTTS가 직접 내려받아 읽습니다."""
+    global USE_INMEMORY_SYNTH
+    from melo.api import TTS
+    config_path, ckpt_path = resolve_model_files(profile, resources_path)
+    tts = None
+    if MMAP_WEIGHTS and ckpt_path:
+        try:
+            tts = _build_tts(profile["language"], device, config_path, ckpt_path)
+        except Exception as e: # MeloTTS 모델 구성이 바뀜 -> MeloTTS가 직접 읽는 방식으로
+            print(f"[SYNTH][ERROR] mmap model load failed (melotts {melo_version()}), loading through melo.api.TTS: "
+                  f"{type(e).__name__}: {e}", flush=True)
+    if tts is None:
+        tts = TTS(language=profile["language"], device=device, config_path=config_path, ckpt_path=ckpt_path)
+    problems = check_melo_api(tts) if USE_INMEMORY_SYNTH else []
+    if problems: # 다른 MeloTTS가 설치됨 -> 조용히 다른 오디오를 내지 않도록 공개 API(tts_to_file) 경로만 사용
+        print(f"[SYNTH][ERROR] melotts {melo_version()} does not match the version pinned in requirements.txt "
+              f"({'; '.join(problems)}). Using WAV file synthesis for all segments.", flush=True)
+        USE_INMEMORY_SYNTH = False
+    return tts
+
+
+# --- CPU 고속 추론 모드 ---
+def threads_per_worker(n_workers):
+    """합성 스레드(또는 프로세스) 하나가 쓸 torch intra-op 스레드 수"""
+    return INTRA_THREADS or max(1, (os.cpu_count() or 2) // max(1, n_workers))
+
+def configure_interop_threads():
+    """inter-op 스레드 수는 프로세스당 한 번, 병렬 작업이 시작되기 전에만 바꿀 수 있습니다."""
+    import torch
+    try:
+        torch.set_interop_threads(INTER_THREADS or 1)
+    except RuntimeError: # 이미 설정됐거나 inter-op 작업이 시작된 뒤
+        pass
+
+def _bert_slots():
+    """MeloTTS가 지연 로딩해 모듈 전역에 들고 있는 BERT 모델들의 (이름, getter, setter)"""
+    slots = []
+    try:
+        from melo.text import english_bert
+        if getattr(english_bert, 'model', None) is not None:
+            slots.append(('english_bert', lambda: english_bert.model, lambda m: setattr(english_bert, 'model', m)))
+    except ImportError: pass
+    try:
+        from melo.text import japanese_bert # korean.py도 model_id만 바꿔 이 모듈의 models를 사용
+        for key in list(getattr(japanese_bert, 'models', {})):
+            slots.append((key, lambda k=key: japanese_bert.models[k], lambda m, k=key: japanese_bert.models.__setitem__(k, m)))
+    except ImportError: pass
+    return slots
+
+def quantize_int8(tts, profile, parts=None):
+    """nn.Linear 층을 동적 INT8로 양자화합니다. 양자화된 부분 이름 목록을 반환합니다.
+    BERT는 첫 텍스트 처리 때 로딩되므로 워밍업 문장 하나로 먼저 로딩시킨 뒤 바꿉니다.
+    음향 모델(VITS)은 대부분 Conv 층이라 Linear만 대상이며, 음질 영향이 있어 기본값에서는 제외합니다."""
+    import torch
+    from melo import utils as melo_utils
+    parts = QUANTIZE_PARTS if parts is None else set(parts)
+    if tts.device != 'cpu' or not parts: return []
+    done = []
+    if 'bert' in parts:
+        melo_utils.get_text_for_tts_infer(profile["warmup_text"], profile["language"], tts.hps, tts.device, tts.symbol_to_id)
+        for name, get, put in _bert_slots():
+            put(torch.ao.quantization.quantize_dynamic(get(), {torch.nn.Linear}, dtype=torch.qint8))
+            done.append(f"bert:{name}")
+    if 'acoustic' in parts:
+        tts.model = torch.ao.quantization.quantize_dynamic(tts.model, {torch.nn.Linear}, dtype=torch.qint8)
+        done.append("acoustic")
+    return done
+
+def model_variant(quantized):
+    """캐시 네임스페이스 접미사. fp32면 빈 문자열이라 기존 캐시/팩이 그대로 유효합니다."""
+    return "int8:" + "+".join(sorted(p.split(':')[0] for p in quantized)) if quantized else ""
+
+
+def speaker_map(tts):
+    """{화자 이름(대문자, '_' -> '-'): 화자 ID}. 요청의 speaker 필드를 ID로 바꿀 때 사용"""
+    return {str(k).upper().replace('_', '-'): int(v) for k, v in getattr(tts.hps.data, "spk2id", {}).items()}
+
+
+# --- 오디오 후처리 (float32 제자리 처리 -> int16 한 번 변환) ---
+def read_wav_as_float(path: str):
+    """(폴백 경로) WAV -> float32. int16은 변환 1회, float WAV는 복사 없이 제자리 클리핑"""
+    from scipy.io import wavfile as sci_wav
+    sr, data = sci_wav.read(path)
+    if data.ndim > 1: data = data[:, 0]
+    if data.dtype == np.int16: data = np.multiply(data, np.float32(1.0 / 32767.0), dtype=np.float32)
+    else: data = np.require(data, dtype=np.float32, requirements='W')
+    np.clip(data, -1.0, 1.0, out=data)
+    return sr, data
+
+@functools.lru_cache(maxsize=8)
+def polyphase_ratio(src_sr, tgt_sr):
+    """(up, down, float32 FIR 필터). SR 쌍마다 한 번만 설계합니다. (scipy resample_poly 기본 설계와 동일: Kaiser beta 5)"""
+    from scipy.signal import firwin
+    g = math.gcd(int(src_sr), int(tgt_sr))
+    up, down = int(tgt_sr) // g, int(src_sr) // g
+    max_rate = max(up, down)
+    h = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+    return up, down, h.astype(np.float32)
+
+def resample(audio, src_sr, tgt_sr):
+    """폴리페이즈 SR 변환. 같은 SR이면 입력을 그대로 반환합니다."""
+    if not src_sr or audio.size == 0 or src_sr == tgt_sr: return audio
+    from scipy.signal import resample_poly
+    up, down, h = polyphase_ratio(src_sr, tgt_sr)
+    return resample_poly(audio, up, down, window=h)
+
+@functools.lru_cache(maxsize=8)
+def _fade_ramp(k):
+    ramp = np.linspace(0.0, 1.0, k, dtype=np.float32)
+    ramp.flags.writeable = False
+    return ramp
+
+def fade_in_out(audio, sr, ms=3.0):
+    """앞뒤 ms만큼 제자리 페이드 (클릭 방지)"""
+    k = int(sr * (ms / 1000.0))
+    if k <= 1 or len(audio) <= 2 * k: return audio
+    w = _fade_ramp(k)
+    audio[:k] *= w
+    audio[-k:] *= w[::-1]
+    return audio
+
+def postprocess_to_int16(audio, src_sr, target_sr, fade_ms=3.0):
+    """합성 직후 float32 오디오 -> 캐시/재생용 int16.
+    NaN 제거, (필요 시) SR 변환, 페이드, 스케일/클리핑을 입력 버퍼(또는 변환 결과 버퍼) 하나에서 제자리로 처리하고,
+    마지막에 int16 출력 배열 하나만 새로 만듭니다. 호출 후 입력 audio는 내용이 바뀌므로 재사용하지 않습니다."""
+    audio = np.require(audio, dtype=np.float32, requirements='W')
+    if not np.isfinite(audio.sum()): np.nan_to_num(audio, copy=False, posinf=1.0, neginf=-1.0) # 합계는 임시 배열 없이 검사 가능 (NaN/inf는 드묾)
+    audio = resample(audio, src_sr, target_sr)
+    fade_in_out(audio, target_sr, fade_ms)
+    np.multiply(audio, 32767.0, out=audio)
+    np.clip(audio, -32767.0, 32767.0, out=audio)
+    return audio.astype(np.int16)
+
+def synth_to_file_numpy(tts, text, speaker_id, speed, tmpdir):
+    """(폴백) tts_to_file로 임시 WAV를 쓰고 다시 읽어오는 기존 방식"""
+    tmp_path = os.path.join(tmpdir, f"melo_{tts.language.lower()}_{uuid.uuid4().hex}.wav")
+    try:
+        tts.tts_to_file(text, speaker_id, tmp_path, speed=speed)
+        return read_wav_as_float(tmp_path)
+    finally:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+
+def synth_raw(tts, text, speaker_id, speed, tmpdir, frontend_cache=None, cancel=None, timings=None):
+    """모델 출력 (src_sr, float32). 메모리 합성 실패 시 임시 WAV 방식으로 폴백 (파일 방식은 중간 취소 불가)"""
+    if USE_INMEMORY_SYNTH:
+        try:
+            return synth_float32(tts, text, speaker_id, speed, frontend_cache=frontend_cache, cancel=cancel, timings=timings)
+        except SynthCancelled:
+            raise
+        except Exception as e:
+            print(f"[SYNTH][ERROR] In-memory synth failed (melotts {melo_version()}), falling back to WAV file: "
+                  f"{type(e).__name__}: {e}", flush=True)
+    check_cancel(cancel)
+    return synth_to_file_numpy(tts, text, speaker_id, speed, tmpdir)
+
+def synth_to_int16(tts, text, speaker_id, speed, tmpdir, target_sr, frontend_cache=None, cancel=None, timings=None):
+    """워커/캐시 팩 빌더 공용: 합성 -> 후처리 -> int16. 빈 결과면 None (게인은 재생 시 적용)"""
+    src_sr, audio = synth_raw(tts, text, speaker_id, speed, tmpdir, frontend_cache, cancel, timings)
+    if audio.size == 0: return None
+    check_cancel(cancel)
+    t0 = time.perf_counter()
+    audio = postprocess_to_int16(audio, src_sr, target_sr)
+    if timings is not None: timings["post_ms"] = (time.perf_counter() - t0) * 1000
+    return audio
+
+
+def synth_batch_to_int16(tts, texts, speaker_ids, speed, tmpdir, target_sr, frontend_cache=None, cancel=None, timings=None):
+    """synth_to_int16의 배치판: 세그먼트별 int16 목록 (빈 결과는 None). 배치 추론이 실패하면 한 개씩 합성으로 폴백"""
+    timings = timings if timings is not None else [None] * len(texts)
+    results = None
+    if USE_INMEMORY_SYNTH:
+        try:
+            results = synth_batch_float32(tts, texts, speaker_ids, speed, frontend_cache, cancel, [t if t is not None else {} for t in timings])
+        except SynthCancelled:
+            raise
+        except Exception as e:
+            print(f"[SYNTH][ERROR] Batched synth of {len(texts)} segments failed (melotts {melo_version()}), synthesizing one by one: "
+                  f"{type(e).__name__}: {e}", flush=True)
+    if results is None:
+        return [synth_to_int16(tts, text, spk, speed, tmpdir, target_sr, frontend_cache, cancel, t) for text, spk, t in zip(texts, speaker_ids, timings)]
+    out = []
+    for (src_sr, audio), t in zip(results, timings):
+        check_cancel(cancel)
+        t0 = time.perf_counter()
+        out.append(postprocess_to_int16(audio, src_sr, target_sr) if audio.size else None)
+        if t is not None: t["post_ms"] = (time.perf_counter() - t0) * 1000
+    return out
+
+
+class LocalEngine:
+    """워커 프로세스 안에서 바로 합성하는 기본 엔진 (tts_procpool.SynthProcessPool과 같은 인터페이스)
+    n_threads를 주면 합성을 호출하는 스레드마다 처음 한 번 torch intra-op 스레드 수를 그 값으로 맞춥니다."""
+
+    def __init__(self, tts, tmpdir, sample_rate, n_threads=None, variant=""):
+        self.tts, self.tmpdir, self.sample_rate = tts, tmpdir, sample_rate
+        self.n_threads, self.variant = n_threads, variant
+        self.frontend_cache = new_frontend_cache()
+        self.speakers = speaker_map(tts)
+        self._tls = threading.local()
+
+    def _set_threads(self):
+        if self.n_threads and not getattr(self._tls, 'threads_set', False):
+            import torch
+            torch.set_num_threads(self.n_threads)
+            self._tls.threads_set = True
+
+    def synthesize(self, text, speaker_id, speed, cancel=None, timings=None):
+        self._set_threads()
+        return synth_to_int16(self.tts, text, speaker_id, speed, self.tmpdir, self.sample_rate, self.frontend_cache, cancel, timings)
+
+    def synthesize_batch(self, items, speed, cancel=None, timings=None):
+        """items: [(텍스트, 화자 ID)] (속도는 배치 공통) -> 세그먼트별 int16 목록. timings: 세그먼트별 dict 목록"""
+        self._set_threads()
+        return synth_batch_to_int16(self.tts, [t for t, _ in items], [s for _, s in items], speed, self.tmpdir, self.sample_rate,
+                                    self.frontend_cache, cancel, timings)
+
+    def frontend_stats(self):
+        return self.frontend_cache.stats() if self.frontend_cache else None
+
+    def close(self):
+        pass
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 텍스트 분할 공용 모듈 (tts_host.py / build_tts_pack.py 공용)
+- 워커와 캐시 팩 빌더가 같은 규칙으로 문장을 나눠야 캐시 키가 일치합니다.
+- 첫 세그먼트는 짧게(첫 오디오까지의 시간 단축) 자르되, 글자 수로 끊지 않고 자연스러운 경계
+  (문장 끝 > 절 경계(쉼표, 연결 어미/접속사) > 어절/단어 사이)에서 자릅니다.
+- 이후 세그먼트 길이는 측정된 실시간 계수(RTF = 합성 시간 / 오디오 길이)로 정합니다.
+  앞 세그먼트들이 재생되는 동안 다음 세그먼트 합성이 끝날 만큼만 길게 잡아, 합성이 재생을 앞서면서도
+  세그먼트가 불필요하게 잘게 쪼개지지 않도록 합니다.
+- rtf를 주지 않으면 기본값(DEFAULT_RTF)으로 나누므로 캐시 팩/고정 문구와 같은 결과가 나옵니다.
+- normalize_text(): 합성 결과가 같은 표기 차이(공백, 전각/곡선 문장부호, 반복 부호)를 하나로 맞춰 캐시 키와 합성 입력으로 씁니다.
+"""
+
+import re, unicodedata
+
+# 언어별 분할 규칙
+#   first_min/first_max: 첫 세그먼트 길이 범위, first_target: 이 길이를 넘긴 뒤의 첫 어절 경계에서 자름 (더 강한 경계가 없을 때)
+#   rest_min/rest_max: 이후 세그먼트 길이 범위 (너무 짧으면 억양이 끊기고, 너무 길면 중단/메모리 단위가 커짐)
+RULES = {
+    "KR": {
+        "sentence_end": '.?!',
+        "clause_punct": ',;:·',
+        # 절 경계가 되는 연결 어미 (어절 끝). 명사와 헷갈리는 한 글자 어미(고, 면)는 앞 글자까지 포함
+        "clause_endings": ("하고", "되고", "있고", "없고", "이고", "않고", "였고", "았고", "었고", "했고",
+                           "으며", "하며", "이며", "되며", "면서", "지만", "는데", "은데", "인데", "니까",
+                           "어서", "아서", "여서", "해서", "므로", "거나", "든지", "도록", "려고",
+                           "으면", "하면", "되면", "이면", "다면", "라면"),
+        "clause_words": (),
+        "abbreviations": (),
+        "first_min": 6, "first_target": 16, "first_max": 40,
+        "rest_min": 20, "rest_max": 250,
+    },
+    "EN": {
+        "sentence_end": '.?!',
+        "clause_punct": ',;:',
+        "clause_endings": (),
+        # 이 단어 앞에서 절이 시작됨
+        "clause_words": ("and", "but", "so", "because", "which", "while", "when", "where", "although", "though",
+                         "if", "until", "since", "allowing", "including", "with"),
+        # 마침표로 끝나도 문장 끝이 아닌 약어
+        "abbreviations": ("no.", "mr.", "mrs.", "ms.", "dr.", "st.", "mt.", "vs.", "e.g.", "i.e.", "etc.", "approx.", "a.m.", "p.m."),
+        "first_min": 12, "first_target": 32, "first_max": 80,
+        "rest_min": 40, "rest_max": 250,
+    },
+}
+DEFAULT_RTF = 0.5   # 측정값이 없을 때 가정하는 RTF (캐시 팩/고정 문구 분할 기준)
+SAFETY = 0.8        # 합성이 재생을 따라잡지 못할 때를 대비한 여유 (예산의 80%만 사용)
+TAIL_SLACK = 1.25   # 남은 텍스트가 예산의 이 배수 이하면 꼬리를 따로 자르지 않고 붙임
+
+# MeloTTS 텍스트 전처리(replace_punctuation)가 같은 기호로 바꾸는 문장부호들 -> 합성 결과가 같으므로 키에서도 통일
+PUNCT_MAP = str.maketrans({"。": ".", "．": ".", "，": ",", "、": ",", "！": "!", "？": "?", "；": ";", "：": ":",
+                           "“": "'", "”": "'", "‘": "'", "’": "'", '"': "'", "（": "(", "）": ")", "『": "'", "』": "'",
+                           "「": "'", "」": "'", "～": "~", "—": "-", "–": "-"})
+
+# 경계 강도
+WORD, CLAUSE, SENTENCE, PARAGRAPH = 1, 2, 3, 4
+_CLOSERS = "')]"
+
+
+def _words(text, rules):
+    """텍스트를 (단어, 단어 뒤 경계 강도) 목록으로 나눕니다. 공백은 한 칸으로 합칩니다."""
+    tokens = re.findall(r'\S+|\s+', text.strip())
+    words = []
+    for tok in tokens:
+        if tok.isspace():
+            if words and '\n\n' in tok.replace('\r', ''): words[-1][1] = PARAGRAPH
+            continue
+        words.append([tok, WORD])
+    for i, w in enumerate(words):
+        word = w[0].rstrip(_CLOSERS)
+        if w[1] == PARAGRAPH: continue
+        if word.lower() in rules["abbreviations"]: continue
+        if word and word[-1] in rules["sentence_end"]: w[1] = SENTENCE
+        elif word and word[-1] in rules["clause_punct"]: w[1] = CLAUSE
+        elif word.endswith(rules["clause_endings"]) and len(word) > 2: w[1] = CLAUSE
+        elif i + 1 < len(words) and words[i + 1][0].lower() in rules["clause_words"]: w[1] = CLAUSE
+    if words: words[-1][1] = PARAGRAPH
+    return [tuple(w) for w in words]
+
+
+def _hard_split(word, limit, rules):
+    """띄어쓰기 없이 limit보다 긴 덩어리: 구두점 뒤에서, 그래도 길면 글자 수로 자릅니다."""
+    punct = re.escape(rules["sentence_end"] + rules["clause_punct"])
+    parts = [p for p in re.split(f'(?<=[{punct}])', word) if p]
+    out = []
+    for p in parts:
+        while len(p) > limit:
+            out.append(p[:limit]); p = p[limit:]
+        if p: out.append(p)
+    return out
+
+
+def _pick(words, start, lo, hi, prefer_early):
+    """words[start:]에서 길이가 [lo, hi] 안에 드는 경계 중 가장 강한 곳의 끝 인덱스(exclusive)를 고릅니다.
+    범위 안에 경계가 없으면 hi 이하에서 가장 강한 경계, 그것도 없으면 단어 하나."""
+    best, best_key, length = None, None, -1
+    for i in range(start, len(words)):
+        length += len(words[i][0]) + 1
+        if length > hi and best is not None: break
+        strength = words[i][1]
+        in_range = lo <= length <= hi
+        key = (in_range, strength, -i if prefer_early else i)
+        if best_key is None or key > best_key: best, best_key = i + 1, key
+        if length > hi: break
+    return best
+
+
+def plan_budgets(first_len, rtf, workers=1, rules=None):
+    """세그먼트별 최대 길이(글자)를 순서대로 만들어 주는 생성기.
+    오디오 길이가 글자 수에 비례한다고 보고, 합성 스레드 workers개가 순서대로 세그먼트를 맡을 때
+    세그먼트 k의 합성이 '앞 세그먼트들이 모두 재생되는 시점' 전에 끝나는 최대 길이를 계산합니다. (단위: 글자)"""
+    rules = rules or RULES["KR"]
+    rtf = max(rtf, 0.01)
+    free = [0.0] * max(1, workers) # 각 스레드가 다음 세그먼트를 시작할 수 있는 시각
+    free[0] = rtf * first_len
+    play_at = free[0] + first_len  # 다음 세그먼트 재생 시작 시각 (= 첫 오디오 시각 + 앞 세그먼트 재생 길이)
+    while True:
+        w = min(range(len(free)), key=free.__getitem__)
+        start = free[w]
+        if play_at <= start: # 이미 재생을 따라잡을 수 없음 -> 끊기는 횟수라도 줄이도록 최대 길이
+            n = rules["rest_max"]
+        else:
+            n = min(rules["rest_max"], max(rules["rest_min"], int(SAFETY * (play_at - start) / rtf)))
+        n = yield n
+        free[w] = start + rtf * n
+        play_at = max(play_at, free[w]) + n
+
+
+def split_chunks(text: str, language="KR", rtf=None, workers=1):
+    """발화를 합성 세그먼트 목록으로 나눕니다.
+    rtf: 이 장비에서 측정된 세그먼트 합성 RTF (None이면 DEFAULT_RTF), workers: 동시 합성 스레드 수"""
+    rules = RULES.get(language, RULES["EN"])
+    text = _normalize_marks(text).strip()
+    if not text: return []
+    words = []
+    for word, strength in _words(text, rules):
+        if len(word) <= rules["first_max"]:
+            words.append((word, strength))
+        else:
+            pieces = _hard_split(word, rules["first_max"], rules)
+            words += [(p, WORD) for p in pieces[:-1]] + [(pieces[-1], strength)]
+    total = sum(len(w) + 1 for w, _ in words) - 1
+    if total <= rules["first_max"]: return [" ".join(w for w, _ in words)]
+
+    # 첫 세그먼트: first_min 이상에서 가장 이른 문장/절 경계, 없으면 first_target을 넘긴 첫 어절 경계
+    end = _pick(words, 0, rules["first_min"], rules["first_max"], prefer_early=True)
+    if words[end - 1][1] == WORD:
+        end = _pick(words, 0, rules["first_target"], rules["first_max"], prefer_early=True)
+    segments = [" ".join(w for w, _ in words[:end])]
+
+    # 이후 세그먼트: RTF로 계산한 예산 안에서 가장 강한(같으면 가장 뒤쪽) 경계
+    budgets = plan_budgets(len(segments[0]), DEFAULT_RTF if rtf is None else rtf, workers, rules)
+    budget = next(budgets)
+    start = end
+    while start < len(words):
+        remain = sum(len(w) + 1 for w, _ in words[start:]) - 1
+        if remain <= budget * TAIL_SLACK and remain <= rules["rest_max"]:
+            end = len(words)
+        else:
+            end = _pick(words, start, max(1, budget // 2), budget, prefer_early=False)
+        seg = " ".join(w for w, _ in words[start:end])
+        segments.append(seg)
+        start = end
+        budget = budgets.send(len(seg))
+    return segments
+
+
+def _normalize_marks(text):
+    """유니코드 NFC, 문장부호 통일, 같은 부호 반복(!!, ??) 축약 (공백은 그대로 - 문단 경계 판단용)"""
+    text = unicodedata.normalize("NFC", text).translate(PUNCT_MAP).replace("…", "...")
+    return re.sub(r'([!?,;:])\1+', r'\1', text)
+
+
+def normalize_text(text):
+    """캐시 키/합성 입력용 정규화. split_chunks가 돌려주는 세그먼트는 이미 정규화된 상태입니다."""
+    return " ".join(_normalize_marks(text).split())